@@ -8,8 +8,12 @@ export async function GET() {
     // Get RAG service status
     const ragStatus = ragService.getStatus()
 
-    // Check if embeddings file exists
-    const embeddingsPath = path.join(process.cwd(), 'data', 'susan_ai_embeddings.json')
+    // Check if embeddings file exists (binary store header first, then JSON)
+    const storeHeaderPath = path.join(process.cwd(), 'data', 'susan_ai_embeddings.header.json')
+    const isBinaryStore = fs.existsSync(storeHeaderPath)
+    const embeddingsPath = isBinaryStore
+      ? storeHeaderPath
+      : path.join(process.cwd(), 'data', 'susan_ai_embeddings.json')
     const knowledgeBasePath = path.join(process.cwd(), 'training_data', 'susan_ai_knowledge_base.json')
 
     const embeddingsExists = fs.existsSync(embeddingsPath)
@@ -21,9 +25,18 @@ export async function GET() {
 
     if (embeddingsExists) {
       const stats = fs.statSync(embeddingsPath)
+      let size = stats.size
+      if (isBinaryStore) {
+        // Report the size of the whole store, not just its header
+        const header = JSON.parse(fs.readFileSync(embeddingsPath, 'utf-8'))
+        const dir = path.dirname(embeddingsPath)
+        for (const file of [header.matrix, header.rows, header.scales].filter(Boolean)) {
+          size += fs.statSync(path.join(dir, file)).size
+        }
+      }
       embeddingsStats = {
-        size: stats.size,
-        sizeFormatted: formatBytes(stats.size),
+        size,
+        sizeFormatted: formatBytes(size),
         modified: stats.mtime
       }
     }
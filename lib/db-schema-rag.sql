@@ -99,6 +99,8 @@ CREATE TABLE IF NOT EXISTS rag_chunks (
   position_end INTEGER,                   -- Character position end (optional)
 
   -- Vector embedding (OpenAI text-embedding-ada-002: 1536 dimensions)
+  -- Shorter text-embedding-3 vectors: change N here, run batch_embeddings_processor.py
+  -- --dimensions N and set RAG_EMBEDDING_DIMENSIONS=N (the query functions below too)
   embedding vector(1536),                 -- pgvector type
 
   -- Metadata (inherited from document + chunk-specific)
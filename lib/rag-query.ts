@@ -13,6 +13,9 @@ const pool = new Pool({
   ssl: process.env.NODE_ENV === 'production' ? { rejectUnauthorized: false } : false,
 });
 
+// Must match rag_chunks.embedding (batch_embeddings_processor.py --dimensions)
+const EMBEDDING_DIMENSIONS = parseInt(process.env.RAG_EMBEDDING_DIMENSIONS || '1536', 10);
+
 // ============================================================================
 // TYPE DEFINITIONS
 // ============================================================================
@@ -71,7 +74,7 @@ async function generateQueryEmbedding(query: string): Promise<number[]> {
     body: JSON.stringify({
       model: 'text-embedding-3-small',
       input: query,
-      dimensions: 1536,
+      dimensions: EMBEDDING_DIMENSIONS,
     }),
   });
 
@@ -15,7 +15,7 @@
 export interface EmbeddingChunk {
   id: string;
   text: string;
-  embedding: number[];
+  embedding: number[] | Float32Array | Int8Array;
   metadata?: {
     domain?: string;
     section?: string;
@@ -47,7 +47,7 @@ export interface RAGContext {
  * Compute cosine similarity between two vectors
  * Optimized for performance - uses single loop
  */
-function cosineSimilarity(a: number[], b: number[]): number {
+function cosineSimilarity(a: ArrayLike<number>, b: ArrayLike<number>): number {
   if (a.length !== b.length) {
     throw new Error(`Vector length mismatch: ${a.length} vs ${b.length}`);
   }
@@ -72,6 +72,112 @@ function cosineSimilarity(a: number[], b: number[]): number {
   return dotProduct / denominator;
 }
 
+/**
+ * Header of a binary embedding store written by scripts/embedding_store.py:
+ * <stem>.header.json, a little-endian matrix (<stem>.f32, .f16 or .i8) and
+ * one JSON row per vector (<stem>.rows.jsonl)
+ */
+interface EmbeddingStoreHeader {
+  format: string;
+  version: number;
+  model?: string;
+  dimensions: number;
+  count: number;
+  dtype?: 'float32' | 'float16' | 'int8';
+  matrix: string;
+  rows: string;
+  scales?: string;
+  metadata?: Record<string, any>;
+}
+
+const STORE_DTYPE_BYTES = { float32: 4, float16: 2, int8: 1 };
+
+let float16Table: Float32Array | null = null;
+
+/**
+ * Lookup table from IEEE 754 half-precision bit patterns to their values
+ */
+function getFloat16Table(): Float32Array {
+  if (float16Table) return float16Table;
+
+  float16Table = new Float32Array(65536);
+  for (let bits = 0; bits < 65536; bits++) {
+    const sign = bits & 0x8000 ? -1 : 1;
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x03ff;
+
+    if (exponent === 0) float16Table[bits] = sign * fraction * 2 ** -24;
+    else if (exponent === 0x1f) float16Table[bits] = fraction ? NaN : sign * Infinity;
+    else float16Table[bits] = sign * (1 + fraction / 1024) * 2 ** (exponent - 15);
+  }
+  return float16Table;
+}
+
+/**
+ * Read a binary embedding store; each chunk's embedding is a view into one
+ * typed array holding the whole matrix, so no per-vector parsing is needed.
+ * float16 matrices are widened to a Float32Array. int8 matrices are used as
+ * they are: cosine similarity ignores each row's scale factor.
+ */
+function readEmbeddingStore(headerPath: string): {
+  chunks: EmbeddingChunk[];
+  dimensions: number;
+  model?: string;
+} {
+  const fs = require('fs');
+  const path = require('path');
+
+  const header: EmbeddingStoreHeader = JSON.parse(fs.readFileSync(headerPath, 'utf-8'));
+  if (header.format !== 'kb-embeddings' || header.version !== 1) {
+    throw new Error(`Unsupported embedding store header: ${headerPath}`);
+  }
+
+  const dtype = header.dtype || 'float32';
+  const bytesPerValue = STORE_DTYPE_BYTES[dtype];
+  if (!bytesPerValue) {
+    throw new Error(`Unsupported embedding store dtype: ${dtype}`);
+  }
+
+  const dir = path.dirname(headerPath);
+  const buffer: Buffer = fs.readFileSync(path.join(dir, header.matrix));
+  const values = header.count * header.dimensions;
+  const expectedBytes = values * bytesPerValue;
+  if (buffer.byteLength !== expectedBytes) {
+    throw new Error(`Embedding matrix holds ${buffer.byteLength} bytes, header expects ${expectedBytes}`);
+  }
+
+  let matrix: Float32Array | Int8Array;
+  if (dtype === 'int8') {
+    matrix = new Int8Array(buffer.buffer, buffer.byteOffset, values);
+  } else if (dtype === 'float16') {
+    const table = getFloat16Table();
+    const halves = buffer.byteOffset % 2 === 0
+      ? new Uint16Array(buffer.buffer, buffer.byteOffset, values)
+      : new Uint16Array(buffer.buffer.slice(buffer.byteOffset, buffer.byteOffset + expectedBytes));
+    matrix = new Float32Array(values);
+    for (let i = 0; i < values; i++) {
+      matrix[i] = table[halves[i]];
+    }
+  } else {
+    // Float32Array views need 4-byte alignment; copy only if the Buffer isn't aligned
+    matrix = buffer.byteOffset % 4 === 0
+      ? new Float32Array(buffer.buffer, buffer.byteOffset, values)
+      : new Float32Array(buffer.buffer.slice(buffer.byteOffset, buffer.byteOffset + expectedBytes));
+  }
+
+  const lines = fs.readFileSync(path.join(dir, header.rows), 'utf-8').split('\n').filter(Boolean);
+  if (lines.length !== header.count) {
+    throw new Error(`Embedding rows file has ${lines.length} rows, header expects ${header.count}`);
+  }
+
+  const chunks: EmbeddingChunk[] = lines.map((line: string, index: number) => ({
+    ...JSON.parse(line),
+    embedding: matrix.subarray(index * header.dimensions, (index + 1) * header.dimensions)
+  }));
+
+  return { chunks, dimensions: header.dimensions, model: header.model };
+}
+
 /**
  * Generate cache key for query
  */
@@ -90,6 +196,7 @@ export class RAGService {
   private readonly CACHE_TTL = 1000 * 60 * 15; // 15 minutes
   private readonly CACHE_MAX_SIZE = 1000;
   private embeddingDimension = 1536; // OpenAI text-embedding-ada-002
+  private embeddingModel = 'text-embedding-ada-002'; // Queries must use the model the chunks were embedded with
 
   constructor() {
     // Load embeddings on initialization
@@ -99,7 +206,7 @@ export class RAGService {
   }
 
   /**
-   * Load embeddings from JSON file
+   * Load embeddings from the binary store, or from the JSON file
    * Supports both pre-generated and runtime generation
    */
   private async loadEmbeddings(): Promise<void> {
@@ -107,9 +214,27 @@ export class RAGService {
       const fs = require('fs');
       const path = require('path');
 
-      // Check for embeddings file
+      // Prefer the binary store (scripts/embedding_store.py) over the JSON file
+      const storeHeaderPath = path.join(process.cwd(), 'data', 'susan_ai_embeddings.header.json');
       const embeddingsPath = path.join(process.cwd(), 'data', 'susan_ai_embeddings.json');
 
+      if (fs.existsSync(storeHeaderPath)) {
+        console.log('[RAGService] Loading embeddings from:', storeHeaderPath);
+        const startTime = Date.now();
+
+        const store = readEmbeddingStore(storeHeaderPath);
+        this.embeddings = store.chunks;
+        this.embeddingDimension = store.dimensions;
+        this.embeddingModel = store.model || this.embeddingModel;
+
+        const loadTime = Date.now() - startTime;
+        console.log(`[RAGService] ✅ Loaded ${this.embeddings.length} embeddings in ${loadTime}ms`);
+        console.log(`[RAGService] Embedding dimension: ${this.embeddingDimension}`);
+
+        this.isLoaded = true;
+        return;
+      }
+
       if (!fs.existsSync(embeddingsPath)) {
         console.log('[RAGService] No embeddings file found at:', embeddingsPath);
         console.log('[RAGService] Run: npm run kb:build to generate embeddings');
@@ -130,6 +255,7 @@ export class RAGService {
 
       this.embeddings = data.chunks;
       this.embeddingDimension = data.metadata?.embedding_dimension || 1536;
+      this.embeddingModel = data.metadata?.embedding_model || this.embeddingModel;
 
       const loadTime = Date.now() - startTime;
       console.log(`[RAGService] ✅ Loaded ${this.embeddings.length} embeddings in ${loadTime}ms`);
@@ -162,8 +288,10 @@ export class RAGService {
           'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-          model: 'text-embedding-ada-002',
-          input: query
+          model: this.embeddingModel,
+          input: query,
+          // text-embedding-3 models shorten to the stored dimension themselves
+          ...(this.embeddingModel.startsWith('text-embedding-3') ? { dimensions: this.embeddingDimension } : {})
         }),
         signal: AbortSignal.timeout(10000) // 10s timeout
       });
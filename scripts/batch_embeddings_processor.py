@@ -20,20 +20,29 @@ import json
 import logging
 import time
 import hashlib
+import queue
+import threading
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import argparse
 import traceback
 
-try:
-    from openai import OpenAI
-    import psycopg2
-    from psycopg2.extras import execute_values
-except ImportError as e:
-    print(f"Error: Missing required library. {e}")
-    print("Install with: pip install openai psycopg2-binary")
-    exit(1)
+from embedding_batches import (
+    TokenBudgetBatcher,
+    DEFAULT_BATCH_ITEMS,
+    DEFAULT_BATCH_TOKENS,
+    OVERLONG_POLICIES,
+    embed_bisecting,
+    is_input_error,
+    dedupe_texts,
+    dedup_report,
+)
+from embedding_cache import EmbeddingCache, default_cache_path
+from embedding_store import native_dimensions, reduce_dimensions
+
+# openai and psycopg2 are imported by the classes that use them, so --help and
+# argument errors return without loading either library.
 
 # =============================================================================
 # CONFIGURATION
@@ -51,6 +60,10 @@ MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
 RATE_LIMIT_DELAY = 0.5  # seconds between API calls
 
+# Pipelined mode: batches buffered between the chunk, embed and write stages
+DEFAULT_QUEUE_DEPTH = 2
+PIPELINE_DONE = object()  # End-of-stream marker passed between stages
+
 # State file for resume capability
 STATE_FILE = "/Users/a21/routellm-chatbot/scripts/.batch_progress.json"
 
@@ -161,45 +174,152 @@ class DocumentChunker:
 class BatchEmbeddingGenerator:
     """Generate embeddings with retry logic and rate limiting"""
 
-    def __init__(self, api_key: str, model: str = DEFAULT_EMBEDDING_MODEL):
+    def __init__(self, api_key: str, model: str = DEFAULT_EMBEDDING_MODEL,
+                 cache: Optional[EmbeddingCache] = None,
+                 batcher: Optional[TokenBudgetBatcher] = None,
+                 dimensions: Optional[int] = None):
+        try:
+            from openai import OpenAI
+        except ImportError as e:
+            raise ImportError("openai not installed. Install with: pip install openai psycopg2-binary") from e
+
         self.client = OpenAI(api_key=api_key)
         self.model = model
+        self.dimensions = dimensions
+        self._request_options = {'dimensions': dimensions} if dimensions and native_dimensions(model) else {}
+        self.cache = cache
+        self.batcher = batcher or TokenBudgetBatcher()
         self.total_tokens_used = 0
+        self.failed_inputs: List[Dict[str, str]] = []  # Texts the API rejected, with its error
+        self.dedup_counts = {'texts': 0, 'unique_texts': 0, 'tokens_saved': 0}
 
-    def generate_embeddings_batch(self, texts: List[str], retry_count: int = 0) -> Optional[List[List[float]]]:
+    def embed_texts(self, texts: List[str]) -> Optional[List[List[float]]]:
         """
-        Generate embeddings for a batch of texts with retry logic
+        Embeddings for texts, serving cached ones and generating only the rest
+
+        Texts that repeat (after normalising Unicode and whitespace) are
+        embedded once and share the vector.
 
         Args:
             texts: List of text strings
-            retry_count: Current retry attempt
 
         Returns:
             List of embedding vectors or None on failure
         """
+        dedup = dedupe_texts(texts)
+        self.dedup_counts['texts'] += len(texts)
+        self.dedup_counts['unique_texts'] += len(dedup.unique)
+        if dedup.duplicates:
+            encoding = self.batcher.encoding
+            self.dedup_counts['tokens_saved'] += dedup.tokens_saved(
+                lambda text: len(encoding.encode(text, disallowed_special=())))
+            logger.info(f"{dedup.duplicates} duplicate chunk texts share an embedding")
+
+        if self.cache is None:
+            embeddings = self.generate_packed(dedup.unique)
+        else:
+            embeddings = self.cache.embed(dedup.unique, self.generate_packed)
+
+        return None if embeddings is None else dedup.fan_out(embeddings)
+
+    def dedup_stats(self) -> Dict[str, float]:
+        """Deduplication figures across every embed_texts call"""
+        counts = self.dedup_counts
+        return dedup_report(counts['texts'], counts['unique_texts'], counts['tokens_saved'])
+
+    def generate_packed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Generate embeddings in requests packed up to the batcher's token budget
+
+        Args:
+            texts: List of text strings
+
+        Returns:
+            One embedding per text (None for texts the API rejected), or None
+            if any request failed
+        """
+        plan = self.batcher.plan(texts)
+        embeddings = []
+
+        for number, (start, end) in enumerate(plan.batches):
+            logger.info(f"Generating embeddings for inputs {start} to {end} "
+                        f"({plan.batch_tokens(start, end):,} tokens)")
+            batch_embeddings = self.generate_embeddings_batch(
+                plan.inputs[start:end], owners=[texts[owner] for owner in plan.owners[start:end]]
+            )
+            if batch_embeddings is None:
+                return None
+
+            embeddings.extend(batch_embeddings)
+            if number + 1 < len(plan.batches):
+                time.sleep(RATE_LIMIT_DELAY)  # Rate limiting
+
+        return plan.combine(embeddings)
+
+    def generate_embeddings_batch(self, texts: List[str],
+                                  owners: Optional[List[str]] = None) -> Optional[List[Optional[List[float]]]]:
+        """
+        Generate embeddings for a batch of texts with retry logic
+
+        Transient errors are retried with exponential backoff. A batch the API
+        rejects because of its inputs is not retried as is: it is split in half
+        recursively until the bad inputs are isolated, and the rest are still
+        embedded in bulk.
+
+        Args:
+            texts: List of text strings
+            owners: Text to report each rejected input under (default: the input itself)
+
+        Returns:
+            One embedding per text (None for inputs the API rejected), or None
+            if a request failed for any other reason
+        """
+        owners = owners or texts
+
+        def on_failure(index: int, error: BaseException):
+            self.failed_inputs.append({'text': owners[index], 'error': str(error)})
+            logger.error(f"Input rejected by the API: {error} (text: {owners[index][:80]!r})")
+
+        try:
+            return embed_bisecting(texts, self._request_embeddings, on_failure)
+        except Exception:
+            return None
+
+    def _request_embeddings(self, texts: List[str], retry_count: int = 0) -> List[List[float]]:
+        """
+        Send one embeddings request, retrying transient errors
+
+        Raises:
+            Exception: Input errors immediately, other errors after MAX_RETRIES retries
+        """
         try:
             response = self.client.embeddings.create(
                 input=texts,
-                model=self.model
+                model=self.model,
+                **self._request_options
             )
 
             self.total_tokens_used += response.usage.total_tokens
-            embeddings = [data.embedding for data in response.data]
+            embeddings = [reduce_dimensions(data.embedding, self.dimensions)
+                          for data in sorted(response.data, key=lambda data: data.index)]
 
             logger.info(f"Generated {len(embeddings)} embeddings (tokens: {response.usage.total_tokens})")
             return embeddings
 
         except Exception as e:
+            if is_input_error(e):
+                raise  # Same inputs, same answer; the caller bisects instead
+
             logger.error(f"Error generating embeddings (attempt {retry_count + 1}/{MAX_RETRIES}): {e}")
 
             if retry_count < MAX_RETRIES:
                 wait_time = RETRY_DELAY * (2 ** retry_count)  # Exponential backoff
                 logger.info(f"Retrying in {wait_time} seconds...")
                 time.sleep(wait_time)
-                return self.generate_embeddings_batch(texts, retry_count + 1)
+                return self._request_embeddings(texts, retry_count + 1)
             else:
                 logger.error(f"Failed after {MAX_RETRIES} attempts")
-                return None
+                raise
 
     def estimate_cost(self) -> float:
         """Calculate cost based on tokens used"""
@@ -221,6 +341,11 @@ class DatabaseManager:
 
     def connect(self):
         """Establish database connection"""
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise ImportError("psycopg2 not installed. Install with: pip install openai psycopg2-binary") from e
+
         try:
             self.conn = psycopg2.connect(self.connection_string)
             self.cursor = self.conn.cursor()
@@ -237,8 +362,8 @@ class DatabaseManager:
             self.conn.close()
         logger.info("Database connection closed")
 
-    def verify_schema(self) -> bool:
-        """Verify that required tables exist"""
+    def verify_schema(self, dimensions: int = DEFAULT_EMBEDDING_DIMENSION) -> bool:
+        """Verify that required tables exist and the embedding column has the expected dimension"""
         try:
             self.cursor.execute("""
                 SELECT EXISTS (
@@ -260,6 +385,19 @@ class DatabaseManager:
                 logger.error("Required tables not found. Run schema.sql first.")
                 return False
 
+            # pgvector stores the declared dimension of vector(N) as the column's typmod
+            self.cursor.execute("""
+                SELECT atttypmod FROM pg_attribute
+                WHERE attrelid = 'rag_chunks'::regclass AND attname = 'embedding'
+            """)
+            row = self.cursor.fetchone()
+            column_dimensions = row[0] if row and row[0] > 0 else None
+            if column_dimensions and column_dimensions != dimensions:
+                logger.error(f"rag_chunks.embedding is vector({column_dimensions}) but embeddings have "
+                             f"{dimensions} dimensions. Use --dimensions {column_dimensions}, or re-create "
+                             f"the column as vector({dimensions}) and re-embed every chunk.")
+                return False
+
             logger.info("Database schema verified")
             return True
 
@@ -323,6 +461,8 @@ class DatabaseManager:
         Returns:
             True if successful
         """
+        from psycopg2.extras import execute_values
+
         try:
             # Prepare data for bulk insert
             values = [
@@ -390,14 +530,25 @@ class BatchProcessor:
         openai_api_key: str,
         batch_size: int = DEFAULT_BATCH_SIZE,
         chunk_size: int = DEFAULT_CHUNK_SIZE,
-        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+        cache: Optional[EmbeddingCache] = None,
+        embed_batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        embed_batch_items: int = DEFAULT_BATCH_ITEMS,
+        overlong: str = 'split',
+        dimensions: Optional[int] = None
     ):
         self.documents_dir = documents_dir
         self.batch_size = batch_size
 
         # Initialize components
         self.chunker = DocumentChunker(chunk_size, chunk_overlap)
-        self.embedder = BatchEmbeddingGenerator(openai_api_key)
+        self.embedder = BatchEmbeddingGenerator(
+            openai_api_key,
+            cache=cache,
+            batcher=TokenBudgetBatcher(max_tokens=embed_batch_tokens, max_items=embed_batch_items,
+                                       overlong=overlong),
+            dimensions=dimensions
+        )
         self.db = DatabaseManager(db_connection_string)
 
         # State tracking
@@ -422,6 +573,98 @@ class BatchProcessor:
         logger.info(f"Loaded {len(documents)} documents from {self.documents_dir}")
         return documents
 
+    def chunk_batch(self, batch_docs: List[Dict]) -> List[Dict]:
+        """Chunk every document in a batch, skipping documents with too little text"""
+        batch_chunks = []
+
+        for doc in batch_docs:
+            # Extract text (assuming it's in a 'content' or 'extractedText' field)
+            text = doc.get('extractedText') or doc.get('content') or ''
+
+            if not text or len(text.strip()) < 50:
+                logger.warning(f"Skipping document {doc['id']} - insufficient text")
+                continue
+
+            # Create chunks
+            chunks = self.chunker.chunk_text(
+                text=text,
+                doc_id=doc['id'],
+                metadata={
+                    'filename': doc['sourceFile'],
+                    'category': doc.get('category', 'unknown'),
+                    'doc_type': doc['type']
+                }
+            )
+
+            batch_chunks.extend(chunks)
+            logger.info(f"Document {doc['id']}: {len(chunks)} chunks created")
+
+        return batch_chunks
+
+    def embed_batch(self, batch_chunks: List[Dict], batch_num: int) -> int:
+        """
+        Add an embedding to every chunk of a batch
+
+        Returns:
+            API tokens used for this batch
+
+        Raises:
+            Exception: If any chunk could not be embedded
+        """
+        tokens_before = self.embedder.total_tokens_used
+
+        # Generate embeddings in token-budget requests (OpenAI has limits)
+        all_embeddings = self.embedder.embed_texts([chunk['text'] for chunk in batch_chunks])
+
+        if all_embeddings is None:
+            raise Exception(f"Failed to generate embeddings for batch {batch_num}")
+
+        rejected = [chunk for chunk, embedding in zip(batch_chunks, all_embeddings) if embedding is None]
+        if rejected:
+            errors = {failure['text']: failure['error'] for failure in self.embedder.failed_inputs}
+            for chunk in rejected:
+                logger.error(f"Chunk {chunk['id']} rejected: {errors.get(chunk['text'], 'unknown error')}")
+            raise Exception(f"{len(rejected)} chunks in batch {batch_num} could not be embedded")
+
+        for chunk, embedding in zip(batch_chunks, all_embeddings):
+            chunk['embedding'] = embedding
+
+        return self.embedder.total_tokens_used - tokens_before
+
+    def write_batch(self, batch_docs: List[Dict], batch_chunks: List[Dict]):
+        """
+        Insert a batch's documents and chunks and commit them as one transaction
+
+        Raises:
+            Exception: If an insert fails (the caller rolls back)
+        """
+        logger.info("Inserting data into database...")
+
+        # Insert documents
+        for doc in batch_docs:
+            doc_data = {
+                'id': doc['id'],
+                'filename': doc['sourceFile'],
+                'filepath': doc.get('sourcePath', ''),
+                'type': doc['type'],
+                'content': doc.get('extractedText') or doc.get('content') or '',
+                'summary': doc.get('summary', ''),
+                'metadata': {
+                    'category': doc.get('category', 'unknown'),
+                    'relative_path': doc.get('relativePath', '')
+                }
+            }
+
+            if not self.db.insert_document(doc_data):
+                raise Exception(f"Failed to insert document {doc['id']}")
+
+        # Insert chunks
+        if not self.db.insert_chunks_batch(batch_chunks):
+            raise Exception("Failed to insert chunks")
+
+        # Commit transaction
+        self.db.commit()
+
     def process_batch(self, batch_docs: List[Dict], batch_num: int) -> Tuple[bool, int, int]:
         """
         Process a single batch of documents
@@ -438,87 +681,20 @@ class BatchProcessor:
         logger.info(f"Documents in batch: {len(batch_docs)}")
         logger.info(f"=" * 80)
 
-        batch_chunks = []
-        batch_tokens = 0
-
         try:
             # Step 1: Chunk all documents in batch
-            for doc in batch_docs:
-                # Extract text (assuming it's in a 'content' or 'extractedText' field)
-                text = doc.get('extractedText') or doc.get('content') or ''
-
-                if not text or len(text.strip()) < 50:
-                    logger.warning(f"Skipping document {doc['id']} - insufficient text")
-                    continue
-
-                # Create chunks
-                chunks = self.chunker.chunk_text(
-                    text=text,
-                    doc_id=doc['id'],
-                    metadata={
-                        'filename': doc['sourceFile'],
-                        'category': doc.get('category', 'unknown'),
-                        'doc_type': doc['type']
-                    }
-                )
-
-                batch_chunks.extend(chunks)
-                logger.info(f"Document {doc['id']}: {len(chunks)} chunks created")
+            batch_chunks = self.chunk_batch(batch_docs)
 
             if not batch_chunks:
                 logger.warning("No chunks created in this batch")
                 return True, 0, 0
 
-            # Step 2: Generate embeddings in sub-batches (OpenAI has limits)
-            EMBEDDING_SUB_BATCH = 100  # OpenAI limit
-            all_embeddings = []
-
-            for i in range(0, len(batch_chunks), EMBEDDING_SUB_BATCH):
-                sub_batch = batch_chunks[i:i + EMBEDDING_SUB_BATCH]
-                texts = [chunk['text'] for chunk in sub_batch]
-
-                logger.info(f"Generating embeddings for chunks {i} to {i + len(sub_batch)}")
-                embeddings = self.embedder.generate_embeddings_batch(texts)
-
-                if embeddings is None:
-                    raise Exception(f"Failed to generate embeddings for chunk batch {i}")
-
-                all_embeddings.extend(embeddings)
-                time.sleep(RATE_LIMIT_DELAY)  # Rate limiting
-
-            # Step 3: Add embeddings to chunks
-            for chunk, embedding in zip(batch_chunks, all_embeddings):
-                chunk['embedding'] = embedding
-
-            # Step 4: Insert into database (transaction)
-            logger.info("Inserting data into database...")
-
-            # Insert documents
-            for doc in batch_docs:
-                doc_data = {
-                    'id': doc['id'],
-                    'filename': doc['sourceFile'],
-                    'filepath': doc.get('sourcePath', ''),
-                    'type': doc['type'],
-                    'content': doc.get('extractedText') or doc.get('content') or '',
-                    'summary': doc.get('summary', ''),
-                    'metadata': {
-                        'category': doc.get('category', 'unknown'),
-                        'relative_path': doc.get('relativePath', '')
-                    }
-                }
-
-                if not self.db.insert_document(doc_data):
-                    raise Exception(f"Failed to insert document {doc['id']}")
+            # Step 2: Generate embeddings and add them to the chunks
+            batch_tokens = self.embed_batch(batch_chunks, batch_num)
 
-            # Insert chunks
-            if not self.db.insert_chunks_batch(batch_chunks):
-                raise Exception("Failed to insert chunks")
+            # Step 3: Insert into database (transaction)
+            self.write_batch(batch_docs, batch_chunks)
 
-            # Commit transaction
-            self.db.commit()
-
-            batch_tokens = self.embedder.total_tokens_used
             logger.info(f"Batch {batch_num} completed successfully")
             logger.info(f"Chunks processed: {len(batch_chunks)}")
             logger.info(f"Tokens used: {batch_tokens}")
@@ -531,12 +707,162 @@ class BatchProcessor:
             self.db.rollback()
             return False, 0, 0
 
-    def run(self, resume: bool = True):
+    def record_batch(self, batch_num: int, batch_docs: List[Dict], success: bool, chunks: int, tokens: int) -> bool:
+        """
+        Update and save the progress state after a batch (batch_num counts from 0)
+
+        Returns:
+            True to carry on with the next batch
+        """
+        if success:
+            self.state.current_batch = batch_num + 1
+            self.state.processed_documents += len(batch_docs)
+            self.state.total_chunks_processed += chunks
+            self.state.total_tokens_used += tokens
+            self.state.total_cost_usd = self.embedder.estimate_cost()
+            self.state.completed_batches.append(batch_num + 1)
+        else:
+            self.state.failed_documents.extend([doc['id'] for doc in batch_docs])
+            logger.error(f"Batch {batch_num + 1} failed. Stopping pipeline.")
+            return False
+
+        # Save state after each batch
+        self.state.last_updated = datetime.now().isoformat()
+        self.state.save(STATE_FILE)
+
+        # Log progress
+        progress_pct = (self.state.processed_documents / self.state.total_documents) * 100
+        logger.info(f"Progress: {progress_pct:.1f}% ({self.state.processed_documents}/"
+                    f"{self.state.total_documents} documents)")
+        logger.info(f"Total cost so far: ${self.state.total_cost_usd:.4f}")
+        return True
+
+    def run_pipelined(self, batches: List[Tuple[int, List[Dict]]], queue_depth: int = DEFAULT_QUEUE_DEPTH):
+        """
+        Chunk, embed and write batches as three concurrent stages
+
+        A chunking thread and a database thread run on either side of the
+        embedding requests (made from this thread, which owns the embedding
+        cache's SQLite connection). The stages are joined by queues holding at
+        most queue_depth batches, so a slow stage holds the others back instead
+        of letting batches pile up in memory. The database thread writes and
+        commits batches one at a time in order, each in its own transaction,
+        and the first failure stops every stage, as in the sequential mode.
+
+        Args:
+            batches: (batch number from 0, documents) for each batch to process
+            queue_depth: Batches buffered between consecutive stages
+        """
+        chunked: queue.Queue = queue.Queue(maxsize=max(1, queue_depth))
+        embedded: queue.Queue = queue.Queue(maxsize=max(1, queue_depth))
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def put(stage_queue: queue.Queue, item) -> bool:
+            """Block until there is room, unless the pipeline is stopping"""
+            while not stop.is_set():
+                try:
+                    stage_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(stage_queue: queue.Queue):
+            """Next item, or PIPELINE_DONE once the pipeline is stopping"""
+            while not stop.is_set():
+                try:
+                    return stage_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return PIPELINE_DONE
+
+        def chunk_stage():
+            try:
+                for batch_num, batch_docs in batches:
+                    try:
+                        batch_chunks = self.chunk_batch(batch_docs)
+                    except Exception as e:
+                        batch_chunks = e
+                    if not put(chunked, (batch_num, batch_docs, batch_chunks)):
+                        return
+                put(chunked, PIPELINE_DONE)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        def write_stage():
+            try:
+                while True:
+                    item = get(embedded)
+                    if item is PIPELINE_DONE:
+                        return
+                    batch_num, batch_docs, batch_chunks, tokens, error = item
+
+                    if error is None and batch_chunks:
+                        try:
+                            self.write_batch(batch_docs, batch_chunks)
+                            logger.info(f"Batch {batch_num + 1} committed ({len(batch_chunks)} chunks, "
+                                        f"{tokens} tokens)")
+                        except Exception as e:
+                            error = e
+                            self.db.rollback()
+
+                    if error is not None:
+                        logger.error(f"Error processing batch {batch_num + 1}: {error}")
+                    if not self.record_batch(batch_num, batch_docs, error is None, len(batch_chunks or []), tokens):
+                        stop.set()
+                        return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        chunker = threading.Thread(target=chunk_stage, name='chunk-stage', daemon=True)
+        writer = threading.Thread(target=write_stage, name='write-stage', daemon=True)
+        chunker.start()
+        writer.start()
+
+        try:
+            while True:
+                item = get(chunked)
+                if item is PIPELINE_DONE:
+                    break
+                batch_num, batch_docs, batch_chunks = item
+                tokens, error = 0, None
+
+                if isinstance(batch_chunks, Exception):
+                    batch_chunks, error = [], batch_chunks
+                elif batch_chunks:
+                    logger.info(f"Embedding batch {batch_num + 1} ({len(batch_docs)} documents, "
+                                f"{len(batch_chunks)} chunks)")
+                    try:
+                        tokens = self.embed_batch(batch_chunks, batch_num + 1)
+                    except Exception as e:
+                        error = e
+                else:
+                    logger.warning(f"No chunks created in batch {batch_num + 1}")
+
+                if not put(embedded, (batch_num, batch_docs, batch_chunks, tokens, error)):
+                    break
+            put(embedded, PIPELINE_DONE)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            chunker.join()
+            writer.join()
+
+        if errors:
+            raise errors[0]
+
+    def run(self, resume: bool = True, pipeline: bool = False, queue_depth: int = DEFAULT_QUEUE_DEPTH):
         """
         Run the batch processing pipeline
 
         Args:
             resume: Whether to resume from previous state
+            pipeline: Overlap chunking, embedding and database writes (run_pipelined)
+            queue_depth: Batches buffered between pipelined stages
         """
         logger.info("=" * 80)
         logger.info("STARTING BATCH EMBEDDING GENERATION PIPELINE")
@@ -576,40 +902,26 @@ class BatchProcessor:
         # Connect to database
         self.db.connect()
 
-        if not self.db.verify_schema():
+        if not self.db.verify_schema(self.embedder.dimensions or DEFAULT_EMBEDDING_DIMENSION):
             logger.error("Database schema verification failed. Exiting.")
             return
 
         # Process batches
-        for batch_num in range(self.state.current_batch, total_batches):
-            start_idx = batch_num * self.batch_size
-            end_idx = min(start_idx + self.batch_size, total_docs)
-            batch_docs = all_documents[start_idx:end_idx]
-
-            # Process batch
-            success, chunks, tokens = self.process_batch(batch_docs, batch_num + 1)
-
-            # Update state
-            if success:
-                self.state.current_batch = batch_num + 1
-                self.state.processed_documents += len(batch_docs)
-                self.state.total_chunks_processed += chunks
-                self.state.total_tokens_used += tokens
-                self.state.total_cost_usd = self.embedder.estimate_cost()
-                self.state.completed_batches.append(batch_num + 1)
-            else:
-                self.state.failed_documents.extend([doc['id'] for doc in batch_docs])
-                logger.error(f"Batch {batch_num + 1} failed. Stopping pipeline.")
-                break
-
-            # Save state after each batch
-            self.state.last_updated = datetime.now().isoformat()
-            self.state.save(STATE_FILE)
-
-            # Log progress
-            progress_pct = (self.state.processed_documents / total_docs) * 100
-            logger.info(f"Progress: {progress_pct:.1f}% ({self.state.processed_documents}/{total_docs} documents)")
-            logger.info(f"Total cost so far: ${self.state.total_cost_usd:.4f}")
+        batches = [
+            (batch_num, all_documents[batch_num * self.batch_size:(batch_num + 1) * self.batch_size])
+            for batch_num in range(self.state.current_batch, total_batches)
+        ]
+        self.state.total_documents = total_docs
+
+        if pipeline:
+            logger.info(f"Pipelined: chunking, embedding and database writes overlap "
+                        f"(up to {queue_depth} batches queued between stages)")
+            self.run_pipelined(batches, queue_depth)
+        else:
+            for batch_num, batch_docs in batches:
+                success, chunks, tokens = self.process_batch(batch_docs, batch_num + 1)
+                if not self.record_batch(batch_num, batch_docs, success, chunks, tokens):
+                    break
 
         # Cleanup
         self.db.disconnect()
@@ -622,11 +934,17 @@ class BatchProcessor:
         logger.info(f"Total chunks: {self.state.total_chunks_processed}")
         logger.info(f"Total tokens: {self.state.total_tokens_used:,}")
         logger.info(f"Total cost: ${self.state.total_cost_usd:.4f}")
+        dedup = self.embedder.dedup_stats()
+        logger.info(f"Duplicate chunks: {dedup['duplicates']:,} of {dedup['texts']:,} "
+                    f"(dedup ratio {dedup['dedup_ratio']:.2f}x, {dedup['tokens_saved']:,} tokens saved)")
         logger.info(f"Failed documents: {len(self.state.failed_documents)}")
 
         if self.state.failed_documents:
             logger.warning(f"Failed document IDs: {self.state.failed_documents}")
 
+        if self.embedder.cache is not None:
+            self.embedder.cache.log_stats()
+
 # =============================================================================
 # MAIN
 # =============================================================================
@@ -650,6 +968,28 @@ def main():
                        help='Start fresh (ignore previous state)')
     parser.add_argument('--reset-state', action='store_true',
                        help='Reset state file and start over')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Chunk, embed and write batches as concurrent stages instead of one batch at a time')
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH,
+                       help=f'Batches buffered between pipelined stages (default: {DEFAULT_QUEUE_DEPTH})')
+    parser.add_argument('--embed-batch-tokens', type=int, default=DEFAULT_BATCH_TOKENS,
+                       help=f'Token budget per embeddings request (default: {DEFAULT_BATCH_TOKENS:,})')
+    parser.add_argument('--embed-batch-items', type=int, default=DEFAULT_BATCH_ITEMS,
+                       help=f'Maximum chunks per embeddings request (default: {DEFAULT_BATCH_ITEMS})')
+    parser.add_argument('--overlong', choices=OVERLONG_POLICIES, default='split',
+                       help='Chunks over the per-input token limit: split and average, or truncate (default: split)')
+    parser.add_argument('--embedding-cache', type=str, default=default_cache_path(),
+                       help='SQLite embedding cache shared with generate_embeddings.py '
+                            '(default: data/embedding_cache.sqlite or KB_EMBEDDING_CACHE)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Embed every chunk through the API without reading or filling the cache')
+    parser.add_argument('--cache-max-age-days', type=float,
+                       help='Evict cache entries not used for this many days')
+    parser.add_argument('--cache-max-size-mb', type=float,
+                       help='Evict least recently used cache entries beyond this many MB of vectors')
+    parser.add_argument('--dimensions', type=int,
+                       help=f'Shorten embeddings to this many dimensions (default: {DEFAULT_EMBEDDING_DIMENSION}); '
+                            f'must match the rag_chunks.embedding column')
 
     args = parser.parse_args()
 
@@ -670,6 +1010,16 @@ def main():
         os.remove(STATE_FILE)
         logger.info("State file reset")
 
+    cache = None
+    if not args.no_cache:
+        cache = EmbeddingCache(
+            args.embedding_cache,
+            model=DEFAULT_EMBEDDING_MODEL,
+            dimensions=args.dimensions,
+            max_age_days=args.cache_max_age_days,
+            max_size_mb=args.cache_max_size_mb
+        )
+
     # Run processor
     processor = BatchProcessor(
         documents_dir=args.documents_dir,
@@ -677,10 +1027,19 @@ def main():
         openai_api_key=openai_key,
         batch_size=args.batch_size,
         chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap
+        chunk_overlap=args.chunk_overlap,
+        cache=cache,
+        embed_batch_tokens=args.embed_batch_tokens,
+        embed_batch_items=args.embed_batch_items,
+        overlong=args.overlong,
+        dimensions=args.dimensions
     )
 
-    processor.run(resume=not args.no_resume)
+    try:
+        processor.run(resume=not args.no_resume, pipeline=args.pipeline, queue_depth=args.queue_depth)
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""
+Extraction Micro-Benchmark Suite
+Generates synthetic PDF, PPTX, DOCX and XLSX corpora at controlled sizes, runs each
+DocumentProcessor extractor and the chunker on them, and writes a JSON baseline
+(pages/sec, tokens/sec, chunks/sec, peak RSS) that can be compared across branches.
+"Pages" are PDF pages, PPTX slides, DOCX paragraphs and XLSX rows.
+
+DOCX and PPTX cases run with both the default python-docx / python-pptx
+backend and the streaming ooxml backend, and a parity check asserts that both
+produce identical chunks on the benchmark corpus, on decks and documents with
+merged cells, hyperlinks, line breaks and group shapes, and on any real
+documents passed with --parity-dir. A second check asserts that PDFs split
+into page ranges across worker processes (--workers, --pdf-split-pages) give
+the same chunks as serial extraction, including boilerplate stripping. The
+run exits non-zero on a mismatch.
+
+Runs fully offline: PDFs are written by a minimal built-in writer, decks,
+Word files and workbooks with python-pptx / python-docx / openpyxl. Each case
+runs in a fresh process so peak RSS is per case.
+
+Usage:
+    python3 benchmark_extraction.py --output baseline.json
+    python3 benchmark_extraction.py --output branch.json --compare baseline.json
+    python3 benchmark_extraction.py --cases docx_large,pptx_large --parity-dir ~/Desktop/Sales\ Rep\ Resources\ 2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import List, Dict, Any, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Vocabulary for synthetic text (roofing / insurance terms keep token stats realistic)
+WORDS = (
+    "roof shingle storm hail wind adjuster claim insurance warranty gutter siding "
+    "inspection damage estimate ladder homeowner deductible supplement flashing "
+    "underlayment ridge vent granule loss replacement approval carrier policy "
+    "depreciation contractor photo report measurement square pitch drip edge"
+).split()
+
+# Case sizes: name -> parameters. Density is words per line / paragraph.
+PDF_CASES = {
+    'pdf_small': {'pages': 10, 'lines': 30, 'density': 12, 'table_rows': 0},
+    'pdf_large': {'pages': 200, 'lines': 40, 'density': 14, 'table_rows': 0},
+    'pdf_tables': {'pages': 50, 'lines': 10, 'density': 10, 'table_rows': 25},
+}
+PPTX_CASES = {
+    'pptx_small': {'slides': 10, 'density': 40, 'table_rows': 0},
+    'pptx_large': {'slides': 150, 'density': 80, 'table_rows': 5},
+}
+DOCX_CASES = {
+    'docx_small': {'paragraphs': 50, 'density': 40, 'tables': 1, 'table_rows': 10},
+    'docx_large': {'paragraphs': 2000, 'density': 60, 'tables': 20, 'table_rows': 30},
+}
+XLSX_CASES = {
+    'xlsx_small': {'rows': 1_000, 'columns': 8},
+    'xlsx_large': {'rows': 100_000, 'columns': 8},
+}
+CHUNKER_CASES = {
+    'chunker_100k': {'tokens': 100_000},
+    'chunker_1m': {'tokens': 1_000_000},
+}
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+# =============================================================================
+# SYNTHETIC DOCUMENT WRITERS
+# =============================================================================
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_synthetic_pdf(path: str, pages: int, lines: int, density: int, table_rows: int, seed: int = 0,
+                        header_pages: Sequence[int] = ()):
+    """
+    Write a text-layer PDF with Helvetica body text and optional column tables
+
+    Args:
+        path: Output path
+        pages: Number of pages
+        lines: Body text lines per page
+        density: Words per line
+        table_rows: Rows of a 4-column table drawn on each page
+        seed: Random seed
+        header_pages: Pages that start with a repeated header line
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # filled in once the page ids are known
+    page_ids = []
+
+    for page_num in range(1, pages + 1):
+        ops = ["BT /F1 9 Tf 11 TL 40 760 Td"]
+        if page_num in header_pages:
+            ops.append("(Draft for internal review) Tj T*")
+        for _ in range(lines):
+            ops.append(f"({_pdf_escape(_sentence(rng, density))}) Tj T*")
+        ops.append("ET")
+
+        # Tables: one text object per cell so the text layer has real columns
+        y = 740 - lines * 11
+        for _ in range(table_rows):
+            for col in range(4):
+                cell = " ".join(rng.choice(WORDS) for _ in range(2))
+                ops.append(f"BT /F1 8 Tf {40 + col * 130} {y} Td ({_pdf_escape(cell)}) Tj ET")
+            y -= 10
+
+        ops.append(f"BT /F1 8 Tf 280 20 Td (Page {page_num} of {pages}) Tj ET")
+
+        stream = "\n".join(ops).encode('latin-1')
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for obj_num, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % obj_num + obj + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def write_synthetic_pptx(path: str, slides: int, density: int, table_rows: int, seed: int = 0):
+    """
+    Write a deck with title + body placeholders, speaker notes and optional tables
+
+    Args:
+        path: Output path
+        slides: Number of slides
+        density: Words in each slide body
+        table_rows: Rows of a 3-column table added to every fifth slide
+        seed: Random seed
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    rng = random.Random(seed)
+    prs = Presentation()
+
+    for slide_num in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = _sentence(rng, 5)
+        slide.placeholders[1].text = "\n".join(_sentence(rng, 10) for _ in range(max(1, density // 10)))
+        slide.notes_slide.notes_text_frame.text = _sentence(rng, density // 2 or 1)
+
+        if table_rows and slide_num % 5 == 0:
+            table = slide.shapes.add_table(table_rows, 3, Inches(1), Inches(4), Inches(8), Inches(2)).table
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = " ".join(rng.choice(WORDS) for _ in range(2))
+
+    prs.save(path)
+
+
+def write_synthetic_docx(path: str, paragraphs: int, density: int, tables: int, table_rows: int, seed: int = 0):
+    """
+    Write a Word document with body paragraphs followed by tables
+
+    Args:
+        path: Output path
+        paragraphs: Number of body paragraphs
+        density: Words per paragraph
+        tables: Number of 4-column tables
+        table_rows: Rows per table
+        seed: Random seed
+    """
+    from docx import Document
+
+    rng = random.Random(seed)
+    doc = Document()
+
+    for _ in range(paragraphs):
+        doc.add_paragraph(_sentence(rng, density))
+
+    for _ in range(tables):
+        table = doc.add_table(rows=table_rows, cols=4)
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = " ".join(rng.choice(WORDS) for _ in range(3))
+
+    doc.save(path)
+
+
+def write_synthetic_xlsx(path: str, rows: int, columns: int, seed: int = 0):
+    """
+    Write an adjuster-contact-style workbook: a header row, then rows of names, phones and notes
+
+    Args:
+        path: Output path
+        rows: Data rows
+        columns: Columns per row
+        seed: Random seed
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Contacts')
+
+    sheet.append([f"{rng.choice(WORDS).capitalize()} {i + 1}" for i in range(columns)])
+    for row_num in range(rows):
+        sheet.append([
+            row_num + 1,
+            f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}",
+            f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+            *[_sentence(rng, 3) for _ in range(columns - 3)],
+        ])
+
+    workbook.save(path)
+
+
+def write_parity_pdf(path: str, seed: int = 0):
+    """
+    Write a PDF whose header line is boilerplate within its first page ranges but not across the document
+
+    The header is on every other page of the first half (a quarter of all
+    pages), so it is only stripped if line frequencies are counted per range.
+    """
+    write_synthetic_pdf(path, pages=120, lines=20, density=10, table_rows=0, seed=seed,
+                        header_pages=range(1, 61, 2))
+
+
+def write_parity_docx(path: str, seed: int = 0):
+    """Write a Word document with the structures the ooxml backend must read like python-docx"""
+    from docx import Document
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.enum.text import WD_BREAK
+
+    rng = random.Random(seed)
+    doc = Document()
+
+    doc.add_heading(_sentence(rng, 4), level=1)
+    para = doc.add_paragraph(_sentence(rng, 8))
+    run = para.add_run(_sentence(rng, 4))
+    run.add_break()
+    run.add_text("after line break\tand tab")
+    para.add_run(" page").add_break(WD_BREAK.PAGE)
+    doc.add_paragraph("   ")
+
+    # Hyperlink runs are part of Paragraph.text
+    para = doc.add_paragraph("See ")
+    hyperlink = OxmlElement('w:hyperlink')
+    hyperlink.set(qn('w:anchor'), 'target')
+    link_run = OxmlElement('w:r')
+    link_text = OxmlElement('w:t')
+    link_text.text = "the warranty terms"
+    link_run.append(link_text)
+    hyperlink.append(link_run)
+    para._p.append(hyperlink)
+    para.add_run(" for details.")
+
+    # Horizontal and vertical merges, an empty row and a nested table
+    table = doc.add_table(rows=4, cols=4)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = " ".join(rng.choice(WORDS) for _ in range(2))
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(1, 3).merge(table.cell(3, 3))
+    table.cell(2, 0).add_paragraph("second paragraph in cell")
+    table.cell(2, 1).add_table(rows=1, cols=2).cell(0, 0).text = "nested"
+    for cell in table.rows[3].cells[:3]:
+        cell.text = ""
+
+    doc.add_paragraph(_sentence(rng, 12))
+    doc.save(path)
+
+
+def write_parity_pptx(path: str, seed: int = 0):
+    """Write a deck with the structures the ooxml backend must read like python-pptx"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    rng = random.Random(seed)
+    prs = Presentation()
+
+    # Title slide, soft line breaks, empty text box, picture-free group shape
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = _sentence(rng, 4)
+    slide.placeholders[1].text_frame.paragraphs[0].text = "first line\vsecond line"
+    slide.shapes.add_textbox(Inches(1), Inches(5), Inches(2), Inches(1))
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_textbox(Inches(1), Inches(6), Inches(2), Inches(1)).text = "grouped text"
+    slide.notes_slide.notes_text_frame.text = "Speaker notes\nsecond paragraph"
+
+    # Slide with a table and no notes slide
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = _sentence(rng, 3)
+    table = slide.shapes.add_table(2, 2, Inches(1), Inches(2), Inches(6), Inches(2)).table
+    table.cell(0, 0).text = "table text"
+
+    # Blank slide with empty notes
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    slide.notes_slide.notes_text_frame.text = ""
+
+    prs.save(path)
+
+
+def build_corpus(corpus_dir: str, selected: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Generate every selected document case
+
+    Returns:
+        case name -> {path, format, units, params}
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    cases = {}
+
+    for name, params in PDF_CASES.items():
+        if name in selected:
+            path = os.path.join(corpus_dir, f"{name}.pdf")
+            write_synthetic_pdf(path, **params)
+            cases[name] = {'path': path, 'format': 'pdf', 'units': params['pages'], 'params': params}
+
+    for name, params in PPTX_CASES.items():
+        if name in selected:
+            path = os.path.join(corpus_dir, f"{name}.pptx")
+            write_synthetic_pptx(path, **params)
+            cases[name] = {'path': path, 'format': 'pptx', 'units': params['slides'], 'params': params}
+
+    for name, params in DOCX_CASES.items():
+        if name in selected:
+            path = os.path.join(corpus_dir, f"{name}.docx")
+            write_synthetic_docx(path, **params)
+            cases[name] = {'path': path, 'format': 'docx', 'units': params['paragraphs'], 'params': params}
+
+    for name, params in XLSX_CASES.items():
+        if name in selected:
+            path = os.path.join(corpus_dir, f"{name}.xlsx")
+            write_synthetic_xlsx(path, **params)
+            cases[name] = {'path': path, 'format': 'xlsx', 'units': params['rows'], 'params': params}
+
+    return cases
+
+
+# =============================================================================
+# MEASUREMENT (runs in a fresh process per case)
+# =============================================================================
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one extractor or chunker case `repeat` times and keep the fastest run"""
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    logging.disable(logging.CRITICAL)
+    from extract_documents import DocumentProcessor, ChunkMetadata
+
+    processor = DocumentProcessor(**task['processor'])
+    best = None
+
+    for _ in range(task['repeat']):
+        if task['kind'] == 'chunker':
+            rng = random.Random(0)
+            text = ""
+            while processor.count_tokens(text) < task['tokens']:
+                text += "\n".join(_sentence(rng, 20) for _ in range(500)) + "\n"
+            metadata = ChunkMetadata(filename='synthetic.txt', doc_type='txt')
+
+            start_time = time.perf_counter()
+            chunks = processor.chunk_text(text, metadata, 'bench')
+            seconds = time.perf_counter() - start_time
+        else:
+            start_time = time.perf_counter()
+            chunks = processor.process_file(task['path'])
+            seconds = time.perf_counter() - start_time
+
+        if best is None or seconds < best[0]:
+            best = (seconds, chunks)
+
+    seconds, chunks = best
+    tokens = sum(chunk.token_count for chunk in chunks)
+    seconds = max(seconds, 1e-9)
+
+    result = {
+        'case': task['case'],
+        'format': task['format'],
+        'backend': task['backend'],
+        'units': task.get('units'),
+        'chunks': len(chunks),
+        'tokens': tokens,
+        'seconds': round(seconds, 4),
+        'tokens_per_sec': round(tokens / seconds, 1),
+        'chunks_per_sec': round(len(chunks) / seconds, 1),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+    if task.get('units'):
+        result['pages_per_sec'] = round(task['units'] / seconds, 1)
+    return result
+
+
+def run_isolated(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a case in a freshly spawned process so peak RSS is not shared between cases"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_case, task).result()
+
+
+# format -> backend name -> DocumentProcessor arguments
+BACKENDS = {
+    'pdf': {'auto': {'pdf_backend': 'auto'}, 'pdfplumber': {'pdf_backend': 'pdfplumber'}},
+    'pptx': {'default': {}, 'ooxml': {'pptx_backend': 'ooxml'}},
+    'docx': {'default': {}, 'ooxml': {'docx_backend': 'ooxml'}},
+    'xlsx': {'default': {}},
+}
+
+
+def build_tasks(cases: Dict[str, Dict[str, Any]], selected: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """One task per (case, backend) combination"""
+    tasks = []
+
+    for name, case in cases.items():
+        for backend, processor in BACKENDS[case['format']].items():
+            tasks.append({
+                'kind': 'extract', 'case': name, 'format': case['format'], 'backend': backend,
+                'path': case['path'], 'units': case['units'], 'processor': processor, 'repeat': repeat,
+            })
+
+    for name, params in CHUNKER_CASES.items():
+        if name in selected:
+            tasks.append({
+                'kind': 'chunker', 'case': name, 'format': 'text', 'backend': 'chunk_text',
+                'tokens': params['tokens'], 'processor': {}, 'repeat': repeat,
+            })
+
+    return tasks
+
+
+# =============================================================================
+# OOXML PARITY
+# =============================================================================
+
+def check_parity(paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Extract each DOCX / PPTX file with the default and ooxml backends and compare the chunks
+
+    Returns:
+        One {path, chunks, match, first_difference} entry per file
+    """
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    logging.disable(logging.CRITICAL)
+    from extract_documents import DocumentProcessor
+
+    default = DocumentProcessor()
+    ooxml = DocumentProcessor(docx_backend='ooxml', pptx_backend='ooxml')
+    results = []
+
+    for path in paths:
+        expected = [chunk.to_dict() for chunk in default.process_file(path)]
+        actual = [chunk.to_dict() for chunk in ooxml.process_file(path)]
+
+        difference = _first_difference(expected, actual)
+        results.append({'path': path, 'chunks': len(expected), 'match': difference is None,
+                        'first_difference': difference})
+
+    return results
+
+
+def check_split_parity(paths: List[str], workers: int, pdf_split_pages: int) -> List[Dict[str, Any]]:
+    """
+    Extract each PDF serially and split into page ranges across worker processes, and compare the chunks
+
+    Returns:
+        One {path, chunks, match, first_difference} entry per file
+    """
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    logging.disable(logging.CRITICAL)
+    from extract_documents import DocumentProcessor
+
+    serial = DocumentProcessor()
+    split = DocumentProcessor(workers=workers, pdf_split_pages=pdf_split_pages)
+    results = []
+
+    for path in paths:
+        expected = [chunk.to_dict() for chunk in serial.iter_chunks([path])]
+        actual = [chunk.to_dict() for chunk in split.iter_chunks([path])]
+        results.append({'path': path, 'chunks': len(expected), 'match': expected == actual,
+                        'first_difference': _first_difference(expected, actual)})
+
+    return results
+
+
+def _first_difference(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]):
+    """Describe where two chunk lists first differ (None if identical)"""
+    if expected == actual:
+        return None
+    if len(expected) != len(actual):
+        return f"{len(expected)} chunks vs {len(actual)}"
+    index = next(i for i, (a, b) in enumerate(zip(expected, actual)) if a != b)
+    return f"chunk {index}: {expected[index]['text'][:60]!r} vs {actual[index]['text'][:60]!r}"
+
+
+def split_parity_files(corpus_dir: str, cases: Dict[str, Dict[str, Any]], parity_dir: str = None) -> List[str]:
+    """Edge-case PDF, the selected PDF cases, and PDFs under parity_dir"""
+    paths = [os.path.join(corpus_dir, 'parity_edge_cases.pdf')]
+    write_parity_pdf(paths[0])
+
+    paths += [case['path'] for case in cases.values() if case['format'] == 'pdf']
+
+    if parity_dir:
+        for root, _, files in os.walk(parity_dir):
+            paths.extend(os.path.join(root, filename) for filename in sorted(files)
+                         if filename.lower().endswith('.pdf'))
+
+    return paths
+
+
+def parity_files(corpus_dir: str, cases: Dict[str, Dict[str, Any]], parity_dir: str = None) -> List[str]:
+    """Edge-case documents, the selected DOCX / PPTX cases, and DOCX / PPTX files under parity_dir"""
+    paths = [os.path.join(corpus_dir, 'parity_edge_cases.docx'), os.path.join(corpus_dir, 'parity_edge_cases.pptx')]
+    write_parity_docx(paths[0])
+    write_parity_pptx(paths[1])
+
+    paths += [case['path'] for case in cases.values() if case['format'] in ('docx', 'pptx')]
+
+    if parity_dir:
+        for root, _, files in os.walk(parity_dir):
+            for filename in sorted(files):
+                if filename.lower().endswith(('.docx', '.pptx')) and not filename.startswith('~$'):
+                    paths.append(os.path.join(root, filename))
+
+    return paths
+
+
+def print_parity(parity: List[Dict[str, Any]], title: str = 'OOXML parity'):
+    print()
+    print(f"{title} ({sum(r['match'] for r in parity)}/{len(parity)} files identical)")
+    for r in parity:
+        status = 'ok' if r['match'] else f"MISMATCH ({r['first_difference']})"
+        print(f"  {os.path.basename(r['path']):40} {r['chunks']:5} chunks  {status}")
+
+
+# =============================================================================
+# REPORTING
+# =============================================================================
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ''
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'Case':16} | {'Backend':10} | {'Seconds':>8} | {'Pages/s':>8} | {'Tokens/s':>10} | "
+          f"{'Chunks/s':>9} | {'RSS MB':>7}")
+    print("-" * 88)
+    for r in results:
+        pages = f"{r['pages_per_sec']:8.1f}" if 'pages_per_sec' in r else f"{'-':>8}"
+        print(f"{r['case']:16} | {r['backend']:10} | {r['seconds']:8.3f} | {pages} | "
+              f"{r['tokens_per_sec']:10.0f} | {r['chunks_per_sec']:9.1f} | {r['peak_rss_mb']:7.1f}")
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    """Print speed and memory ratios against a previous baseline (>1.00x speed = faster now)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['case'], r['backend']): r for r in json.load(f)['results']}
+
+    print()
+    print(f"Comparison with {baseline_path}")
+    print(f"{'Case':16} | {'Backend':10} | {'Speed':>8} | {'RSS':>8}")
+    print("-" * 52)
+    for r in results:
+        base = baseline.get((r['case'], r['backend']))
+        if not base:
+            print(f"{r['case']:16} | {r['backend']:10} | {'new':>8} |")
+            continue
+        speed = base['seconds'] / max(r['seconds'], 1e-9)
+        rss = r['peak_rss_mb'] / max(base['peak_rss_mb'], 1e-9)
+        print(f"{r['case']:16} | {r['backend']:10} | {speed:7.2f}x | {rss:7.2f}x")
+
+
+def main():
+    all_cases = [*PDF_CASES, *PPTX_CASES, *DOCX_CASES, *XLSX_CASES, *CHUNKER_CASES]
+
+    parser = argparse.ArgumentParser(description='Benchmark document extraction and chunking')
+    parser.add_argument('--output', type=str, default='extraction_benchmark.json',
+                       help='Where to write the JSON results')
+    parser.add_argument('--cases', type=str, default=','.join(all_cases),
+                       help=f"Comma-separated cases to run (available: {', '.join(all_cases)})")
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Runs per case; the fastest is reported')
+    parser.add_argument('--corpus-dir', type=str,
+                       help='Keep the generated corpus here instead of a temporary directory')
+    parser.add_argument('--compare', type=str,
+                       help='Baseline JSON from a previous run to compare against')
+    parser.add_argument('--parity-dir', type=str,
+                       help='Also check parity on every DOCX / PPTX / PDF file under this directory')
+    parser.add_argument('--workers', type=int, default=2,
+                       help='Worker processes for the split-PDF parity check')
+    parser.add_argument('--pdf-split-pages', type=int, default=40,
+                       help='Page range size for the split-PDF parity check')
+
+    args = parser.parse_args()
+    selected = [c.strip() for c in args.cases.split(',') if c.strip()]
+
+    unknown = [c for c in selected if c not in all_cases]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix='extraction_bench_')
+
+    try:
+        print(f"Generating synthetic corpus in {corpus_dir}...")
+        cases = build_corpus(corpus_dir, selected)
+
+        results = []
+        for task in build_tasks(cases, selected, args.repeat):
+            print(f"  {task['case']} ({task['backend']})...")
+            results.append(run_isolated(task))
+
+        print("Checking ooxml backend parity...")
+        parity = check_parity(parity_files(corpus_dir, cases, args.parity_dir))
+
+        print(f"Checking split-PDF parity (--workers {args.workers} --pdf-split-pages {args.pdf_split_pages})...")
+        split_parity = check_split_parity(split_parity_files(corpus_dir, cases, args.parity_dir),
+                                          args.workers, args.pdf_split_pages)
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    report = {
+        'metadata': {
+            'created_at': datetime.now().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'cases': {name: case['params'] for name, case in cases.items()},
+        },
+        'results': results,
+        'parity': parity,
+        'split_parity': split_parity,
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    print_results(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    print_parity(parity)
+    print_parity(split_parity, 'Split-PDF parity')
+    print()
+    print(f"Results saved to: {args.output}")
+
+    return 0 if all(r['match'] for r in parity + split_parity) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Token-Budget Batch Packing for Embedding Requests
+Groups texts into embedding requests by exact token count instead of a
+fixed number of items, so small chunks share requests and no request or
+input goes over the API's token limits.
+
+- Inputs longer than the model's per-input limit are handled by policy:
+  'split' embeds each window separately and combines the window vectors into
+  one (token-weighted mean, re-normalised to unit length); 'truncate' keeps
+  the first max_input_tokens tokens.
+- Batches are contiguous runs of inputs in their original order, each up to
+  max_tokens tokens and max_items inputs.
+- A batch the API rejects because of its inputs (400/413/422) is split in
+  half and each half retried, so k bad inputs in a batch of n cost about
+  2k*log2(n) extra requests instead of n, and the healthy halves still go
+  out in bulk (embed_bisecting). A rejection that names a request parameter
+  (unknown model, dimensions out of range) fails the batch after one request.
+- Texts that are identical once normalised (NFKC, whitespace collapsed) are
+  embedded once and the vector is fanned back out to every copy
+  (dedupe_texts).
+
+Usage:
+    plan = TokenBudgetBatcher(max_tokens=100_000).plan(texts)
+    vectors = [None] * len(plan.inputs)
+    for start, end in plan.batches:
+        vectors[start:end] = embed(plan.inputs[start:end])
+    embeddings = plan.combine(vectors)    # One vector per original text
+
+    dedup = dedupe_texts(texts)
+    embeddings = dedup.fan_out(embed(dedup.unique))
+"""
+
+import math
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Callable
+
+from tokenizer import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# OpenAI embeddings limits (text-embedding-3-*, ada-002)
+MAX_INPUT_TOKENS = 8191
+MAX_REQUEST_TOKENS = 300_000
+MAX_REQUEST_ITEMS = 2048
+
+DEFAULT_BATCH_TOKENS = 100_000
+DEFAULT_BATCH_ITEMS = 512
+OVERLONG_POLICIES = ('split', 'truncate')
+
+# HTTP statuses that blame the request body; other errors are not bisected
+INPUT_ERROR_STATUSES = (400, 413, 422)
+# Rejections caused by the request rather than its inputs: the error's param or code
+REQUEST_ERROR_PARAMS = ('model', 'dimensions', 'encoding_format')
+REQUEST_ERROR_CODES = ('model_not_found',)
+
+
+@dataclass
+class BatchPlan:
+    """Inputs to send, the text each one belongs to, and how they are batched"""
+    inputs: List[str]
+    input_tokens: List[int]
+    owners: List[int]  # Index of the original text for each input
+    batches: List[Tuple[int, int]]  # (start, end) ranges over inputs
+    text_count: int
+    split_texts: int = 0
+    truncated_texts: int = 0
+
+    def batch_tokens(self, start: int, end: int) -> int:
+        return sum(self.input_tokens[start:end])
+
+    def combine(self, vectors: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        """
+        Map per-input vectors back to one vector per original text
+
+        Windows of a split text are averaged weighted by their token counts and
+        scaled back to unit length; if any window failed, the text gets None.
+        """
+        results: List[Optional[List[float]]] = [None] * self.text_count
+        pieces: dict = {}
+        for owner, vector, tokens in zip(self.owners, vectors, self.input_tokens):
+            pieces.setdefault(owner, []).append((vector, tokens))
+
+        for owner, parts in pieces.items():
+            if len(parts) == 1:
+                results[owner] = parts[0][0]
+                continue
+            if any(vector is None for vector, _ in parts):
+                continue
+
+            total = [0.0] * len(parts[0][0])
+            for vector, tokens in parts:
+                for i, value in enumerate(vector):
+                    total[i] += value * tokens
+            norm = math.sqrt(sum(value * value for value in total)) or 1.0
+            results[owner] = [value / norm for value in total]
+
+        return results
+
+
+class TokenBudgetBatcher:
+    """Packs texts into embedding requests by token budget"""
+
+    def __init__(self, max_tokens: int = DEFAULT_BATCH_TOKENS, max_items: int = DEFAULT_BATCH_ITEMS,
+                 max_input_tokens: int = MAX_INPUT_TOKENS, overlong: str = 'split'):
+        """
+        Initialize the batcher
+
+        Args:
+            max_tokens: Token budget per request (at most MAX_REQUEST_TOKENS)
+            max_items: Inputs per request (at most MAX_REQUEST_ITEMS)
+            max_input_tokens: Longest single input the model accepts
+            overlong: 'split' or 'truncate' inputs longer than max_input_tokens
+        """
+        if overlong not in OVERLONG_POLICIES:
+            raise ValueError(f"overlong must be one of {OVERLONG_POLICIES}, got {overlong!r}")
+
+        self.max_input_tokens = max(1, min(max_input_tokens, MAX_INPUT_TOKENS))
+        self.max_tokens = max(self.max_input_tokens, min(max_tokens, MAX_REQUEST_TOKENS))
+        self.max_items = max(1, min(max_items, MAX_REQUEST_ITEMS))
+        self.overlong = overlong
+        self.encoding = get_encoding()
+
+    def _windows(self, tokens: List[int]) -> List[Tuple[str, int]]:
+        """Decode an over-long token list as consecutive windows of max_input_tokens"""
+        return [
+            (self.encoding.decode(tokens[start:start + self.max_input_tokens]),
+             len(tokens[start:start + self.max_input_tokens]))
+            for start in range(0, len(tokens), self.max_input_tokens)
+        ]
+
+    def plan(self, texts: List[str]) -> BatchPlan:
+        """
+        Split or truncate over-long texts and pack all inputs into batches
+
+        Args:
+            texts: Texts to embed, in order
+
+        Returns:
+            BatchPlan whose batches cover plan.inputs in order
+        """
+        inputs, input_tokens, owners = [], [], []
+        split_texts = truncated_texts = 0
+
+        for owner, text in enumerate(texts):
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= self.max_input_tokens:
+                inputs.append(text)
+                input_tokens.append(max(len(tokens), 1))
+                owners.append(owner)
+                continue
+
+            if self.overlong == 'truncate':
+                truncated_texts += 1
+                inputs.append(self.encoding.decode(tokens[:self.max_input_tokens]))
+                input_tokens.append(self.max_input_tokens)
+                owners.append(owner)
+            else:
+                split_texts += 1
+                for window, count in self._windows(tokens):
+                    inputs.append(window)
+                    input_tokens.append(count)
+                    owners.append(owner)
+
+        batches = []
+        start, batch_tokens = 0, 0
+        for i, tokens in enumerate(input_tokens):
+            if i > start and (batch_tokens + tokens > self.max_tokens or i - start >= self.max_items):
+                batches.append((start, i))
+                start, batch_tokens = i, 0
+            batch_tokens += tokens
+        if start < len(inputs):
+            batches.append((start, len(inputs)))
+
+        if split_texts or truncated_texts:
+            logger.info(f"Over-long inputs: {split_texts} split, {truncated_texts} truncated "
+                        f"(limit {self.max_input_tokens:,} tokens)")
+
+        return BatchPlan(
+            inputs=inputs,
+            input_tokens=input_tokens,
+            owners=owners,
+            batches=batches,
+            text_count=len(texts),
+            split_texts=split_texts,
+            truncated_texts=truncated_texts,
+        )
+
+
+def is_input_error(error: BaseException) -> bool:
+    """True for API errors caused by the request's inputs, which splitting the batch can isolate"""
+    return getattr(error, 'status_code', None) in INPUT_ERROR_STATUSES
+
+
+def is_request_error(error: BaseException) -> bool:
+    """
+    True for input errors that no input can cause: the API names a request
+    parameter (model, dimensions, encoding_format) or an unknown model
+
+    Splitting the batch cannot help with these; every half would be rejected
+    the same way. Errors about the inputs themselves often share one generic
+    message ("'$.input' is invalid"), so they are told apart by the error's
+    param and code, not by its message.
+    """
+    return (getattr(error, 'param', None) in REQUEST_ERROR_PARAMS
+            or getattr(error, 'code', None) in REQUEST_ERROR_CODES)
+
+
+def embed_bisecting(texts: List[str], send: Callable[[List[str]], List[List[float]]],
+                    on_failure: Optional[Callable[[int, BaseException], None]] = None,
+                    offset: int = 0) -> List[Optional[List[float]]]:
+    """
+    Embed a batch, splitting it in half recursively when the API rejects its inputs
+
+    Args:
+        texts: Batch of texts
+        send: Sends one request and returns one embedding per text; raises on error
+        on_failure: Called with (index in texts, error) for each input rejected on its own
+        offset: Index of texts[0] in the original batch (used by the recursion)
+
+    Returns:
+        One embedding per text; None for inputs the API rejects on their own
+
+    Raises:
+        Exception: Errors from send that are not input errors (rate limits,
+            connection errors, 5xx) and errors about the request's own
+            parameters (is_request_error) are re-raised without splitting
+    """
+    try:
+        return send(texts)
+    except Exception as e:
+        if not is_input_error(e) or is_request_error(e):
+            raise
+        if len(texts) == 1:
+            if on_failure:
+                on_failure(offset, e)
+            return [None]
+        error = e
+
+    middle = len(texts) // 2
+    logger.warning(f"Batch of {len(texts)} inputs rejected ({error}); "
+                   f"retrying as {middle} + {len(texts) - middle}")
+    return (embed_bisecting(texts[:middle], send, on_failure, offset)
+            + embed_bisecting(texts[middle:], send, on_failure, offset + middle))
+
+
+def dedup_key(text: str) -> str:
+    """Form of a text that duplicates are matched on: NFKC, whitespace runs collapsed, trimmed"""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+@dataclass
+class DedupPlan:
+    """Distinct texts to embed, and which of the original texts share each one"""
+    unique: List[str]  # First occurrence of each distinct text, in order
+    positions: List[int]  # Index into unique for each original text
+
+    @property
+    def duplicates(self) -> int:
+        return len(self.positions) - len(self.unique)
+
+    def members(self) -> List[List[int]]:
+        """Indexes of the original texts that share each unique text"""
+        members: List[List[int]] = [[] for _ in self.unique]
+        for index, position in enumerate(self.positions):
+            members[position].append(index)
+        return members
+
+    def fan_out(self, vectors: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        """Map one vector per unique text back to one per original text"""
+        return [vectors[position] for position in self.positions]
+
+    def tokens_saved(self, count_tokens: Callable[[str], int]) -> int:
+        """Tokens the duplicates would have cost if each were sent"""
+        copies: Dict[int, int] = {}
+        for position in self.positions:
+            copies[position] = copies.get(position, 0) + 1
+        return sum(count_tokens(self.unique[position]) * (count - 1)
+                   for position, count in copies.items() if count > 1)
+
+
+def dedupe_texts(texts: List[str]) -> DedupPlan:
+    """
+    Collapse texts that are identical after normalisation (dedup_key)
+
+    The first occurrence of each text is the one embedded; normalisation only
+    decides which texts count as copies of it.
+
+    Args:
+        texts: Texts to embed, in order
+
+    Returns:
+        DedupPlan whose unique texts keep their first-occurrence order
+    """
+    unique: List[str] = []
+    positions: List[int] = []
+    seen: Dict[str, int] = {}
+
+    for text in texts:
+        key = dedup_key(text)
+        position = seen.get(key)
+        if position is None:
+            position = seen[key] = len(unique)
+            unique.append(text)
+        positions.append(position)
+
+    return DedupPlan(unique=unique, positions=positions)
+
+
+def dedup_report(texts: int, unique_texts: int, tokens_saved: int) -> Dict[str, float]:
+    """Deduplication figures for run summaries and output metadata"""
+    return {
+        'texts': texts,
+        'unique_texts': unique_texts,
+        'duplicates': texts - unique_texts,
+        'dedup_ratio': round(texts / unique_texts, 3) if unique_texts else 1.0,
+        'tokens_saved': tokens_saved,
+    }
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Persistent Embedding Cache
+Content-addressed store of embeddings shared by generate_embeddings.py and
+batch_embeddings_processor.py, so a re-run only pays for text that changed.
+
+Entries are keyed by (model, dimensions, sha256(text)) and kept in one SQLite
+file as float32 blobs, along with the text's token count so hits can be
+reported as tokens and dollars saved. Entries unused for max_age_days, and
+the least recently used entries beyond max_size_mb of vectors, are evicted
+when the cache is closed or when `embedding_cache.py --evict` is run.
+
+Usage:
+    python3 embedding_cache.py
+    python3 embedding_cache.py --evict --max-age-days 90 --max-size-mb 512
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import logging
+from array import array
+from typing import List, Optional, Callable, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH_ENV = "KB_EMBEDDING_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'embedding_cache.sqlite'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    text_sha256 TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, dimensions, text_sha256)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# SQLite's default limit on host parameters per statement is 999 on older builds
+_LOOKUP_BATCH = 500
+
+
+def default_cache_path() -> str:
+    """Cache file shared by the embedding scripts (KB_EMBEDDING_CACHE overrides)"""
+    return os.path.abspath(os.environ.get(CACHE_PATH_ENV) or DEFAULT_CACHE_PATH)
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _price_per_token(model: str) -> float:
+    """Price per token from the cost estimator's table (0 for unknown models)"""
+    from estimate_cost import PRICING
+    return PRICING.get(model, 0.0)
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache for one model and dimension setting"""
+
+    def __init__(self, path: Optional[str] = None, model: str = "text-embedding-3-small",
+                 dimensions: Optional[int] = None, max_age_days: Optional[float] = None,
+                 max_size_mb: Optional[float] = None):
+        """
+        Open (or create) the cache
+
+        Args:
+            path: SQLite file (None uses default_cache_path())
+            model: Embedding model the cached vectors come from
+            dimensions: Requested output dimensions (None for the model's default)
+            max_age_days: Evict entries not used for this many days on close
+            max_size_mb: Evict least recently used entries beyond this many MB of vectors on close
+        """
+        self.path = path or default_cache_path()
+        self.model = model
+        self.dimensions = dimensions or 0
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.price_per_token = _price_per_token(model)
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'tokens_saved': 0, 'evicted': 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self._count_tokens: Optional[Callable[[str], int]] = None
+
+    def _token_counter(self) -> Callable[[str], int]:
+        """Token counter for stored texts, loaded on first store"""
+        if self._count_tokens is None:
+            # Token counts only feed the savings report; fall back to ~4 characters per token
+            try:
+                from tokenizer import get_encoding
+                encoding = get_encoding()
+                self._count_tokens = lambda text: len(encoding.encode(text, disallowed_special=()))
+            except (ImportError, RuntimeError) as e:
+                logger.warning(f"Tokenizer unavailable ({e}); estimating cached tokens at 4 characters/token")
+                self._count_tokens = lambda text: len(text) // 4 + 1
+        return self._count_tokens
+
+    # =========================================================================
+    # LOOKUP AND STORE
+    # =========================================================================
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Cached embedding or None per text, in input order
+        """
+        keys = [text_sha256(text) for text in texts]
+        found: Dict[str, tuple] = {}
+
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), _LOOKUP_BATCH):
+            batch = unique_keys[start:start + _LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_sha256, embedding, tokens FROM embeddings "
+                f"WHERE model = ? AND dimensions = ? AND text_sha256 IN ({placeholders})",
+                (self.model, self.dimensions, *batch)
+            )
+            for key, blob, tokens in rows:
+                found[key] = (blob, tokens)
+
+        results = []
+        for key in keys:
+            if key in found:
+                blob, tokens = found[key]
+                results.append(array('f', blob).tolist())
+                self.stats['hits'] += 1
+                self.stats['tokens_saved'] += tokens
+            else:
+                results.append(None)
+                self.stats['misses'] += 1
+
+        if found:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_sha256 = ?",
+                    [(now, self.model, self.dimensions, key) for key in found]
+                )
+
+        return results
+
+    def put_many(self, texts: List[str], embeddings: List[Optional[List[float]]]):
+        """Store embeddings for texts; None entries are skipped"""
+        now = time.time()
+        count_tokens = self._token_counter()
+        rows = [
+            (self.model, self.dimensions, text_sha256(text), array('f', embedding).tobytes(),
+             count_tokens(text), now, now)
+            for text, embedding in zip(texts, embeddings)
+            if embedding is not None
+        ]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        self.stats['stored'] += len(rows)
+
+    def embed(self, texts: List[str],
+              embed_missing: Callable[[List[str]], Optional[List[Optional[List[float]]]]]
+              ) -> Optional[List[Optional[List[float]]]]:
+        """
+        Serve texts from the cache and embed only the misses
+
+        Args:
+            texts: Texts to embed
+            embed_missing: Called once with the texts that missed; returns one
+                embedding (or None) per text, or None if the whole call failed
+
+        Returns:
+            One embedding (or None) per text in input order, or None if
+            embed_missing failed
+        """
+        embeddings = self.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+
+        missing_texts = [texts[i] for i in missing]
+        fresh = embed_missing(missing_texts)
+        if fresh is None:
+            return None
+
+        self.put_many(missing_texts, fresh)
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+        return embeddings
+
+    # =========================================================================
+    # EVICTION AND REPORTING
+    # =========================================================================
+
+    def evict(self, max_age_days: Optional[float] = None, max_size_mb: Optional[float] = None) -> int:
+        """
+        Remove stale entries, across all models
+
+        Args:
+            max_age_days: Remove entries not used for this many days
+            max_size_mb: Then remove least recently used entries until the
+                stored vectors fit in this many MB
+
+        Returns:
+            Number of entries removed
+        """
+        removed = 0
+        with self.conn:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                removed += self.conn.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+
+            if max_size_mb is not None:
+                removed += self.conn.execute(
+                    """
+                    DELETE FROM embeddings WHERE (model, dimensions, text_sha256) IN (
+                        SELECT model, dimensions, text_sha256 FROM (
+                            SELECT model, dimensions, text_sha256,
+                                   SUM(length(embedding)) OVER (
+                                       ORDER BY last_used DESC, text_sha256
+                                   ) AS kept_bytes
+                            FROM embeddings
+                        ) WHERE kept_bytes > ?
+                    )
+                    """,
+                    (int(max_size_mb * 1024 * 1024),)
+                ).rowcount
+
+        if removed:
+            self.conn.execute("VACUUM")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info(f"Evicted {removed:,} cached embeddings")
+        self.stats['evicted'] += removed
+        return removed
+
+    def summary(self) -> Dict[str, Any]:
+        """Entry count and size of the whole cache file"""
+        entries, vector_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(embedding)), 0) FROM embeddings"
+        ).fetchone()
+        return {
+            'path': self.path,
+            'entries': entries,
+            'vector_mb': round(vector_bytes / (1024 * 1024), 2),
+            'file_mb': round(os.path.getsize(self.path) / (1024 * 1024), 2),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """This run's hit/miss counts and savings"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+            'dollars_saved': round(self.stats['tokens_saved'] * self.price_per_token, 6),
+        }
+
+    def log_stats(self):
+        """Log this run's hits, misses and savings"""
+        report = self.report()
+        logger.info(f"Embedding cache: {report['hits']:,} hits, {report['misses']:,} misses "
+                    f"({report['hit_rate']:.1%} hit rate), {report['tokens_saved']:,} tokens "
+                    f"/ ${report['dollars_saved']:.4f} saved")
+
+    def close(self):
+        """Apply the eviction policy and close the database"""
+        if self.max_age_days is not None or self.max_size_mb is not None:
+            self.evict(self.max_age_days, self.max_size_mb)
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the size of the shared embedding cache, or evict entries')
+    parser.add_argument('--cache', type=str, default=default_cache_path(),
+                        help='Cache file (default: data/embedding_cache.sqlite or KB_EMBEDDING_CACHE)')
+    parser.add_argument('--evict', action='store_true',
+                        help='Remove entries by age and/or size')
+    parser.add_argument('--max-age-days', type=float,
+                        help='With --evict: remove entries unused for this many days')
+    parser.add_argument('--max-size-mb', type=float,
+                        help='With --evict: keep at most this many MB of vectors, least recently used first out')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if not os.path.exists(args.cache):
+        logger.error(f"No embedding cache at {args.cache}")
+        return 1
+
+    cache = EmbeddingCache(args.cache)
+    try:
+        if args.evict:
+            if args.max_age_days is None and args.max_size_mb is None:
+                logger.error("--evict needs --max-age-days and/or --max-size-mb")
+                return 1
+            cache.evict(args.max_age_days, args.max_size_mb)
+
+        summary = cache.summary()
+        print(f"Embedding cache: {summary['path']}")
+        print(f"  Entries:  {summary['entries']:,}")
+        print(f"  Vectors:  {summary['vector_mb']} MB")
+        print(f"  File:     {summary['file_mb']} MB")
+    finally:
+        cache.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
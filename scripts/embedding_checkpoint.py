@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Resumable Embedding Checkpoints
+Append-only record of the chunks generate_embeddings.py has already paid to
+embed, so a crash or Ctrl-C loses at most the checkpoint group in flight
+(--checkpoint-every texts; default batch size x concurrency).
+
+A checkpoint is a directory next to the output:
+
+    <stem>.checkpoint/index.json          Model, dimensions (requested and actual), tokens used,
+                                          row count per segment
+    <stem>.checkpoint/segment-NNNNN.f32   Little-endian float32 vectors, appended per batch
+    <stem>.checkpoint/segment-NNNNN.rows.jsonl   One chunk (without embedding) per vector
+
+Every run appends to a new segment. After each batch the segment files are
+flushed and synced before index.json is replaced, and readers only trust the
+row counts in the index, so a write cut short by a crash is ignored. When the
+run finishes, compaction merges the segments into the normal output and the
+checkpoint is removed.
+
+Usage:
+    python3 generate_embeddings.py --input chunks.jsonl --resume
+    python3 embedding_checkpoint.py data/susan_ai_embeddings.checkpoint
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator
+
+from embedding_store import float32_bytes, float32_values, store_stem
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = "kb-embeddings-checkpoint"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = ".checkpoint"
+INDEX_FILE = "index.json"
+
+
+def checkpoint_dir(output_path: str) -> str:
+    """Checkpoint directory for an output file or store"""
+    return store_stem(output_path) + CHECKPOINT_SUFFIX
+
+
+class EmbeddingCheckpoint:
+    """Append-only segments of embedded chunks with a small JSON index"""
+
+    def __init__(self, directory: str, model: str, dimensions: Optional[int] = None):
+        """
+        Open a checkpoint directory, creating an empty index if there is none
+
+        Args:
+            directory: Checkpoint directory
+            model: Embedding model; resuming a checkpoint made with another model is refused
+            dimensions: Requested embedding length (None for the model's full length);
+                resuming a checkpoint made with another length is refused
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._segment: Optional[Dict[str, Any]] = None  # Segment this run appends to
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+            if self.index.get('format') != CHECKPOINT_FORMAT or self.index.get('version') != CHECKPOINT_VERSION:
+                raise ValueError(f"{self.index_path} is not a version {CHECKPOINT_VERSION} {CHECKPOINT_FORMAT} index")
+            if self.index.get('model') != model:
+                raise ValueError(f"Checkpoint {directory} was made with {self.index.get('model')}, not {model}; "
+                                 f"run without --resume to start over")
+            if self.index.get('requested_dimensions') != dimensions:
+                raise ValueError(f"Checkpoint {directory} was made with dimensions="
+                                 f"{self.index.get('requested_dimensions') or 'full'}, not {dimensions or 'full'}; "
+                                 f"run without --resume to start over")
+        else:
+            self.index = {
+                'format': CHECKPOINT_FORMAT,
+                'version': CHECKPOINT_VERSION,
+                'model': model,
+                'requested_dimensions': dimensions,
+                'dimensions': None,
+                'tokens_used': 0,
+                'segments': [],
+            }
+
+    @property
+    def count(self) -> int:
+        return sum(segment['rows'] for segment in self.index['segments'])
+
+    @property
+    def tokens_used(self) -> int:
+        """API tokens spent on the checkpointed chunks, across all runs"""
+        return self.index['tokens_used']
+
+    def _paths(self, segment: Dict[str, Any]):
+        base = os.path.join(self.directory, segment['name'])
+        return base + '.f32', base + '.rows.jsonl'
+
+    def _write_index(self):
+        self.index['updated'] = datetime.now().isoformat()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    # =========================================================================
+    # APPEND
+    # =========================================================================
+
+    def append(self, chunks: List[Dict[str, Any]], tokens_used: int = 0):
+        """
+        Durably add embedded chunks
+
+        Args:
+            chunks: Chunk dicts with 'embedding' lists
+            tokens_used: API tokens spent on these chunks
+        """
+        if not chunks:
+            return
+
+        dimensions = self.index['dimensions'] or len(chunks[0]['embedding'])
+        for chunk in chunks:
+            if len(chunk['embedding']) != dimensions:
+                raise ValueError(f"Chunk {chunk.get('id')} has {len(chunk['embedding'])} dimensions, "
+                                 f"checkpoint has {dimensions}")
+
+        if self._segment is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._segment = {'name': f"segment-{len(self.index['segments']) + 1:05d}", 'rows': 0}
+            self.index['segments'].append(self._segment)
+            # A run that crashed before its first index write may have left this segment behind
+            for path in self._paths(self._segment):
+                open(path, 'wb').close()
+
+        matrix_path, rows_path = self._paths(self._segment)
+        with open(matrix_path, 'ab') as matrix, open(rows_path, 'a', encoding='utf-8') as rows:
+            for chunk in chunks:
+                matrix.write(float32_bytes(chunk['embedding']))
+                row = {key: value for key, value in chunk.items() if key != 'embedding'}
+                rows.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+            for f in (matrix, rows):
+                f.flush()
+                os.fsync(f.fileno())
+
+        # The index is the commit point: rows past its counts are never read
+        self._segment['rows'] += len(chunks)
+        self.index['dimensions'] = dimensions
+        self.index['tokens_used'] += tokens_used
+        self._write_index()
+
+    # =========================================================================
+    # READ AND COMPACT
+    # =========================================================================
+
+    def chunks(self) -> Iterator[Dict[str, Any]]:
+        """Checkpointed chunks with embeddings, in the order they were appended"""
+        dimensions = self.index['dimensions']
+        for segment in self.index['segments']:
+            if not segment['rows']:
+                continue
+            matrix_path, rows_path = self._paths(segment)
+            with open(matrix_path, 'rb') as matrix, open(rows_path, 'r', encoding='utf-8') as rows:
+                for _ in range(segment['rows']):
+                    row = json.loads(rows.readline())
+                    row['embedding'] = float32_values(matrix.read(dimensions * 4)).tolist()
+                    yield row
+
+    def completed(self) -> Dict[str, str]:
+        """Text of every checkpointed chunk, by chunk id"""
+        done = {}
+        for segment in self.index['segments']:
+            if not segment['rows']:
+                continue
+            with open(self._paths(segment)[1], 'r', encoding='utf-8') as rows:
+                for _ in range(segment['rows']):
+                    row = json.loads(rows.readline())
+                    done[row['id']] = row.get('text')
+        return done
+
+    def compact(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge the segments into one list of embedded chunks
+
+        Args:
+            chunks: Input chunks; the result follows their order, and the
+                latest checkpointed embedding wins for a repeated id
+
+        Returns:
+            Embedded chunks for every input chunk that has one
+        """
+        embedded = {chunk['id']: chunk for chunk in self.chunks()}
+        return [embedded[chunk['id']] for chunk in chunks if chunk['id'] in embedded]
+
+    def remove(self):
+        """Delete the checkpoint directory"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the progress recorded in an embedding checkpoint')
+    parser.add_argument('checkpoint', help='Checkpoint directory, or the output path it belongs to')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    directory = args.checkpoint
+    if not directory.rstrip('/').endswith(CHECKPOINT_SUFFIX):
+        directory = checkpoint_dir(directory)
+    index_path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(index_path):
+        logger.error(f"No checkpoint at {directory}")
+        return 1
+
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+
+    print(f"Checkpoint: {directory}")
+    print(f"  Model:      {index['model']}")
+    print(f"  Dimensions: {index['dimensions']}")
+    print(f"  Chunks:     {sum(segment['rows'] for segment in index['segments']):,} "
+          f"in {len(index['segments'])} segments")
+    print(f"  Tokens:     {index['tokens_used']:,}")
+    print(f"  Updated:    {index.get('updated')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Async Embedding Engine
+Keeps several embedding requests in flight at once instead of sending one
+batch, waiting for it, and sleeping. Requests are paced by the account's
+requests-per-minute and tokens-per-minute budgets, so throughput is set by
+the rate limits rather than by round-trip latency.
+
+- RPM and TPM token buckets refill continuously; a batch waits until both
+  have room for it.
+- A 429 pauses every request until its Retry-After (or retry-after-ms) has
+  passed. Connection errors, timeouts and 5xx responses back off
+  exponentially with full jitter.
+- Texts are packed into requests by token budget (embedding_batches.py).
+- A batch the API rejects because of its inputs is split in half and the
+  halves sent concurrently, recursively, until the bad inputs are isolated.
+  They come back as None and are listed in failed_inputs with the API error.
+- Results are returned in the order of the input texts.
+
+Usage:
+    engine = AsyncEmbeddingEngine(api_key, model="text-embedding-3-small")
+    embeddings = engine.embed(texts)      # From synchronous code
+    embeddings = await engine.embed_async(texts)
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import List, Dict, Optional, Callable
+
+from embedding_batches import TokenBudgetBatcher, is_input_error, is_request_error
+from embedding_store import native_dimensions, reduce_dimensions
+
+logger = logging.getLogger(__name__)
+
+# Tier 1 limits for text-embedding-3-small; raise them to match the account
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_REQUESTS_PER_MINUTE = 3_000
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30.0  # seconds
+
+
+class TokenBucket:
+    """Token bucket holding up to one minute of budget, refilled continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """
+        Wait until amount can be taken from the bucket, then take it
+
+        Requests larger than the whole bucket wait for a full bucket instead
+        of waiting forever.
+        """
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                await asyncio.sleep((amount - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+
+def _retry_after_seconds(error) -> Optional[float]:
+    """Delay requested by a rate-limit response, from retry-after-ms or Retry-After"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    for header, scale in (('retry-after-ms', 0.001), ('retry-after', 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(float(value) * scale, 0.0)
+        except ValueError:
+            continue  # HTTP-date form; fall back to our own backoff
+    return None
+
+
+class AsyncEmbeddingEngine:
+    """Embeds texts with concurrent, rate-limited OpenAI requests"""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "text-embedding-3-small",
+                 batcher: Optional[TokenBudgetBatcher] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_url: Optional[str] = None,
+                 dimensions: Optional[int] = None):
+        """
+        Initialize the engine
+
+        Args:
+            api_key: OpenAI API key (None reads OPENAI_API_KEY)
+            model: Embedding model to use
+            batcher: Packs texts into requests by token budget (default TokenBudgetBatcher())
+            concurrency: Maximum number of requests in flight
+            tokens_per_minute: Token budget per minute (TPM limit)
+            requests_per_minute: Request budget per minute (RPM limit)
+            max_retries: Retries per request for rate limits and transient errors
+            base_url: API base URL (None uses OPENAI_BASE_URL or the OpenAI default)
+            dimensions: Shorten embeddings to this many components (by the API for
+                text-embedding-3 models, otherwise truncated and renormalised here)
+        """
+        try:
+            import openai
+        except ImportError as e:
+            raise ImportError("openai library not installed. Install with: pip install openai") from e
+
+        self._openai = openai
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.dimensions = dimensions
+        self._request_options = {'dimensions': dimensions} if dimensions and native_dimensions(model) else {}
+        self.batcher = batcher or TokenBudgetBatcher()
+        self.concurrency = max(1, concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self.total_tokens_used = 0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'retries': 0, 'bisections': 0, 'failed_texts': 0}
+        self.failed_inputs: List[Dict[str, str]] = []  # Texts that could not be embedded, with the error
+        self._paused_until = 0.0
+
+    # =========================================================================
+    # REQUESTS
+    # =========================================================================
+
+    async def _wait_for_pause(self):
+        """Sleep while a Retry-After pause from any request is in effect"""
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _request(self, client, texts: List[str], tokens: int) -> List[List[float]]:
+        """
+        Send one embeddings request, retrying rate limits and transient errors
+
+        Raises:
+            openai.OpenAIError: Non-retryable error, or retries exhausted
+        """
+        openai = self._openai
+        attempt = 0
+
+        while True:
+            await self._wait_for_pause()
+            await self._requests.acquire(1)
+            await self._tokens.acquire(tokens)
+
+            try:
+                async with self._in_flight:
+                    self.stats['requests'] += 1
+                    response = await client.embeddings.create(input=texts, model=self.model,
+                                                              **self._request_options)
+            except openai.RateLimitError as e:
+                self.stats['rate_limited'] += 1
+                retry_after = _retry_after_seconds(e)
+                delay = self._backoff(attempt) if retry_after is None else retry_after + random.uniform(0, 0.25)
+                # Everyone waits out the server's pause, not just this request
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                error = e
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                # APITimeoutError is an APIConnectionError
+                delay = self._backoff(attempt)
+                error = e
+            else:
+                self.total_tokens_used += response.usage.total_tokens
+                data = sorted(response.data, key=lambda item: item.index)
+                return [reduce_dimensions(item.embedding, self.dimensions) for item in data]
+
+            if attempt >= self.max_retries:
+                raise error
+            attempt += 1
+            self.stats['retries'] += 1
+            logger.warning(f"Embedding request failed ({type(error).__name__}); "
+                           f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def _record_failure(self, text: str, error: BaseException):
+        self.failed_inputs.append({'text': text, 'error': str(error)})
+        self.stats['failed_texts'] += 1
+
+    async def _embed_batch(self, client, texts: List[str], counts: List[int],
+                           owners: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed one batch (counts: tokens per text; owners: text to report each failure under)
+
+        A batch rejected because of its inputs is split in half and both halves
+        are sent concurrently, until each bad input is isolated. A rejection
+        of the request's own parameters (is_request_error) and any other error
+        that outlasts the retries fail the whole batch.
+        """
+        try:
+            return await self._request(client, texts, sum(counts))
+        except self._openai.OpenAIError as e:
+            if not is_input_error(e) or is_request_error(e):
+                return self._fail_batch(owners, e)
+            if len(texts) == 1:
+                logger.error(f"Input rejected by the API: {e} (text: {owners[0][:80]!r})")
+                self._record_failure(owners[0], e)
+                return [None]
+            error = e
+
+        middle = len(texts) // 2
+        self.stats['bisections'] += 1
+        logger.warning(f"Batch of {len(texts)} inputs rejected ({error}); "
+                       f"retrying as {middle} + {len(texts) - middle}")
+        left, right = await asyncio.gather(
+            self._embed_batch(client, texts[:middle], counts[:middle], owners[:middle]),
+            self._embed_batch(client, texts[middle:], counts[middle:], owners[middle:]),
+        )
+        return left + right
+
+    def _fail_batch(self, owners: List[str], error: BaseException) -> List[None]:
+        """Record every text of a failed batch and return no embeddings for it"""
+        logger.error(f"Error generating batch embeddings: {error}")
+        for owner in owners:
+            self._record_failure(owner, error)
+        return [None] * len(owners)
+
+    async def embed_async(self, texts: List[str],
+                          on_batch: Optional[Callable[[int, int], None]] = None) -> List[Optional[List[float]]]:
+        """
+        Embed texts with up to `concurrency` requests in flight
+
+        Texts are packed into requests by the batcher, which also splits or
+        truncates texts over the per-input token limit.
+
+        Args:
+            texts: Texts to embed
+            on_batch: Called with (inputs done, total inputs) as each batch finishes
+
+        Returns:
+            One embedding (or None if it could not be generated) per text, in input order
+        """
+        if not texts:
+            return []
+
+        # Primitives are created here so they belong to the running event loop
+        self._in_flight = asyncio.Semaphore(self.concurrency)
+        self._requests = TokenBucket(self.requests_per_minute)
+        self._tokens = TokenBucket(self.tokens_per_minute)
+
+        plan = self.batcher.plan(texts)
+        results: List[Optional[List[float]]] = [None] * len(plan.inputs)
+        done = 0
+
+        client = self._openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+
+        async def run(start: int, end: int):
+            nonlocal done
+            results[start:end] = await self._embed_batch(
+                client, plan.inputs[start:end], plan.input_tokens[start:end],
+                [texts[owner] for owner in plan.owners[start:end]]
+            )
+            done += end - start
+            if on_batch:
+                on_batch(done, len(plan.inputs))
+
+        try:
+            await asyncio.gather(*(run(start, end) for start, end in plan.batches))
+        finally:
+            await client.close()
+
+        return plan.combine(results)
+
+    def embed(self, texts: List[str],
+              on_batch: Optional[Callable[[int, int], None]] = None) -> List[Optional[List[float]]]:
+        """Synchronous wrapper around embed_async"""
+        return asyncio.run(self.embed_async(texts, on_batch))
+
+    def log_stats(self):
+        """Log request, rate-limit and retry counts"""
+        stats = self.stats
+        logger.info(f"Embedding requests: {stats['requests']} "
+                    f"({stats['rate_limited']} rate limited, {stats['retries']} retries, "
+                    f"{stats['bisections']} bisections, {stats['failed_texts']} texts failed)")
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Binary Embedding Store
+Compact on-disk format for embedded chunks, an alternative to the pretty-printed
+JSON that generate_embeddings.py writes by default (--output-format binary
+writes a store instead). A store named <stem> is three files:
+
+    <stem>.header.json   Small header: format, model, dimensions, dtype, count, metadata
+    <stem>.f32           count x dimensions little-endian matrix, row-major
+    <stem>.rows.jsonl    One JSON object per matrix row: the chunk without its embedding
+
+The matrix is about a quarter of the size of the same vectors as JSON text and
+is memory-mapped on load, so opening a store costs almost nothing until rows
+are read. lib/rag-service.ts reads the same files.
+
+Smaller matrices trade a little recall for memory and scan time:
+- dtype 'float16' (<stem>.f16) halves the matrix.
+- dtype 'int8' (<stem>.i8) quarters it: each row is scaled so its largest
+  component maps to 127, and the per-row scales are kept in <stem>.scales.f32.
+  Cosine similarity does not depend on a row's scale, so the int8 values can
+  be searched directly.
+- Fewer dimensions: text-embedding-3 vectors can be cut to their first N
+  components and renormalised (reduce_dimensions), which is what the API's
+  `dimensions` parameter returns.
+
+`recall` measures what each setting costs on the store's own vectors.
+
+Usage:
+    python3 embedding_store.py convert data/susan_ai_embeddings.json
+    python3 embedding_store.py convert data/susan_ai_embeddings --output data/kb_512_int8 --dimensions 512 --dtype int8
+    python3 embedding_store.py info data/susan_ai_embeddings
+    python3 embedding_store.py recall data/susan_ai_embeddings --dimensions 256 512 1536
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import random
+import struct
+import argparse
+import logging
+from array import array
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Sequence
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT = "kb-embeddings"
+STORE_VERSION = 1
+HEADER_SUFFIX = ".header.json"
+MATRIX_SUFFIX = ".f32"
+ROWS_SUFFIX = ".rows.jsonl"
+SCALES_SUFFIX = ".scales.f32"
+
+# Matrix file suffix and bytes per component for each dtype
+DTYPES = {
+    'float32': (MATRIX_SUFFIX, 4),
+    'float16': (".f16", 2),
+    'int8': (".i8", 1),
+}
+
+_SUFFIXES = (HEADER_SUFFIX, ROWS_SUFFIX, SCALES_SUFFIX, ".f32", ".f16", ".i8", ".json")
+
+
+def store_stem(path: str) -> str:
+    """Store stem for any of its file paths, or for the JSON file it replaces"""
+    for suffix in _SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def store_paths(stem: str, dtype: str = 'float32') -> Tuple[str, str, str]:
+    """(header, matrix, rows) paths of a store"""
+    return stem + HEADER_SUFFIX, stem + DTYPES[dtype][0], stem + ROWS_SUFFIX
+
+
+def store_files(path: str) -> List[str]:
+    """Every file of an existing store, as listed in its header"""
+    header_path = store_paths(store_stem(path))[0]
+    with open(header_path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    directory = os.path.dirname(header_path)
+    names = [header.get('matrix'), header.get('rows'), header.get('scales')]
+    return [header_path] + [os.path.join(directory, name) for name in names if name]
+
+
+def store_exists(path: str) -> bool:
+    return os.path.exists(store_paths(store_stem(path))[0])
+
+
+def float32_bytes(vector) -> bytes:
+    """Vector as little-endian float32 bytes"""
+    values = array('f', vector)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def float32_values(data: bytes) -> array:
+    """Little-endian float32 bytes as an array of floats"""
+    values = array('f', data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def native_dimensions(model: str) -> bool:
+    """True if the API can shorten this model's embeddings itself (the `dimensions` parameter)"""
+    return model.startswith('text-embedding-3')
+
+
+def reduce_dimensions(vector: Sequence[float], dimensions: Optional[int]) -> Sequence[float]:
+    """
+    Keep the first `dimensions` components and rescale to unit length
+
+    Matches the API's `dimensions` parameter for text-embedding-3 models.
+    Vectors already that short are returned unchanged.
+    """
+    if not dimensions or len(vector) <= dimensions:
+        return vector
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(value * value for value in head)) or 1.0
+    return [value / norm for value in head]
+
+
+def quantize_int8(vector: Sequence[float]) -> Tuple[bytes, float]:
+    """Symmetric int8 quantization: (bytes, scale) with vector ~= int8 values * scale"""
+    scale = max(max(vector, default=0.0), -min(vector, default=0.0)) / 127 or 1.0
+    inverse = 1.0 / scale  # |value * inverse| <= 127, so no clamping is needed
+    return array('b', [round(value * inverse) for value in vector]).tobytes(), scale
+
+
+def _encode_row(vector: Sequence[float], dtype: str) -> Tuple[bytes, Optional[float]]:
+    """Matrix bytes for one row, and its scale for int8"""
+    if dtype == 'float32':
+        return float32_bytes(vector), None
+    if dtype == 'float16':
+        return struct.pack(f'<{len(vector)}e', *vector), None
+    return quantize_int8(vector)
+
+
+# =============================================================================
+# WRITE
+# =============================================================================
+
+def write_store(path: str, chunks: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None,
+                model: Optional[str] = None, dtype: str = 'float32',
+                dimensions: Optional[int] = None) -> str:
+    """
+    Write chunks with embeddings as a binary store
+
+    The header is written last, so a reader never sees a header for a partly
+    written matrix.
+
+    Args:
+        path: Store stem (a .json or store file path is reduced to its stem)
+        chunks: Chunk dicts, each with an 'embedding' list
+        metadata: Run metadata kept in the header
+        model: Embedding model (default: metadata['embedding_model'])
+        dtype: 'float32', 'float16' or 'int8' (per-row scales)
+        dimensions: Shorten longer embeddings to this many components (see reduce_dimensions)
+
+    Returns:
+        Path of the header file
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {list(DTYPES)}, got {dtype!r}")
+
+    metadata = dict(metadata or {})
+    stem = store_stem(path)
+    header_path, matrix_path, rows_path = store_paths(stem, dtype)
+    scales_path = stem + SCALES_SUFFIX if dtype == 'int8' else None
+    os.makedirs(os.path.dirname(os.path.abspath(header_path)), exist_ok=True)
+
+    if chunks:
+        dimensions = min(dimensions or len(chunks[0]['embedding']), len(chunks[0]['embedding']))
+    else:
+        dimensions = 0
+    tmp_suffix = f".{os.getpid()}.tmp"
+    outputs = [matrix_path, rows_path] + ([scales_path] if scales_path else [])
+    scales = array('f')
+
+    try:
+        with open(matrix_path + tmp_suffix, 'wb') as matrix, \
+                open(rows_path + tmp_suffix, 'w', encoding='utf-8') as rows:
+            for chunk in chunks:
+                embedding = reduce_dimensions(chunk['embedding'], dimensions)
+                if len(embedding) != dimensions:
+                    raise ValueError(f"Chunk {chunk.get('id')} has {len(embedding)} dimensions, "
+                                     f"expected {dimensions}")
+                data, scale = _encode_row(embedding, dtype)
+                matrix.write(data)
+                if scale is not None:
+                    scales.append(scale)
+                row = {key: value for key, value in chunk.items() if key != 'embedding'}
+                rows.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+        if scales_path:
+            with open(scales_path + tmp_suffix, 'wb') as f:
+                f.write(float32_bytes(scales))
+    except BaseException:
+        for output in outputs:
+            if os.path.exists(output + tmp_suffix):
+                os.remove(output + tmp_suffix)
+        raise
+
+    header = {
+        'format': STORE_FORMAT,
+        'version': STORE_VERSION,
+        'model': model or metadata.get('embedding_model'),
+        'dimensions': dimensions,
+        'count': len(chunks),
+        'dtype': dtype,
+        'byte_order': 'little',
+        'matrix': os.path.basename(matrix_path),
+        'rows': os.path.basename(rows_path),
+        'metadata': metadata,
+    }
+    if scales_path:
+        header['scales'] = os.path.basename(scales_path)
+
+    for output in outputs:
+        os.replace(output + tmp_suffix, output)
+    with open(header_path + tmp_suffix, 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2, ensure_ascii=False)
+    os.replace(header_path + tmp_suffix, header_path)
+
+    return header_path
+
+
+# =============================================================================
+# READ
+# =============================================================================
+
+class EmbeddingStore:
+    """Read-only view of a binary store; the matrix is memory-mapped"""
+
+    def __init__(self, path: str):
+        """
+        Open a store
+
+        Args:
+            path: Store stem, or any of its file paths
+        """
+        header_path, matrix_path, rows_path = store_paths(store_stem(path))
+        with open(header_path, 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+
+        if self.header.get('format') != STORE_FORMAT or self.header.get('version') != STORE_VERSION:
+            raise ValueError(f"{header_path} is not a version {STORE_VERSION} {STORE_FORMAT} header")
+
+        directory = os.path.dirname(header_path)
+        self.matrix_path = os.path.join(directory, self.header.get('matrix') or os.path.basename(matrix_path))
+        self.rows_path = os.path.join(directory, self.header.get('rows') or os.path.basename(rows_path))
+        self.count = self.header['count']
+        self.dimensions = self.header['dimensions']
+        self.dtype = self.header.get('dtype', 'float32')
+        self.model = self.header.get('model')
+        self.metadata = self.header.get('metadata', {})
+        self._rows: Optional[List[Dict[str, Any]]] = None
+
+        if self.dtype not in DTYPES:
+            raise ValueError(f"{header_path} has unsupported dtype {self.dtype!r}")
+
+        expected = self.count * self.dimensions * DTYPES[self.dtype][1]
+        actual = os.path.getsize(self.matrix_path)
+        if actual != expected:
+            raise ValueError(f"{self.matrix_path} holds {actual} bytes, header expects {expected}")
+
+        if sys.byteorder == 'big':
+            raise NotImplementedError("Reading little-endian stores on big-endian hosts is not supported")
+
+        self.scales: Optional[array] = None
+        if self.dtype == 'int8':
+            with open(os.path.join(directory, self.header['scales']), 'rb') as f:
+                self.scales = float32_values(f.read())
+            if len(self.scales) != self.count:
+                raise ValueError(f"{self.header['scales']} has {len(self.scales)} scales, header expects {self.count}")
+
+        self._file = open(self.matrix_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if expected else None
+        # memoryview has no float16 format; float16 rows are unpacked with struct
+        self._view = memoryview(self._mmap if self._mmap is not None else b'')
+        if self.dtype != 'float16':
+            self._view = self._view.cast('f' if self.dtype == 'float32' else 'b')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def vector(self, index: int) -> Sequence[float]:
+        """
+        Row `index` of the matrix as floats
+
+        float32 rows are views into the mapped file; float16 and int8 rows are
+        decoded (int8 rows multiplied by their scale).
+        """
+        start = index * self.dimensions
+        if self.dtype == 'float32':
+            return self._view[start:start + self.dimensions]
+        if self.dtype == 'float16':
+            return struct.unpack_from(f'<{self.dimensions}e', self._view, start * 2)
+        scale = self.scales[index]
+        return [value * scale for value in self._view[start:start + self.dimensions]]
+
+    def matrix(self):
+        """
+        Whole matrix as a (count, dimensions) float32 numpy array
+
+        float32 stores are backed by the mapped file; float16 and int8 stores
+        are decoded into memory.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("numpy not installed. Install with: pip install numpy") from e
+        if self.dtype == 'float32':
+            return np.frombuffer(self._view, dtype='<f4').reshape(self.count, self.dimensions)
+        if self.dtype == 'float16':
+            return np.frombuffer(self._view, dtype='<f2').reshape(self.count, self.dimensions).astype(np.float32)
+        values = np.frombuffer(self._view, dtype=np.int8).reshape(self.count, self.dimensions)
+        return values.astype(np.float32) * np.asarray(self.scales, dtype=np.float32)[:, None]
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        """Chunk metadata rows aligned with the matrix, read on first use"""
+        if self._rows is None:
+            with open(self.rows_path, 'r', encoding='utf-8') as f:
+                self._rows = [json.loads(line) for line in f if line.strip()]
+            if len(self._rows) != self.count:
+                raise ValueError(f"{self.rows_path} has {len(self._rows)} rows, header expects {self.count}")
+        return self._rows
+
+    def chunks(self) -> Iterator[Dict[str, Any]]:
+        """Chunk dicts with 'embedding' lists, as in the JSON output"""
+        for index, row in enumerate(self.rows):
+            yield {**row, 'embedding': list(self.vector(index))}
+
+    def close(self):
+        """Release the mapping, unless arrays from matrix() still use it; it then goes with them"""
+        try:
+            self._view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def convert_json(json_path: str, stem: Optional[str] = None, dtype: str = 'float32',
+                 dimensions: Optional[int] = None) -> str:
+    """
+    Convert a {"metadata", "chunks"} embeddings JSON file to a binary store
+
+    Args:
+        json_path: Existing embeddings JSON
+        stem: Store stem (default: the JSON path without .json)
+        dtype: Matrix dtype of the new store
+        dimensions: Shorten embeddings to this many components
+
+    Returns:
+        Path of the header file
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return write_store(stem or store_stem(json_path), data.get('chunks', []), data.get('metadata', {}),
+                       dtype=dtype, dimensions=dimensions)
+
+
+def measure_recall(store: EmbeddingStore, dimensions: List[int], dtypes: List[str],
+                   queries: int = 200, k: int = 10, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Recall@k of shortened and quantized copies of a store against the store itself
+
+    A sample of the store's own vectors are the queries. The reference
+    neighbours come from the store as it is (use a float32, full-dimension
+    store); each candidate shortens corpus and queries to `dimensions` and
+    round-trips the corpus through `dtype`. Queries stay float32, as they
+    come from the API at search time.
+
+    Returns:
+        One {'dimensions', 'dtype', 'bytes_per_vector', 'recall'} dict per candidate
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("numpy not installed. Install with: pip install numpy") from e
+
+    def normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def round_trip(matrix, dtype):
+        if dtype == 'float16':
+            return matrix.astype(np.float16).astype(np.float32)
+        if dtype == 'int8':
+            scales = np.abs(matrix).max(axis=1, keepdims=True) / 127
+            scales[scales == 0] = 1.0
+            return np.clip(np.round(matrix / scales), -127, 127) * scales
+        return matrix
+
+    sample = random.Random(seed).sample(range(store.count), min(queries, store.count))
+    k = min(k, store.count - 1)
+
+    def neighbours(corpus, query_vectors):
+        scores = query_vectors @ normalize(corpus).T
+        scores[np.arange(len(sample)), sample] = -np.inf  # A query is not its own neighbour
+        return np.argpartition(-scores, k, axis=1)[:, :k]
+
+    full = normalize(store.matrix().astype(np.float32))
+    reference = neighbours(full, full[sample])
+
+    results = []
+    for size in dimensions:
+        reduced = normalize(full[:, :size])
+        for dtype in dtypes:
+            found = neighbours(round_trip(reduced, dtype), reduced[sample])
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference, found)])
+            results.append({
+                'dimensions': size,
+                'dtype': dtype,
+                'bytes_per_vector': size * DTYPES[dtype][1] + (4 if dtype == 'int8' else 0),
+                'recall': float(recall),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert, inspect or measure binary embedding stores')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert_parser = subparsers.add_parser('convert', help='Write a store from an embeddings JSON file or another store')
+    convert_parser.add_argument('input', help='Embeddings JSON file ({"metadata", "chunks"}) or store')
+    convert_parser.add_argument('--output', help='Store stem (default: input path without .json)')
+    convert_parser.add_argument('--dtype', choices=list(DTYPES), default='float32',
+                                help='Matrix dtype (default: float32)')
+    convert_parser.add_argument('--dimensions', type=int,
+                                help='Shorten embeddings to this many components and renormalise')
+
+    info_parser = subparsers.add_parser('info', help='Show a store header and time opening it')
+    info_parser.add_argument('store', help='Store stem or any of its files')
+
+    recall_parser = subparsers.add_parser('recall', help='Recall@k of smaller dimensions/dtypes against a float32 store')
+    recall_parser.add_argument('store', help='Full-precision store stem or any of its files')
+    recall_parser.add_argument('--dimensions', type=int, nargs='+',
+                               help='Dimensions to try (default: 256, 512, 1024 and the store\'s own)')
+    recall_parser.add_argument('--dtypes', choices=list(DTYPES), nargs='+', default=list(DTYPES),
+                               help='Dtypes to try (default: all)')
+    recall_parser.add_argument('--queries', type=int, default=200, help='Stored vectors used as queries (default: 200)')
+    recall_parser.add_argument('--k', type=int, default=10, help='Neighbours compared per query (default: 10)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.command == 'convert':
+        if store_exists(args.input) and not args.input.endswith('.json'):
+            if not args.output or store_stem(args.output) == store_stem(args.input):
+                parser.error("converting a store needs an --output stem of its own")
+            with EmbeddingStore(args.input) as source:
+                header_path = write_store(args.output, list(source.chunks()), source.metadata, source.model,
+                                          dtype=args.dtype, dimensions=args.dimensions)
+            source_bytes = sum(os.path.getsize(p) for p in store_files(args.input))
+        else:
+            header_path = convert_json(args.input, args.output, args.dtype, args.dimensions)
+            source_bytes = os.path.getsize(args.input)
+        store_bytes = sum(os.path.getsize(p) for p in store_files(header_path))
+        print(f"Wrote {header_path}")
+        print(f"  Input: {source_bytes / (1024 * 1024):.2f} MB")
+        print(f"  Store: {store_bytes / (1024 * 1024):.2f} MB ({source_bytes / max(store_bytes, 1):.1f}x smaller)")
+        return 0
+
+    if args.command == 'recall':
+        with EmbeddingStore(args.store) as store:
+            if store.dtype != 'float32':
+                logger.warning(f"{args.store} is {store.dtype}; recall is measured against it, not full precision")
+            dimensions = args.dimensions or sorted({d for d in (256, 512, 1024) if d < store.dimensions}
+                                                   | {store.dimensions})
+            dimensions = [d for d in dimensions if d <= store.dimensions]
+            results = measure_recall(store, dimensions, args.dtypes, args.queries, args.k)
+            full_bytes = store.dimensions * 4
+
+        print(f"Recall@{args.k} against {store.dimensions}-dimension {store.dtype}, "
+              f"{min(args.queries, store.count)} queries from {store.count:,} vectors")
+        print(f"{'dims':>6} {'dtype':>8} {'bytes/vec':>10} {'smaller':>8} {'recall':>8}")
+        for result in results:
+            print(f"{result['dimensions']:>6} {result['dtype']:>8} {result['bytes_per_vector']:>10,} "
+                  f"{full_bytes / result['bytes_per_vector']:>7.1f}x {result['recall']:>8.3f}")
+        return 0
+
+    start = time.perf_counter()
+    with EmbeddingStore(args.store) as store:
+        opened = time.perf_counter() - start
+        print(f"Store:      {store_stem(args.store)}")
+        print(f"Model:      {store.model}")
+        print(f"Dimensions: {store.dimensions}")
+        print(f"Dtype:      {store.dtype}")
+        print(f"Count:      {store.count:,}")
+        print(f"Opened in   {opened * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+OpenAI-Compatible Embeddings Stub Server
+Serves POST /v1/embeddings with deterministic vectors so generate_embeddings.py,
+batch_embeddings_processor.py and benchmark_ingest.py can run offline, without
+an API key and without spending tokens.
+
+- Each text's vector is seeded from its SHA-256 and scaled to unit length, so a
+  text always gets the same embedding and different texts are close to
+  orthogonal. `dimensions` is honoured, and `encoding_format` may be float or
+  base64 (the openai client asks for base64 by default).
+- usage.prompt_tokens / total_tokens are counted with the same cl100k_base
+  encoding as tokenizer.py, and only successful requests are counted.
+- Requests the real API refuses get a 400: empty inputs, inputs over 8,191
+  tokens, more than 2,048 inputs or 300,000 tokens in one request, inputs
+  containing the --reject-text marker (all with the same generic message),
+  and `dimensions` out of range (param 'dimensions').
+- Latency is simulated as a fixed delay plus a per-1K-token delay, with jitter.
+  A fraction of requests can be answered with 429 (with retry-after-ms and
+  Retry-After headers) or 500.
+- GET /stats returns request, token and error counters and latency
+  percentiles; POST /stats/reset zeroes them.
+
+Usage:
+    python3 embedding_stub_server.py --port 8765 --latency-ms 80 --rate-limit-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python3 generate_embeddings.py ...
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Optional, Tuple
+
+from embedding_batches import MAX_INPUT_TOKENS, MAX_REQUEST_TOKENS, MAX_REQUEST_ITEMS
+from tokenizer import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Full-length vectors of the models the scripts use
+MODEL_DIMENSIONS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+DEFAULT_DIMENSIONS = 1536
+
+
+class StubError(Exception):
+    """An API error response: HTTP status, OpenAI error type, message and the request parameter at fault"""
+
+    def __init__(self, status: int, error_type: str, message: str, headers: Optional[Dict[str, str]] = None,
+                 param: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.error_type = error_type
+        self.headers = headers or {}
+        self.param = param
+
+
+class EmbeddingStub:
+    """Deterministic embeddings with simulated latency, rate limits and failures"""
+
+    def __init__(self, latency_ms: float = 50.0, latency_per_1k_tokens_ms: float = 0.0, jitter: float = 0.2,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, retry_after_ms: int = 500,
+                 reject_text: Optional[str] = None, seed: int = 0):
+        """
+        Initialize the stub
+
+        Args:
+            latency_ms: Fixed delay per request
+            latency_per_1k_tokens_ms: Extra delay per 1,000 input tokens
+            jitter: Delays are scaled by a random factor in [1 - jitter, 1 + jitter]
+            rate_limit_rate: Fraction of requests answered with 429
+            error_rate: Fraction of requests answered with 500
+            retry_after_ms: Delay advertised on 429 responses
+            reject_text: Inputs containing this text are refused with 400
+            seed: Seed for latency jitter and injected failures (vectors do not depend on it)
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("numpy not installed. Install with: pip install numpy") from e
+
+        self._np = np
+        self.latency_ms = latency_ms
+        self.latency_per_1k_tokens_ms = latency_per_1k_tokens_ms
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after_ms = retry_after_ms
+        self.reject_text = reject_text
+        self.encoding = get_encoding()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'inputs': 0, 'tokens': 0, 'rate_limited': 0,
+                          'server_errors': 0, 'rejected': 0}
+            self._latencies: List[float] = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus p50 / p95 / max latency of successful requests, in milliseconds"""
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._latencies)
+        for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95)):
+            stats[name] = round(latencies[int(fraction * (len(latencies) - 1))] * 1000, 1) if latencies else None
+        stats['max_ms'] = round(latencies[-1] * 1000, 1) if latencies else None
+        return stats
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    # =========================================================================
+    # EMBEDDINGS
+    # =========================================================================
+
+    def vector(self, text: str, dimensions: int):
+        """Unit-length float32 vector seeded by the text"""
+        np = self._np
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(dimensions, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _tokenize(self, inputs: List[Any]) -> Tuple[List[str], List[int]]:
+        """Texts (token arrays are keyed by their ids) and token counts for each input"""
+        texts, counts = [], []
+        for item in inputs:
+            if isinstance(item, str):
+                texts.append(item)
+                counts.append(len(self.encoding.encode(item, disallowed_special=())))
+            else:
+                texts.append(' '.join(map(str, item)))
+                counts.append(len(item))
+        return texts, counts
+
+    def _validate(self, inputs: List[Any], texts: List[str], counts: List[int], dimensions: int,
+                  full_dimensions: int):
+        """Refuse the request the way the API would"""
+        def invalid(message: str, param: Optional[str] = None):
+            self._count('rejected')
+            return StubError(400, 'invalid_request_error', message, param=param)
+
+        if not inputs:
+            raise invalid("'input' must not be empty")
+        if len(inputs) > MAX_REQUEST_ITEMS:
+            raise invalid(f"'input' must have at most {MAX_REQUEST_ITEMS} items, got {len(inputs)}")
+        if sum(counts) > MAX_REQUEST_TOKENS:
+            raise invalid(f"Requested {sum(counts):,} tokens, max {MAX_REQUEST_TOKENS:,} tokens per request")
+        if not 1 <= dimensions <= full_dimensions:
+            raise invalid(f"'dimensions' must be between 1 and {full_dimensions}, got {dimensions}", 'dimensions')
+
+        for index, (item, text, count) in enumerate(zip(inputs, texts, counts)):
+            if not item:
+                raise invalid(f"'$.input[{index}]' must not be empty")
+            if count > MAX_INPUT_TOKENS:
+                raise invalid(f"This model's maximum context length is {MAX_INPUT_TOKENS} tokens, "
+                              f"however you requested {count} tokens ($.input[{index}])")
+            if self.reject_text and self.reject_text in text:
+                raise invalid("'$.input' is invalid")
+
+    def embed(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer one embeddings request
+
+        Args:
+            body: Parsed request JSON (input, model, dimensions, encoding_format)
+
+        Returns:
+            Response JSON in the API's format
+
+        Raises:
+            StubError: Invalid request, or an injected 429 / 500
+        """
+        started = time.monotonic()
+        model = body.get('model') or 'text-embedding-3-small'
+        inputs = body.get('input')
+        if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        if not isinstance(inputs, list):
+            raise StubError(400, 'invalid_request_error', "'input' must be a string or an array")
+
+        full_dimensions = MODEL_DIMENSIONS.get(model, DEFAULT_DIMENSIONS)
+        dimensions = body.get('dimensions') or full_dimensions
+        encoding_format = body.get('encoding_format') or 'float'
+
+        texts, counts = self._tokenize(inputs)
+        self._count('requests')
+        self._validate(inputs, texts, counts, dimensions, full_dimensions)
+
+        with self._lock:
+            roll = self._random.random()
+            scale = self._random.uniform(1 - self.jitter, 1 + self.jitter)
+        if roll < self.rate_limit_rate:
+            self._count('rate_limited')
+            raise StubError(429, 'rate_limit_exceeded', 'Rate limit reached for requests (stub)', {
+                'retry-after-ms': str(self.retry_after_ms),
+                'retry-after': str(max(1, round(self.retry_after_ms / 1000))),
+            })
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count('server_errors')
+            raise StubError(500, 'server_error', 'The server had an error processing your request (stub)')
+
+        data = []
+        for index, text in enumerate(texts):
+            vector = self.vector(text, dimensions)
+            if encoding_format == 'base64':
+                embedding = base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': index, 'embedding': embedding})
+
+        tokens = sum(counts)
+        delay = (self.latency_ms + self.latency_per_1k_tokens_ms * tokens / 1000) / 1000 * scale
+        remaining = delay - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+        with self._lock:
+            self.stats['inputs'] += len(inputs)
+            self.stats['tokens'] += tokens
+            self._latencies.append(time.monotonic() - started)
+
+        return {
+            'object': 'list',
+            'data': data,
+            'model': model,
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        }
+
+
+# =============================================================================
+# HTTP SERVER
+# =============================================================================
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Routes /v1/embeddings and /stats to the server's EmbeddingStub"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the API
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.server.stub.snapshot())
+        else:
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': {'message': f"Invalid JSON body: {e}", 'type': 'invalid_request_error'}})
+            return
+
+        path = self.path.rstrip('/')
+        if path == '/stats/reset':
+            self.server.stub.reset_stats()
+            self._send_json(200, {'reset': True})
+            return
+        if not path.endswith('/embeddings'):
+            self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+            return
+
+        try:
+            self._send_json(200, self.server.stub.embed(body))
+        except StubError as e:
+            self._send_json(e.status, {'error': {'message': str(e), 'type': e.error_type,
+                                                 'param': e.param, 'code': e.error_type}}, e.headers)
+
+
+def make_server(stub: EmbeddingStub, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """HTTP server for the stub; port 0 picks a free port (see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), StubRequestHandler)
+    server.daemon_threads = True
+    server.stub = stub
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve deterministic OpenAI-compatible embeddings for offline runs')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (0 picks a free port)')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Fixed delay per request (default: 50)')
+    parser.add_argument('--latency-per-1k-tokens-ms', type=float, default=0.0,
+                       help='Extra delay per 1,000 input tokens (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.2,
+                       help='Scale delays by a random factor within +/- this fraction (default: 0.2)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with 429 (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='Fraction of requests answered with 500 (default: 0)')
+    parser.add_argument('--retry-after-ms', type=int, default=500,
+                       help='Delay advertised on 429 responses (default: 500)')
+    parser.add_argument('--reject-text', type=str,
+                       help='Answer 400 for requests with an input containing this text')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for jitter and injected failures')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    stub = EmbeddingStub(
+        latency_ms=args.latency_ms,
+        latency_per_1k_tokens_ms=args.latency_per_1k_tokens_ms,
+        jitter=args.jitter,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        retry_after_ms=args.retry_after_ms,
+        reject_text=args.reject_text,
+        seed=args.seed
+    )
+    server = make_server(stub, args.host, args.port)
+    host, port = server.server_address[:2]
+
+    # First line of stdout, so a parent process can read the port it got
+    print(f"Listening on http://{host}:{port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stub stats: {json.dumps(stub.snapshot())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,11 @@ Calculates expected costs before running the batch processor
 import os
 import json
 import argparse
+from functools import lru_cache
 from pathlib import Path
 
+from tokenizer import get_encoding
+
 # Pricing (as of 2025)
 PRICING = {
     "text-embedding-3-small": 0.00002 / 1000,  # $0.02 per 1M tokens → $0.00002 per 1K tokens
@@ -16,10 +19,24 @@ PRICING = {
     "text-embedding-ada-002": 0.0001 / 1000,   # $0.10 per 1M tokens
 }
 
+@lru_cache(maxsize=None)
+def _encoding():
+    """Shared cl100k_base encoding, or None (word-count estimates) if it can't be loaded"""
+    try:
+        return get_encoding()
+    except (ImportError, RuntimeError) as e:
+        print(f"⚠️  {e}")
+        print("   Falling back to word-count token estimates")
+        return None
+
 def estimate_tokens(text: str) -> int:
-    """Rough estimation: 1 token ≈ 0.75 words"""
-    words = len(text.split())
-    return int(words * 1.3)  # Conservative estimate
+    """Count tokens with the embedding models' tokenizer (cl100k_base)"""
+    encoding = _encoding()
+    if encoding is None:
+        # Rough estimation: 1 token ≈ 0.75 words
+        words = len(text.split())
+        return int(words * 1.3)  # Conservative estimate
+    return len(encoding.encode(text, disallowed_special=()))
 
 def analyze_documents(documents_dir: str) -> dict:
     """Analyze all documents and estimate costs"""
@@ -118,7 +135,7 @@ def main():
 
     print(f"📊 Documents analyzed: {analysis['total_documents']}")
     print(f"📝 Total text length: {analysis['total_text_length']:,} characters")
-    print(f"🔢 Estimated tokens: {analysis['total_estimated_tokens']:,}")
+    print(f"🔢 {'Estimated' if _encoding() is None else 'Counted'} tokens: {analysis['total_estimated_tokens']:,}")
     print()
 
     # Show document breakdown
@@ -1,37 +1,61 @@
 #!/usr/bin/env python3
 """
 Document Extraction Pipeline for RAG System
-Extracts text from PDF, PPTX, and DOCX files and chunks them for embedding generation.
+Extracts text from PDF, PPTX, DOCX, and XLSX files and chunks them for embedding generation.
 """
 
 import os
 import json
+import time
 import hashlib
 import logging
+import argparse
+import importlib
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from dataclasses import dataclass, asdict, field
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from collections import deque
+import multiprocessing
+from multiprocessing.connection import wait as wait_for_connections
 import re
-
-# Document processing libraries
-try:
-    import PyPDF2
-    import pdfplumber
-except ImportError:
-    print("Warning: PDF libraries not installed. Install with: pip install PyPDF2 pdfplumber")
-
-try:
-    from pptx import Presentation
-except ImportError:
-    print("Warning: python-pptx not installed. Install with: pip install python-pptx")
-
-try:
-    from docx import Document
-except ImportError:
-    print("Warning: python-docx not installed. Install with: pip install python-docx")
-
-# Text processing
-import tiktoken
+import math
+import unicodedata
+from collections import Counter
+
+from tokenizer import DEFAULT_ENCODING, get_encoding
+
+# Document processing libraries (PyPDF2, pdfplumber, pypdfium2, python-pptx,
+# python-docx) are imported on first use, so --help and runs that only touch
+# one format don't pay for loading the others. tiktoken is loaded through the
+# shared tokenizer module, which reads the BPE file from local disk.
+_INSTALL_HINTS = {
+    'PyPDF2': 'PyPDF2',
+    'pdfplumber': 'pdfplumber',
+    'pptx': 'python-pptx',
+    'docx': 'python-docx',
+    'openpyxl': 'openpyxl',
+}
+
+
+def _require(module_name: str):
+    """Import a parser library on first use, with an install hint if it is missing"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(f"{module_name} not installed. Install with: "
+                          f"pip install {_INSTALL_HINTS.get(module_name, module_name)}") from e
+
+
+@lru_cache(maxsize=None)
+def _pdfium():
+    """pypdfium2 (installed with pdfplumber >= 0.10) for the fast text-layer probe, or None"""
+    try:
+        return importlib.import_module('pypdfium2')
+    except ImportError:
+        return None
 
 # Configure logging
 logging.basicConfig(
@@ -44,6 +68,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = {'.pdf', '.pptx', '.docx', '.xlsx'}
+
+# Bump whenever extractor or chunker output changes so cached chunks are rebuilt
+EXTRACTION_CACHE_VERSION = 4
+
+# Text-layer probe thresholds: pages with fewer visible characters are treated
+# as image-only; pages tripping the layout heuristics are re-read with pdfplumber
+MIN_TEXT_LAYER_CHARS = 10
+MAX_GARBLED_RATIO = 0.01
+MIN_WHITESPACE_RATIO = 0.05
+MAX_SINGLE_CHAR_LINE_RATIO = 0.5
+
+# Boilerplate stripping: a normalized line found on at least this share of a
+# document's pages or slides (and on at least BOILERPLATE_MIN_PAGES of them) is
+# removed before chunking. Lines without letters (page numbers, dates) only
+# count within BOILERPLATE_EDGE_LINES of the top or bottom of a page, so
+# numeric table cells are kept.
+BOILERPLATE_MIN_PAGE_RATIO = 0.5
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_EDGE_LINES = 2
+
+# Dropped during normalization: soft hyphen, zero-width space/joiners, word joiner, BOM
+_INVISIBLE_CHARS = dict.fromkeys(map(ord, '\u00ad\u200b\u200c\u200d\u2060\ufeff'))
+_DIGITS = re.compile(r'\d+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize text (ligatures, full-width forms, non-breaking spaces) and drop invisible characters"""
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+    return text.translate(_INVISIBLE_CHARS)
+
+
+def _boilerplate_key(line: str) -> str:
+    """Frequency key for a line: normalized, case-folded, whitespace collapsed, digit runs as '#'"""
+    line = _WHITESPACE.sub(' ', normalize_text(line)).strip().casefold()
+    return _DIGITS.sub('#', line)
+
 
 @dataclass
 class ChunkMetadata:
@@ -55,15 +118,28 @@ class ChunkMetadata:
     section: Optional[str] = None
     total_pages: Optional[int] = None
     source_path: Optional[str] = None
+    aliases: Optional[List[str]] = None  # Other paths with byte-identical content
+    sheet: Optional[str] = None  # XLSX worksheet name
+    row_start: Optional[int] = None  # First and last sheet rows in an XLSX row group
+    row_end: Optional[int] = None
+
 
 
 @dataclass
 class TextChunk:
-    """Represents a chunk of text with metadata"""
+    """
+    Represents a chunk of text with metadata
+
+    position_start/position_end are character offsets into the page or slide
+    text as chunked: NFKC-normalized, invisible characters dropped and
+    boilerplate lines removed. They are not offsets into the raw extracted text.
+    """
     id: str
     text: str
     metadata: ChunkMetadata
     token_count: int
+    position_start: Optional[int] = None  # Character offsets in the normalized page/slide text
+    position_end: Optional[int] = None
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -71,25 +147,393 @@ class TextChunk:
             'id': self.id,
             'text': self.text,
             'metadata': asdict(self.metadata),
-            'token_count': self.token_count
+            'token_count': self.token_count,
+            'position_start': self.position_start,
+            'position_end': self.position_end
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TextChunk':
+        """Rebuild a chunk from its to_dict() form"""
+        return cls(
+            id=data['id'],
+            text=data['text'],
+            metadata=ChunkMetadata(**data['metadata']),
+            token_count=data['token_count'],
+            position_start=data.get('position_start'),
+            position_end=data.get('position_end')
+        )
+
+
+def _file_sha256(file_path: str) -> str:
+    """Hash file contents in 1 MB blocks"""
+    hash_obj = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hash_obj.update(block)
+    return hash_obj.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted chunks keyed by file content and chunker settings
+
+    Layout under cache_dir:
+        index.json            path -> {size, mtime_ns, sha256}; lets unchanged
+                              files skip hashing entirely
+        chunks/<sha>_<settings>.json
+                              chunks for one file content + settings combination
+    """
+
+    def __init__(self, cache_dir: str, settings: Dict[str, Any]):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for the cache (created if missing)
+            settings: Chunker settings that affect output (chunk_size, chunk_overlap, encoding)
+        """
+        self.cache_dir = cache_dir
+        self.chunks_dir = os.path.join(cache_dir, 'chunks')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(self.chunks_dir, exist_ok=True)
+
+        key_source = json.dumps({**settings, 'version': EXTRACTION_CACHE_VERSION}, sort_keys=True)
+        self.settings_key = hashlib.sha256(key_source.encode()).hexdigest()[:16]
+
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache index {self.index_path}: {e}")
+
+        self.hits = 0
+        self.misses = 0
+        self.files_hashed = 0
+
+    def file_hash(self, file_path: str) -> str:
+        """
+        Content hash of a file, reusing the indexed hash when size and mtime are unchanged
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            Hex SHA-256 of the file contents
+        """
+        real_path = os.path.realpath(file_path)
+        stat = os.stat(real_path)
+        entry = self.index.get(real_path)
+
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = _file_sha256(real_path)
+        self.files_hashed += 1
+        self.index[real_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def _entry_path(self, file_path: str) -> str:
+        return os.path.join(self.chunks_dir, f"{self.file_hash(file_path)}_{self.settings_key}.json")
+
+    def contains(self, file_path: str) -> bool:
+        """Whether chunks are cached for a file, without loading them (counts a miss if not)"""
+        if os.path.exists(self._entry_path(file_path)):
+            return True
+        self.misses += 1
+        return False
+
+    def get(self, file_path: str, doc_id: str) -> Optional['FileResult']:
+        """
+        Look up cached chunks for a file
+
+        Args:
+            file_path: Path to the file
+            doc_id: Document ID the returned chunks should carry
+
+        Returns:
+            FileResult marked as cached, or None on a cache miss
+        """
+        entry_path = self._entry_path(file_path)
+
+        if not os.path.exists(entry_path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {entry_path}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        chunks = _rebind_chunks([TextChunk.from_dict(c) for c in entry['chunks']],
+                                entry['doc_id'], doc_id, file_path)
+        return FileResult(
+            file_path=file_path,
+            chunks=chunks,
+            image_only_pages=entry.get('image_only_pages', []),
+            token_stats=entry.get('token_stats', {}),
+            cached=True
+        )
+
+    def put(self, file_path: str, doc_id: str, result: 'FileResult'):
+        """
+        Store the chunks extracted from a file
+
+        Args:
+            file_path: Path to the file
+            doc_id: Document ID used in the chunk IDs
+            result: FileResult produced by extraction
+        """
+        entry_path = self._entry_path(file_path)
+        tmp_path = f"{entry_path}.tmp"
+
+        entry = {
+            'doc_id': doc_id,
+            'chunks': [c.to_dict() for c in result.chunks],
+            'image_only_pages': result.image_only_pages,
+            'token_stats': result.token_stats
         }
 
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+
+    def save(self):
+        """Write the path index back to disk"""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def _rebind_chunks(chunks: List[TextChunk], old_doc_id: str, doc_id: str, file_path: str) -> List[TextChunk]:
+    """Point chunks extracted from identical content at another path"""
+    for chunk in chunks:
+        if chunk.id.startswith(old_doc_id):
+            chunk.id = doc_id + chunk.id[len(old_doc_id):]
+        chunk.metadata.filename = os.path.basename(file_path)
+        chunk.metadata.source_path = file_path
+    return chunks
+
+
+@dataclass
+class FileResult:
+    """Chunks extracted from one file, with timing for throughput reporting"""
+    file_path: str
+    chunks: List[TextChunk]
+    seconds: float = 0.0
+    worker: Optional[int] = None
+    backend_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)  # backend -> {pages, seconds}
+    image_only_pages: List[int] = field(default_factory=list)
+    cached: bool = False
+    pages: Optional[Tuple[int, int]] = None  # Page range when this is one part of a split PDF
+    token_stats: Dict[str, int] = field(default_factory=dict)  # tokens_before, tokens_after, boilerplate_lines
+    quarantine_reason: Optional[str] = None  # Set when the watchdog killed the extraction
+    units: List[Tuple[str, ChunkMetadata, str]] = field(default_factory=list)  # Unchunked pages of a split PDF part
+
+
+# Processor owned by each pool worker process (set by _init_worker)
+_worker_processor: Optional['DocumentProcessor'] = None
+
+
+def _init_worker(config: Dict[str, Any]):
+    """Build one DocumentProcessor per worker process so the encoding is loaded once"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(**config)
+
+
+def _extract_in_worker(task: Tuple[str, Optional[Tuple[int, int]]]) -> FileResult:
+    """Pool entry point: extract a file (or a page range of a PDF) with the worker's processor"""
+    file_path, pages = task
+    return _worker_processor.extract_file(file_path, pages)
+
+
+def _watchdog_worker(conn, config: Dict[str, Any]):
+    """Watchdog worker loop: receive (file_path, pages) tasks, send back FileResults, stop on None"""
+    _init_worker(config)
+
+    # Import the installed parsers now so the memory cap measures files, not first-use imports
+    for module_name in _INSTALL_HINTS:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+    _pdfium()
+
+    conn.send(True)  # Ready: idle memory can be measured from here on
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(_extract_in_worker(task))
+    conn.close()
+
+
+def _process_rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB (psutil if installed, else /proc), or None if unknown"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _WatchdogWorker:
+    """One extraction process supervised by DocumentProcessor._iter_watchdog"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_watchdog_worker, args=(child_conn, config), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task_index: Optional[int] = None
+        self.started_at = 0.0
+        self.baseline_mb: Optional[float] = None  # Idle RSS when the current task was assigned
+        self.ready = False
+
+    def assign(self, task_index: int, task: Tuple[str, Optional[Tuple[int, int]]]):
+        if not self.ready:
+            try:
+                self.conn.recv()
+            except (EOFError, OSError):
+                pass  # Died while starting; the supervisor sees the closed pipe and quarantines the task
+            self.ready = True
+
+        self.task_index = task_index
+        self.baseline_mb = _process_rss_mb(self.process.pid)
+        self.started_at = time.perf_counter()
+        try:
+            self.conn.send(task)
+        except OSError:
+            pass
+
+    def memory_growth_mb(self) -> Optional[float]:
+        """RSS added since the current task was assigned, or None if unknown"""
+        rss = _process_rss_mb(self.process.pid)
+        if rss is None or self.baseline_mb is None:
+            return None
+        return rss - self.baseline_mb
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
 
 class DocumentProcessor:
     """Main document processing class"""
 
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, workers: int = 1,
+                 cache_dir: Optional[str] = None, pdf_backend: str = 'auto',
+                 docx_backend: str = 'python-docx', pptx_backend: str = 'python-pptx',
+                 pdf_split_pages: int = 50, file_timeout: Optional[float] = None,
+                 max_file_memory_mb: Optional[float] = None, ocr_cache_dir: Optional[str] = None,
+                 ocr_dpi: int = 300, ocr_lang: str = 'eng', strip_boilerplate: bool = True):
         """
         Initialize the document processor
 
         Args:
             chunk_size: Maximum tokens per chunk
             chunk_overlap: Overlap tokens between chunks
+            workers: Number of worker processes for extraction (1 = serial)
+            cache_dir: Directory for the extraction cache (None disables caching)
+            pdf_backend: 'auto' probes each page's text layer and only uses pdfplumber
+                         for badly laid out pages; 'pdfplumber' uses it for every page
+            docx_backend: 'python-docx' or 'ooxml' (streams the XML from the zip, same text)
+            pptx_backend: 'python-pptx' or 'ooxml' (streams the XML from the zip, same text)
+            pdf_split_pages: With workers > 1, PDFs with more pages than this are split
+                             into ranges of this many pages extracted in parallel (0 disables)
+            file_timeout: Seconds a file (or PDF page range) may take before its worker
+                          is killed and the file quarantined (None disables the watchdog)
+            max_file_memory_mb: Resident memory a worker may add while extracting one file
+                                (over its idle size before the file) before it is killed
+                                and the file quarantined
+            ocr_cache_dir: Directory for cached page rasters and OCR text; when set,
+                           image-only PDF pages are OCR'd locally (None disables OCR)
+            ocr_dpi: Render resolution for OCR
+            ocr_lang: Tesseract language(s) for OCR
+            strip_boilerplate: Remove lines repeated across most pages or slides of a
+                               document (headers, footers, page numbers) before chunking
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.encoding = tiktoken.get_encoding("cl100k_base")  # GPT-3.5/4 encoding
-        logger.info(f"Initialized DocumentProcessor (chunk_size={chunk_size}, overlap={chunk_overlap})")
+        self.workers = max(1, workers)
+        self.pdf_backend = pdf_backend
+        self.docx_backend = docx_backend
+        self.pptx_backend = pptx_backend
+        self.strip_boilerplate = strip_boilerplate
+        self.pdf_split_pages = pdf_split_pages
+        self.file_timeout = file_timeout
+        self.max_file_memory_mb = max_file_memory_mb
+        self.quarantine: List[Dict[str, Any]] = []
+        self.encoding_name = DEFAULT_ENCODING  # GPT-3.5/4 encoding
+        self.encoding = get_encoding(self.encoding_name)
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+
+        # Run totals, merged from each FileResult
+        self.backend_stats: Dict[str, Dict[str, float]] = {}
+        self.image_only_pages: Dict[str, List[int]] = {}
+        self.token_stats: Dict[str, Dict[str, int]] = {}
+
+        # Content hashes computed for duplicate detection when there is no cache index
+        self._content_hashes: Dict[str, str] = {}
+
+        # Page ranges of PDFs split across workers, by path
+        self._pdf_ranges: Dict[str, List[Tuple[int, int]]] = {}
+
+        # Per-file stats, reset by extract_file()
+        self._file_backend_stats: Dict[str, Dict[str, float]] = {}
+        self._file_image_only_pages: List[int] = []
+        self._file_token_stats: Dict[str, int] = {}
+        self._file_units: Optional[List[Tuple[str, ChunkMetadata, str]]] = None
+
+        # Duplicate-source tracking: canonical path -> alias paths, plus run totals
+        self.aliases: Dict[str, List[str]] = {}
+        self.dedup_stats = {'files_listed': 0, 'unique_files': 0, 'path_duplicates': 0,
+                            'content_duplicates': 0, 'bytes_saved': 0, 'tokens_saved': 0}
+
+        # Local OCR of image-only pages; its own cache, so OCR text is never stored in the extraction cache
+        self.ocr = None
+        if ocr_cache_dir:
+            from ocr_pages import PageOCR
+            self.ocr = PageOCR(ocr_cache_dir, dpi=ocr_dpi, lang=ocr_lang, workers=self.workers)
+
+        self.cache = None
+        if cache_dir:
+            self.cache = ExtractionCache(cache_dir, {
+                'chunk_size': chunk_size,
+                'chunk_overlap': chunk_overlap,
+                'encoding': self.encoding_name,
+                'pdf_backend': pdf_backend,
+                'docx_backend': docx_backend,
+                'pptx_backend': pptx_backend,
+                'strip_boilerplate': strip_boilerplate
+            })
+        logger.info(f"Initialized DocumentProcessor (chunk_size={chunk_size}, overlap={chunk_overlap}, workers={self.workers})")
 
     def count_tokens(self, text: str) -> int:
         """Count tokens in text using tiktoken"""
@@ -99,6 +543,10 @@ class DocumentProcessor:
         """
         Split text into overlapping chunks based on token count
 
+        The text is normalized, then encoded and decoded once; token
+        boundaries are mapped to character offsets so each chunk is a slice of
+        the normalized text and carries its position_start/position_end in it.
+
         Args:
             text: The text to chunk
             metadata: Metadata for the chunks
@@ -107,23 +555,28 @@ class DocumentProcessor:
         Returns:
             List of TextChunk objects
         """
+        text = normalize_text(text)
         if not text.strip():
             return []
 
-        # Encode the entire text
+        # Encode the entire text, then decode once to get each token's start offset
         tokens = self.encoding.encode(text)
+        self._count_file_tokens(len(tokens), 0)
+        decoded, offsets = self.encoding.decode_with_offsets(tokens)
         chunks = []
 
         start_idx = 0
         chunk_num = 0
 
         while start_idx < len(tokens):
-            # Get chunk tokens
+            # Get chunk token range and the matching character range
             end_idx = min(start_idx + self.chunk_size, len(tokens))
-            chunk_tokens = tokens[start_idx:end_idx]
+            char_start = offsets[start_idx]
+            char_end = offsets[end_idx] if end_idx < len(tokens) else len(decoded)
 
-            # Decode back to text
-            chunk_text = self.encoding.decode(chunk_tokens)
+            raw_text = decoded[char_start:char_end]
+            chunk_text = raw_text.strip()
+            position_start = char_start + (len(raw_text) - len(raw_text.lstrip()))
 
             # Create chunk ID
             chunk_id = f"{doc_id}_chunk{chunk_num}"
@@ -131,9 +584,11 @@ class DocumentProcessor:
             # Create chunk object
             chunk = TextChunk(
                 id=chunk_id,
-                text=chunk_text.strip(),
+                text=chunk_text,
                 metadata=metadata,
-                token_count=len(chunk_tokens)
+                token_count=end_idx - start_idx,
+                position_start=position_start,
+                position_end=position_start + len(chunk_text)
             )
             chunks.append(chunk)
 
@@ -144,28 +599,282 @@ class DocumentProcessor:
         logger.info(f"Created {len(chunks)} chunks from text (tokens: {len(tokens)})")
         return chunks
 
-    def extract_from_pdf(self, file_path: str) -> List[TextChunk]:
+    def _count_file_tokens(self, tokens_after: int, tokens_removed: int, lines_removed: int = 0):
+        """Add to the current file's before/after token counts"""
+        stats = self._file_token_stats
+        stats['tokens_after'] = stats.get('tokens_after', 0) + tokens_after
+        stats['tokens_before'] = stats.get('tokens_before', 0) + tokens_after + tokens_removed
+        stats['boilerplate_lines'] = stats.get('boilerplate_lines', 0) + lines_removed
+
+    def _strip_boilerplate(self, texts: List[str]) -> List[str]:
+        """
+        Remove lines that repeat across most pages or slides of a document
+
+        Lines are compared by _boilerplate_key, so "Page 3 of 40" and
+        "Page 4 of 40" or differently spaced copies of a footer count as the
+        same line. PDFs split across workers are stripped once, over every
+        page, after their parts are merged.
+
+        Args:
+            texts: Text of each page or slide, in order
+
+        Returns:
+            The texts without boilerplate lines
+        """
+        if not self.strip_boilerplate or len(texts) < BOILERPLATE_MIN_PAGES:
+            return texts
+
+        def candidates(lines: List[str]):
+            keys = [_boilerplate_key(line) for line in lines]
+            for index, key in enumerate(keys):
+                at_edge = index < BOILERPLATE_EDGE_LINES or index >= len(keys) - BOILERPLATE_EDGE_LINES
+                if key and (at_edge or any(c.isalpha() for c in key)):
+                    yield index, key
+
+        page_lines = [text.split('\n') for text in texts]
+        page_candidates = [dict(candidates(lines)) for lines in page_lines]
+
+        counts = Counter()
+        for page in page_candidates:
+            counts.update(set(page.values()))
+
+        threshold = max(BOILERPLATE_MIN_PAGES, math.ceil(len(texts) * BOILERPLATE_MIN_PAGE_RATIO))
+        boilerplate = {key for key, count in counts.items() if count >= threshold}
+        if not boilerplate:
+            return texts
+
+        cleaned = []
+        removed_lines = 0
+        removed_tokens = 0
+        line_tokens: Dict[str, int] = {}
+
+        for lines, page in zip(page_lines, page_candidates):
+            kept = []
+            for index, line in enumerate(lines):
+                if page.get(index) in boilerplate:
+                    if line not in line_tokens:
+                        line_tokens[line] = self.count_tokens(normalize_text(line) + '\n')
+                    removed_lines += 1
+                    removed_tokens += line_tokens[line]
+                else:
+                    kept.append(line)
+            cleaned.append('\n'.join(kept))
+
+        self._count_file_tokens(0, removed_tokens, removed_lines)
+        return cleaned
+
+    def _chunk_units(self, units: List[Tuple[str, ChunkMetadata, str]]) -> List[TextChunk]:
+        """
+        Strip cross-page boilerplate from a document's pages or slides, then chunk each one
+
+        When extracting one part of a split PDF with boilerplate stripping on,
+        the units are kept for the parent to strip and chunk with the rest of
+        the document, and no chunks are returned.
+
+        Args:
+            units: (text, metadata, chunk ID prefix) for each page or slide, in order
+
+        Returns:
+            List of TextChunk objects
+        """
+        if self._file_units is not None:
+            self._file_units.extend(units)
+            return []
+
+        texts = self._strip_boilerplate([text for text, _, _ in units])
+        chunks = []
+        for text, (_, metadata, prefix) in zip(texts, units):
+            chunks.extend(self.chunk_text(text, metadata, prefix))
+        return chunks
+
+    def extract_from_pdf(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> List[TextChunk]:
         """
         Extract text from PDF file
 
         Args:
             file_path: Path to PDF file
+            pages: Optional (first, last) 1-based inclusive page range; None for all pages
+
+        Returns:
+            List of TextChunk objects
+        """
+        logger.info(f"Extracting from PDF: {file_path}" + (f" (pages {pages[0]}-{pages[1]})" if pages else ""))
+
+        if self.pdf_backend == 'pdfplumber':
+            return self._extract_pdf_pdfplumber(file_path, pages)
+
+        try:
+            return self._extract_pdf_probed(file_path, pages)
+        except Exception as e:
+            logger.warning(f"Text-layer probe failed, using pdfplumber for every page: {e}")
+            # Drop what the failed probe recorded so the retry's stats are not double counted
+            self._file_backend_stats = {}
+            self._file_image_only_pages = []
+            self._file_token_stats = {}
+            return self._extract_pdf_pdfplumber(file_path, pages)
+
+    @staticmethod
+    def _page_numbers(total_pages: int, pages: Optional[Tuple[int, int]]) -> range:
+        """1-based page numbers to extract, clamped to the document"""
+        if pages is None:
+            return range(1, total_pages + 1)
+        return range(max(pages[0], 1), min(pages[1], total_pages) + 1)
+
+    def _extract_pdf_probed(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> List[TextChunk]:
+        """
+        Extract text from PDF file, reading each page's text layer with a fast backend
+
+        Pages with a clean text layer use the fast text; pages that look badly
+        laid out are re-read with pdfplumber; pages without a text layer are
+        recorded as image-only.
+
+        Args:
+            file_path: Path to PDF file
+            pages: Optional (first, last) 1-based inclusive page range
+
+        Returns:
+            List of TextChunk objects
+        """
+        units = []
+        doc_id = self._generate_doc_id(file_path)
+        filename = os.path.basename(file_path)
+        plumber_pdf = None
+
+        try:
+            with self._open_fast_pdf(file_path) as (total_pages, read_page):
+                page_numbers = self._page_numbers(total_pages, pages)
+
+                for page_num in page_numbers:
+                    with self._backend_timer(self._fast_backend_name()):
+                        text = read_page(page_num - 1)
+
+                    quality = self._classify_text_layer(text)
+
+                    if quality == 'empty':
+                        self._file_image_only_pages.append(page_num)
+                        continue
+
+                    if quality == 'messy':
+                        if plumber_pdf is None:
+                            plumber_pdf = _require('pdfplumber').open(file_path)
+                        with self._backend_timer('pdfplumber'):
+                            text = plumber_pdf.pages[page_num - 1].extract_text() or text
+
+                    metadata = ChunkMetadata(
+                        filename=filename,
+                        doc_type='pdf',
+                        page=page_num,
+                        total_pages=total_pages,
+                        source_path=file_path
+                    )
+
+                    units.append((text, metadata, f"{doc_id}_p{page_num}"))
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+
+        chunks = self._chunk_units(units)
+
+        if self._file_image_only_pages:
+            logger.info(f"{len(self._file_image_only_pages)} image-only pages in {filename}")
+
+        logger.info(f"Successfully extracted {len(chunks)} chunks from {len(page_numbers)} pages")
+        return chunks
+
+    @staticmethod
+    def _fast_backend_name() -> str:
+        return 'pdfium' if _pdfium() is not None else 'pypdf2'
+
+    @contextmanager
+    def _open_fast_pdf(self, file_path: str):
+        """Open a PDF with the fast backend, yielding (page count, page index -> text)"""
+        pdfium = _pdfium()
+        if pdfium is not None:
+            pdf = pdfium.PdfDocument(file_path)
+
+            def read_page(index: int) -> str:
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    return textpage.get_text_range().replace('\r\n', '\n').replace('\r', '\n')
+                finally:
+                    textpage.close()
+                    page.close()
+
+            try:
+                yield len(pdf), read_page
+            finally:
+                pdf.close()
+        else:
+            with open(file_path, 'rb') as file:
+                reader = _require('PyPDF2').PdfReader(file)
+                yield len(reader.pages), lambda index: reader.pages[index].extract_text() or ''
+
+    @staticmethod
+    def _classify_text_layer(text: str) -> str:
+        """
+        Classify a page's raw text layer
+
+        Returns:
+            'empty' (no usable text layer), 'messy' (needs layout analysis) or 'clean'
+        """
+        visible = sum(1 for c in text if not c.isspace())
+        if visible < MIN_TEXT_LAYER_CHARS:
+            return 'empty'
+
+        # Unmapped glyphs: pdfminer-style (cid:NN) codes or replacement characters
+        garbled = text.count('(cid:') + text.count('\ufffd')
+        if garbled / visible > MAX_GARBLED_RATIO:
+            return 'messy'
+
+        # Words run together: the text layer has no spacing information
+        whitespace = sum(1 for c in text if c.isspace())
+        if whitespace / len(text) < MIN_WHITESPACE_RATIO:
+            return 'messy'
+
+        # One character per line: vertical or per-glyph positioned text
+        lines = [line for line in text.split('\n') if line.strip()]
+        if lines and sum(1 for line in lines if len(line.strip()) == 1) / len(lines) > MAX_SINGLE_CHAR_LINE_RATIO:
+            return 'messy'
+
+        return 'clean'
+
+    @contextmanager
+    def _backend_timer(self, backend: str):
+        """Add one page and its elapsed time to the current file's backend stats"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self._file_backend_stats.setdefault(backend, {'pages': 0, 'seconds': 0.0})
+            stats['pages'] += 1
+            stats['seconds'] += time.perf_counter() - start_time
+
+    def _extract_pdf_pdfplumber(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> List[TextChunk]:
+        """
+        Extract text from PDF file with pdfplumber on every page (PyPDF2 on failure)
+
+        Args:
+            file_path: Path to PDF file
+            pages: Optional (first, last) 1-based inclusive page range
 
         Returns:
             List of TextChunk objects
         """
-        logger.info(f"Extracting from PDF: {file_path}")
         chunks = []
         doc_id = self._generate_doc_id(file_path)
         filename = os.path.basename(file_path)
 
         try:
             # Try pdfplumber first (better text extraction)
-            with pdfplumber.open(file_path) as pdf:
+            with _require('pdfplumber').open(file_path) as pdf:
                 total_pages = len(pdf.pages)
+                page_numbers = self._page_numbers(total_pages, pages)
+                units = []
 
-                for page_num, page in enumerate(pdf.pages, start=1):
-                    text = page.extract_text()
+                for page_num in page_numbers:
+                    with self._backend_timer('pdfplumber'):
+                        text = pdf.pages[page_num - 1].extract_text()
 
                     if text and text.strip():
                         metadata = ChunkMetadata(
@@ -176,10 +885,10 @@ class DocumentProcessor:
                             source_path=file_path
                         )
 
-                        page_chunks = self.chunk_text(text, metadata, f"{doc_id}_p{page_num}")
-                        chunks.extend(page_chunks)
+                        units.append((text, metadata, f"{doc_id}_p{page_num}"))
 
-                logger.info(f"Successfully extracted {len(chunks)} chunks from {total_pages} pages")
+                chunks.extend(self._chunk_units(units))
+                logger.info(f"Successfully extracted {len(chunks)} chunks from {len(page_numbers)} pages")
 
         except Exception as e:
             logger.warning(f"pdfplumber failed, trying PyPDF2: {e}")
@@ -187,11 +896,14 @@ class DocumentProcessor:
             try:
                 # Fallback to PyPDF2
                 with open(file_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
+                    pdf_reader = _require('PyPDF2').PdfReader(file)
                     total_pages = len(pdf_reader.pages)
+                    page_numbers = self._page_numbers(total_pages, pages)
+                    units = []
 
-                    for page_num, page in enumerate(pdf_reader.pages, start=1):
-                        text = page.extract_text()
+                    for page_num in page_numbers:
+                        with self._backend_timer('pypdf2'):
+                            text = pdf_reader.pages[page_num - 1].extract_text()
 
                         if text and text.strip():
                             metadata = ChunkMetadata(
@@ -202,10 +914,10 @@ class DocumentProcessor:
                                 source_path=file_path
                             )
 
-                            page_chunks = self.chunk_text(text, metadata, f"{doc_id}_p{page_num}")
-                            chunks.extend(page_chunks)
+                            units.append((text, metadata, f"{doc_id}_p{page_num}"))
 
-                    logger.info(f"Successfully extracted {len(chunks)} chunks from {total_pages} pages (PyPDF2)")
+                    chunks.extend(self._chunk_units(units))
+                    logger.info(f"Successfully extracted {len(chunks)} chunks from {len(page_numbers)} pages (PyPDF2)")
 
             except Exception as e2:
                 logger.error(f"Failed to extract from PDF {file_path}: {e2}")
@@ -228,22 +940,17 @@ class DocumentProcessor:
         filename = os.path.basename(file_path)
 
         try:
-            prs = Presentation(file_path)
-            total_slides = len(prs.slides)
+            slides = self._read_pptx_slides(file_path)
+            total_slides = len(slides)
+            units = []
 
-            for slide_num, slide in enumerate(prs.slides, start=1):
+            for slide_num, (shape_texts, notes) in enumerate(slides, start=1):
                 # Extract text from all shapes in the slide
-                slide_text = []
-
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text:
-                        slide_text.append(shape.text)
+                slide_text = [text for text in shape_texts if text]
 
                 # Also extract notes
-                if slide.has_notes_slide:
-                    notes_frame = slide.notes_slide.notes_text_frame
-                    if notes_frame and notes_frame.text:
-                        slide_text.append(f"\n[Notes: {notes_frame.text}]")
+                if notes:
+                    slide_text.append(f"\n[Notes: {notes}]")
 
                 if slide_text:
                     text = "\n".join(slide_text)
@@ -256,8 +963,9 @@ class DocumentProcessor:
                         source_path=file_path
                     )
 
-                    slide_chunks = self.chunk_text(text, metadata, f"{doc_id}_s{slide_num}")
-                    chunks.extend(slide_chunks)
+                    units.append((text, metadata, f"{doc_id}_s{slide_num}"))
+
+            chunks = self._chunk_units(units)
 
             logger.info(f"Successfully extracted {len(chunks)} chunks from {total_slides} slides")
 
@@ -266,6 +974,45 @@ class DocumentProcessor:
 
         return chunks
 
+    def _read_pptx_slides(self, file_path: str) -> List[Tuple[List[str], Optional[str]]]:
+        """
+        Read each slide's shape texts and notes text with the configured PPTX backend
+
+        Returns:
+            One (shape texts, notes text or None) tuple per slide
+        """
+        if self.pptx_backend == 'ooxml':
+            from ooxml_reader import read_pptx
+            return read_pptx(file_path)
+
+        slides = []
+        for slide in _require('pptx').Presentation(file_path).slides:
+            shape_texts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+
+            notes = None
+            if slide.has_notes_slide:
+                notes_frame = slide.notes_slide.notes_text_frame
+                notes = notes_frame.text if notes_frame else ""
+
+            slides.append((shape_texts, notes))
+        return slides
+
+    def _read_docx_blocks(self, file_path: str) -> Tuple[List[str], List[List[List[str]]]]:
+        """
+        Read a Word document's paragraph texts and table cell texts with the configured DOCX backend
+
+        Returns:
+            (paragraph texts, tables as rows of cell texts)
+        """
+        if self.docx_backend == 'ooxml':
+            from ooxml_reader import read_docx
+            return read_docx(file_path)
+
+        doc = _require('docx').Document(file_path)
+        paragraphs = [para.text for para in doc.paragraphs]
+        tables = [[[cell.text for cell in row.cells] for row in table.rows] for table in doc.tables]
+        return paragraphs, tables
+
     def extract_from_docx(self, file_path: str) -> List[TextChunk]:
         """
         Extract text from Word document
@@ -282,18 +1029,18 @@ class DocumentProcessor:
         filename = os.path.basename(file_path)
 
         try:
-            doc = Document(file_path)
+            paragraph_texts, tables = self._read_docx_blocks(file_path)
 
             # Extract paragraphs
             paragraphs = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    paragraphs.append(para.text)
+            for text in paragraph_texts:
+                if text.strip():
+                    paragraphs.append(text)
 
             # Extract tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = " | ".join([cell.text.strip() for cell in row.cells if cell.text.strip()])
+            for table in tables:
+                for row in table:
+                    row_text = " | ".join([cell.strip() for cell in row if cell.strip()])
                     if row_text:
                         paragraphs.append(row_text)
 
@@ -316,12 +1063,111 @@ class DocumentProcessor:
 
         return chunks
 
-    def process_file(self, file_path: str) -> List[TextChunk]:
+    @staticmethod
+    def _format_cell(value: Any) -> str:
+        """Render a spreadsheet cell value as text (whole floats without .0, dates as ISO)"""
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value).strip()
+
+    def extract_from_xlsx(self, file_path: str) -> List[TextChunk]:
+        """
+        Extract text from Excel workbook, streaming rows sheet by sheet
+
+        The workbook is opened read-only so rows are parsed as they are read;
+        only the current row group is held in memory. Each sheet's first
+        non-empty row is treated as the header and repeated at the top of
+        every row group, and groups are filled up to chunk_size tokens.
+
+        Args:
+            file_path: Path to XLSX file
+
+        Returns:
+            List of TextChunk objects
+        """
+        logger.info(f"Extracting from XLSX: {file_path}")
+        chunks = []
+        doc_id = self._generate_doc_id(file_path)
+        filename = os.path.basename(file_path)
+
+        try:
+            workbook = _require('openpyxl').load_workbook(file_path, read_only=True, data_only=True)
+        except Exception as e:
+            logger.error(f"Failed to extract from XLSX {file_path}: {e}")
+            return chunks
+
+        try:
+            total_sheets = len(workbook.worksheets)
+
+            for sheet_num, sheet in enumerate(workbook.worksheets, start=1):
+                header = None
+                header_row = header_tokens = 0
+                group: List[str] = []
+                group_tokens = 0
+                row_start = row_end = None
+
+                def flush():
+                    metadata = ChunkMetadata(
+                        filename=filename,
+                        doc_type='xlsx',
+                        total_pages=total_sheets,
+                        source_path=file_path,
+                        sheet=sheet.title,
+                        row_start=row_start,
+                        row_end=row_end
+                    )
+                    text = "\n".join([f"Sheet: {sheet.title}", header, *group])
+                    chunks.extend(self.chunk_text(text, metadata, f"{doc_id}_sh{sheet_num}_r{row_start}"))
+
+                for row_num, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+                    row_text = " | ".join(cell for cell in map(self._format_cell, row) if cell)
+                    if not row_text:
+                        continue
+
+                    if header is None:
+                        header, header_row = row_text, row_num
+                        header_tokens = self.count_tokens(f"Sheet: {sheet.title}\n{header}") + 1
+                        continue
+
+                    row_tokens = self.count_tokens(row_text) + 1
+                    if group and header_tokens + group_tokens + row_tokens > self.chunk_size:
+                        flush()
+                        group, group_tokens = [], 0
+
+                    if not group:
+                        row_start = row_num
+                    group.append(row_text)
+                    group_tokens += row_tokens
+                    row_end = row_num
+
+                if group:
+                    flush()
+                elif header is not None:
+                    # A sheet with a single non-empty row still gets indexed
+                    row_start = row_end = header_row
+                    flush()
+
+            logger.info(f"Successfully extracted {len(chunks)} chunks from {total_sheets} sheets")
+
+        except Exception as e:
+            logger.error(f"Failed to extract from XLSX {file_path}: {e}")
+
+        finally:
+            workbook.close()
+
+        return chunks
+
+    def process_file(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> List[TextChunk]:
         """
         Process a single file based on its extension
 
         Args:
             file_path: Path to the file
+            pages: Optional (first, last) page range; only used for PDFs
 
         Returns:
             List of TextChunk objects
@@ -330,30 +1176,541 @@ class DocumentProcessor:
         ext = os.path.splitext(file_path)[1].lower()
 
         if ext == '.pdf':
-            return self.extract_from_pdf(file_path)
+            return self.extract_from_pdf(file_path, pages)
         elif ext == '.pptx':
             return self.extract_from_pptx(file_path)
         elif ext == '.docx':
             return self.extract_from_docx(file_path)
+        elif ext == '.xlsx':
+            return self.extract_from_xlsx(file_path)
         else:
             logger.warning(f"Unsupported file type: {ext} for {file_path}")
             return []
 
-    def process_directory(self, directory: str, recursive: bool = True) -> List[TextChunk]:
+    def extract_file(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> FileResult:
         """
-        Process all supported files in a directory
+        Extract a single file (or a page range of a PDF) and record how long it took
 
         Args:
-            directory: Path to directory
-            recursive: Whether to process subdirectories
+            file_path: Path to the file
+            pages: Optional (first, last) page range; only used for PDFs
+
+        Returns:
+            FileResult with the file's chunks
+        """
+        self._file_backend_stats = {}
+        self._file_image_only_pages = []
+        self._file_token_stats = {}
+        # Boilerplate is counted across the whole document, so split parts defer chunking to the parent
+        self._file_units = [] if pages and self.strip_boilerplate else None
+
+        start_time = time.perf_counter()
+        try:
+            chunks = self.process_file(file_path, pages)
+        except Exception as e:
+            logger.error(f"Error processing {file_path}: {e}")
+            chunks = []
+
+        return FileResult(
+            file_path=file_path,
+            chunks=chunks,
+            seconds=time.perf_counter() - start_time,
+            worker=os.getpid(),
+            backend_stats=self._file_backend_stats,
+            image_only_pages=self._file_image_only_pages,
+            pages=pages,
+            token_stats=self._file_token_stats,
+            units=self._file_units or []
+        )
+
+    def _chunk_merged(self, result: FileResult) -> FileResult:
+        """Strip and chunk the pages that split PDF parts returned unchunked"""
+        if result.units:
+            self._file_units = None
+            self._file_token_stats = result.token_stats
+            result.chunks = self._chunk_units(result.units)
+            result.units = []
+        return result
+
+    def iter_chunks(self, sources: List[str]):
+        """
+        Stream chunks from files and directories without holding the corpus in memory
+
+        Sources are expanded up front (so the worker pool sees every file),
+        then chunks are yielded file by file in source order.
+
+        Args:
+            sources: File and directory paths
+
+        Yields:
+            TextChunk objects
+        """
+        for chunks in self._iter_file_chunks(self.collect_sources(sources)):
+            yield from chunks
+
+    def collect_sources(self, sources: List[str]) -> List[str]:
+        """
+        Expand a list of file and directory sources into supported file paths
+
+        Args:
+            sources: File and directory paths
+
+        Returns:
+            List of file paths in source order
+        """
+        files = []
+
+        for source in sources:
+            logger.info(f"Collecting source: {source}")
+
+            if os.path.isfile(source):
+                # Single file
+                files.append(source)
+            elif os.path.isdir(source):
+                # Directory
+                files.extend(self.collect_files(source, recursive=True))
+            else:
+                logger.warning(f"Source not found: {source}")
+
+        return files
+
+    def deduplicate_files(self, files: List[str]) -> List[str]:
+        """
+        Drop files listed more than once or identical in content to an earlier file
+
+        Paths are compared by real path, then files of equal size by SHA-256.
+        The first occurrence is kept; later byte-identical copies are recorded
+        in self.aliases so their chunks can be attributed to every path.
+
+        Args:
+            files: File paths in source order
+
+        Returns:
+            Unique file paths in source order
+        """
+        unique = []
+        seen_paths = set()
+        by_size: Dict[int, List[str]] = {}
+
+        for file_path in files:
+            self.dedup_stats['files_listed'] += 1
+            real_path = os.path.realpath(file_path)
+
+            if real_path in seen_paths:
+                self.dedup_stats['path_duplicates'] += 1
+                self.dedup_stats['bytes_saved'] += os.path.getsize(real_path)
+                logger.info(f"Skipping {file_path}: already listed")
+                continue
+            seen_paths.add(real_path)
+
+            size = os.path.getsize(real_path)
+            canonical = None
+            for candidate in by_size.get(size, []):
+                if self._content_hash(candidate) == self._content_hash(file_path):
+                    canonical = candidate
+                    break
+
+            if canonical:
+                self.aliases.setdefault(canonical, []).append(file_path)
+                self.dedup_stats['content_duplicates'] += 1
+                self.dedup_stats['bytes_saved'] += size
+                logger.info(f"Skipping {file_path}: identical to {canonical}")
+                continue
+
+            by_size.setdefault(size, []).append(file_path)
+            unique.append(file_path)
+
+        self.dedup_stats['unique_files'] += len(unique)
+        return unique
+
+    def _content_hash(self, file_path: str) -> str:
+        """SHA-256 of a file, reusing the extraction cache's size/mtime index when enabled"""
+        if self.cache:
+            return self.cache.file_hash(file_path)
+        if file_path not in self._content_hashes:
+            self._content_hashes[file_path] = _file_sha256(file_path)
+        return self._content_hashes[file_path]
+
+    def log_token_stats(self):
+        """Log token totals before and after boilerplate stripping"""
+        if not self.token_stats:
+            return
+
+        before = sum(stats['tokens_before'] for stats in self.token_stats.values())
+        after = sum(stats['tokens_after'] for stats in self.token_stats.values())
+        lines = sum(stats['boilerplate_lines'] for stats in self.token_stats.values())
+        saved = (before - after) / before * 100 if before else 0.0
+
+        logger.info(f"\nTokens before boilerplate stripping: {before:,}")
+        logger.info(f"Tokens after: {after:,} ({saved:.1f}% fewer, {lines:,} lines removed)")
+
+    def log_quarantine(self):
+        """Log every file the watchdog killed, with the reason"""
+        if not self.quarantine:
+            return
+
+        logger.warning(f"\nQuarantined files: {len(self.quarantine)}")
+        for entry in self.quarantine:
+            pages = f" (pages {entry['pages'][0]}-{entry['pages'][1]})" if entry['pages'] else ""
+            logger.warning(f"  {entry['path']}{pages}: {entry['reason']}")
+
+    def log_dedup_stats(self):
+        """Log how many duplicate sources were skipped and what that saved"""
+        stats = self.dedup_stats
+        if not (stats['path_duplicates'] or stats['content_duplicates']):
+            return
+
+        logger.info("\nDuplicate sources:")
+        logger.info(f"  Files listed: {stats['files_listed']} -> {stats['unique_files']} unique")
+        logger.info(f"  Listed more than once: {stats['path_duplicates']}")
+        logger.info(f"  Byte-identical copies: {stats['content_duplicates']}")
+        logger.info(f"  Bytes not parsed: {stats['bytes_saved'] / (1024 * 1024):.1f} MB")
+        logger.info(f"  Tokens not re-chunked/embedded: {stats['tokens_saved']:,}")
+        for canonical, aliases in self.aliases.items():
+            logger.info(f"  {os.path.basename(canonical)}: also at {', '.join(aliases)}")
+
+    def process_files(self, files: List[str]) -> List[TextChunk]:
+        """
+        Process a list of files, in parallel when workers > 1
+
+        Chunks are returned in the order of ``files`` regardless of which
+        worker finished first, so output is identical to serial mode.
+
+        Args:
+            files: Paths of files to process
 
         Returns:
             List of all TextChunk objects
         """
-        logger.info(f"Processing directory: {directory} (recursive={recursive})")
         all_chunks = []
-        supported_extensions = {'.pdf', '.pptx', '.docx'}
+        for chunks in self._iter_file_chunks(files):
+            all_chunks.extend(chunks)
+        return all_chunks
+
+    def _iter_file_chunks(self, files: List[str]):
+        """Yield each unique file's chunks in order, serving unchanged files from the cache"""
+        files = self.deduplicate_files([str(f) for f in files])
+
+        # Only check which files are cached up front; their chunks are loaded as each file's turn comes
+        hits = {f for f in files if self.cache.contains(f)} if self.cache else set()
+        extracted = self._iter_extract(f for f in files if f not in hits)
+
+        for file_path in files:
+            if file_path in hits:
+                result = self.cache.get(file_path, self._generate_doc_id(file_path))
+                if result is None:
+                    # Entry became unreadable since the check; extract the file here instead
+                    result = self.extract_file(file_path)
+                    self._record_worker(result)
+            else:
+                result = next(extracted)
+            self._record_result(result)
+
+            # Empty and quarantined results are not cached so those files are retried next run
+            if (self.cache and not result.cached and not result.quarantine_reason
+                    and (result.chunks or result.image_only_pages)):
+                self.cache.put(file_path, self._generate_doc_id(file_path), result)
+
+            if self.ocr and result.image_only_pages:
+                result.chunks = self._add_ocr_chunks(file_path, result)
+
+            aliases = self.aliases.get(file_path)
+            if aliases:
+                for chunk in result.chunks:
+                    chunk.metadata.aliases = aliases
+                self.dedup_stats['tokens_saved'] += sum(c.token_count for c in result.chunks) * len(aliases)
+
+            yield result.chunks
+
+        if self.ocr:
+            self.ocr.close()
+
+        if self.cache:
+            self.cache.save()
+            logger.info(f"Extraction cache: {self.cache.hits} hits, {self.cache.misses} misses "
+                        f"({self.cache.files_hashed} files hashed)")
+
+    def _add_ocr_chunks(self, file_path: str, result: FileResult) -> List[TextChunk]:
+        """
+        OCR a PDF's image-only pages and merge their chunks into the file's chunks in page order
+
+        Args:
+            file_path: Path to PDF file
+            result: Extraction result listing the image-only pages
+
+        Returns:
+            The file's chunks including OCR'd pages
+        """
+        from ocr_pages import pdf_page_count
+
+        try:
+            file_hash = self.cache.file_hash(file_path) if self.cache else None
+            texts = self.ocr.ocr_pages(file_path, result.image_only_pages, file_hash)
+            total_pages = pdf_page_count(file_path)
+        except Exception as e:
+            logger.error(f"OCR failed for {file_path}: {e}")
+            return result.chunks
+
+        doc_id = self._generate_doc_id(file_path)
+        filename = os.path.basename(file_path)
+        ocr_chunks = []
+
+        # Count the OCR'd text in this file's token stats
+        self._file_token_stats = result.token_stats
+
+        for page_num, text in texts.items():
+            if not text.strip():
+                continue
+
+            metadata = ChunkMetadata(
+                filename=filename,
+                doc_type='pdf',
+                page=page_num,
+                total_pages=total_pages,
+                source_path=file_path
+            )
+            ocr_chunks.extend(self.chunk_text(text, metadata, f"{doc_id}_p{page_num}"))
+
+        logger.info(f"OCR added {len(ocr_chunks)} chunks from {len(texts)} image-only pages of {filename}")
+
+        # Stable sort keeps chunk order within each page
+        return sorted(result.chunks + ocr_chunks, key=lambda chunk: chunk.metadata.page or 0)
 
+    def _iter_extract(self, files: Iterable[str]):
+        """Extract files serially, across the worker pool or under the watchdog, yielding one FileResult per file in order"""
+        # Large PDFs become several page-range tasks; everything else is one task
+        tasks = []
+        part_counts = {}
+        for file_path in files:
+            ranges = self._split_pdf(file_path) or [None]
+            part_counts[file_path] = len(ranges)
+            tasks.extend((file_path, pages) for pages in ranges)
+
+        if self.file_timeout or self.max_file_memory_mb:
+            parts = self._iter_watchdog(tasks)
+        elif self.workers == 1 or len(tasks) <= 1:
+            parts = (self.extract_file(file_path, pages) for file_path, pages in tasks)
+        else:
+            parts = self._iter_pool(tasks)
+
+        pending = []
+        for (file_path, _), part in zip(tasks, parts):
+            self._record_worker(part)
+            pending.append(part)
+
+            if len(pending) == part_counts[file_path]:
+                yield self._chunk_merged(self._merge_parts(pending))
+                pending = []
+
+    def _iter_pool(self, tasks: List[Tuple[str, Optional[Tuple[int, int]]]]):
+        """Run tasks on a process pool, yielding FileResults in task order"""
+        logger.info(f"Extracting {len(tasks)} tasks with {self.workers} worker processes")
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 initializer=_init_worker,
+                                 initargs=(self._worker_config(),)) as executor:
+            # map() yields results in submission order, so page ranges arrive in page order
+            yield from executor.map(_extract_in_worker, tasks)
+
+    def _iter_watchdog(self, tasks: List[Tuple[str, Optional[Tuple[int, int]]]]):
+        """
+        Run tasks in supervised worker processes, yielding FileResults in task order
+
+        A worker that runs past file_timeout, grows past max_file_memory_mb or
+        dies is killed and replaced; its task comes back as a quarantined
+        FileResult with no chunks so the run continues.
+        """
+        logger.info(f"Extracting {len(tasks)} tasks with {self.workers} watchdog workers "
+                    f"(timeout={self.file_timeout}s, memory cap={self.max_file_memory_mb} MB)")
+
+        if self.max_file_memory_mb and _process_rss_mb(os.getpid()) is None:
+            logger.warning("Cannot read process memory on this platform (install psutil); memory cap disabled")
+
+        config = self._worker_config()
+        workers = [_WatchdogWorker(config) for _ in range(min(self.workers, len(tasks)))]
+        queue = deque(enumerate(tasks))
+        results: Dict[int, FileResult] = {}
+        next_index = 0
+
+        def quarantined(worker: '_WatchdogWorker', reason: str) -> FileResult:
+            file_path, pages = tasks[worker.task_index]
+            return FileResult(file_path=file_path, chunks=[], seconds=time.perf_counter() - worker.started_at,
+                              worker=worker.process.pid, pages=pages, quarantine_reason=reason)
+
+        try:
+            while next_index < len(tasks):
+                for worker in workers:
+                    if worker.task_index is None and queue:
+                        worker.assign(*queue.popleft())
+
+                busy = [w for w in workers if w.task_index is not None]
+                ready = wait_for_connections([w.conn for w in busy], timeout=0.1)
+
+                for position, worker in enumerate(workers):
+                    if worker.task_index is None:
+                        continue
+
+                    reason = None
+                    if worker.conn in ready:
+                        try:
+                            results[worker.task_index] = worker.conn.recv()
+                            worker.task_index = None
+                            continue
+                        except (EOFError, OSError):
+                            worker.process.join(timeout=1)
+                            reason = f"worker exited with code {worker.process.exitcode}"
+                    elif self.file_timeout and time.perf_counter() - worker.started_at > self.file_timeout:
+                        reason = f"timed out after {self.file_timeout:g}s"
+                    elif self.max_file_memory_mb:
+                        growth = worker.memory_growth_mb()
+                        if growth is not None and growth > self.max_file_memory_mb:
+                            reason = (f"exceeded memory cap (grew {growth:.0f} MB while extracting, "
+                                      f"> {self.max_file_memory_mb:g} MB)")
+
+                    if reason:
+                        results[worker.task_index] = quarantined(worker, reason)
+                        worker.kill()
+                        workers[position] = _WatchdogWorker(config)
+
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def _split_pdf(self, file_path: str) -> List[Tuple[int, int]]:
+        """Page ranges for a PDF large enough to fan out across workers (empty if not split)"""
+        if self.workers == 1 or self.pdf_split_pages <= 0 or not file_path.lower().endswith('.pdf'):
+            return []
+
+        if file_path not in self._pdf_ranges:
+            ranges = []
+            try:
+                with self._open_fast_pdf(file_path) as (total_pages, _):
+                    if total_pages > self.pdf_split_pages:
+                        ranges = [(first, min(first + self.pdf_split_pages - 1, total_pages))
+                                  for first in range(1, total_pages + 1, self.pdf_split_pages)]
+            except Exception as e:
+                logger.warning(f"Could not count pages of {file_path}, extracting it whole: {e}")
+            self._pdf_ranges[file_path] = ranges
+
+        return self._pdf_ranges[file_path]
+
+    @staticmethod
+    def _merge_parts(parts: List[FileResult]) -> FileResult:
+        """Combine page-range results for one file into a single FileResult"""
+        if len(parts) == 1:
+            return parts[0]
+
+        merged = FileResult(file_path=parts[0].file_path, chunks=[], worker=None)
+        reasons = [part.quarantine_reason for part in parts if part.quarantine_reason]
+        if reasons:
+            merged.quarantine_reason = "; ".join(reasons)
+
+        for part in parts:
+            merged.chunks.extend(part.chunks)
+            merged.seconds += part.seconds
+            merged.image_only_pages.extend(part.image_only_pages)
+            merged.units.extend(part.units)
+            for key, value in part.token_stats.items():
+                merged.token_stats[key] = merged.token_stats.get(key, 0) + value
+            for backend, stats in part.backend_stats.items():
+                totals = merged.backend_stats.setdefault(backend, {'pages': 0, 'seconds': 0.0})
+                totals['pages'] += stats['pages']
+                totals['seconds'] += stats['seconds']
+        return merged
+
+    def _record_worker(self, result: FileResult):
+        """Add one extraction task to its worker's throughput statistics and quarantine list"""
+        if result.quarantine_reason:
+            self.quarantine.append({
+                'path': result.file_path,
+                'pages': list(result.pages) if result.pages else None,
+                'reason': result.quarantine_reason,
+                'seconds': round(result.seconds, 1)
+            })
+            logger.warning(f"Quarantined {result.file_path}"
+                           f"{f' (pages {result.pages[0]}-{result.pages[1]})' if result.pages else ''}: "
+                           f"{result.quarantine_reason}")
+
+        stats = self.worker_stats.setdefault(result.worker, {'tasks': 0, 'chunks': 0, 'seconds': 0.0})
+        stats['tasks'] += 1
+        stats['chunks'] += len(result.chunks)
+        stats['seconds'] += result.seconds
+
+    def _record_result(self, result: FileResult):
+        """Log a FileResult and merge its backend and image-only page statistics"""
+        if result.image_only_pages:
+            self.image_only_pages[result.file_path] = result.image_only_pages
+
+        stats = result.token_stats
+        if stats:
+            self.token_stats[result.file_path] = stats
+            removed = stats['tokens_before'] - stats['tokens_after']
+            logger.info(f"Tokens in {os.path.basename(result.file_path)}: {stats['tokens_before']:,} -> "
+                        f"{stats['tokens_after']:,} ({removed:,} in {stats['boilerplate_lines']} boilerplate lines)")
+
+        if result.cached:
+            logger.info(f"Cached {os.path.basename(result.file_path)}: {len(result.chunks)} chunks")
+            return
+
+        logger.info(f"Processed {os.path.basename(result.file_path)}: {len(result.chunks)} chunks "
+                    f"({result.seconds:.2f}s)")
+
+        for backend, backend_stats in result.backend_stats.items():
+            totals = self.backend_stats.setdefault(backend, {'pages': 0, 'seconds': 0.0})
+            totals['pages'] += backend_stats['pages']
+            totals['seconds'] += backend_stats['seconds']
+
+    def _worker_config(self) -> Dict[str, Any]:
+        """Constructor arguments for the processors created in pool workers"""
+        return {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'pdf_backend': self.pdf_backend,
+            'docx_backend': self.docx_backend,
+            'pptx_backend': self.pptx_backend,
+            'strip_boilerplate': self.strip_boilerplate,
+        }
+
+    def log_worker_stats(self):
+        """Log tasks/sec and chunks/sec for every worker that processed files"""
+        if not self.worker_stats:
+            return
+
+        logger.info("\nWorker throughput:")
+        for worker, stats in sorted(self.worker_stats.items()):
+            seconds = stats['seconds'] or 1e-9
+            logger.info(f"  Worker {worker}: {stats['tasks']} tasks, {stats['chunks']} chunks in "
+                        f"{stats['seconds']:.1f}s ({stats['tasks'] / seconds:.2f} tasks/s, "
+                        f"{stats['chunks'] / seconds:.1f} chunks/s)")
+
+    def log_backend_stats(self):
+        """Log pages and time spent in each PDF backend, plus image-only page counts"""
+        if self.backend_stats:
+            logger.info("\nPDF backend timing:")
+            for backend, stats in sorted(self.backend_stats.items()):
+                per_page_ms = stats['seconds'] / max(stats['pages'], 1) * 1000
+                logger.info(f"  {backend}: {stats['pages']} pages in {stats['seconds']:.2f}s "
+                            f"({per_page_ms:.1f} ms/page)")
+
+        if self.image_only_pages:
+            total = sum(len(pages) for pages in self.image_only_pages.values())
+            logger.info(f"\nImage-only pages (no text layer): {total} in {len(self.image_only_pages)} files")
+            for file_path, pages in self.image_only_pages.items():
+                logger.info(f"  {os.path.basename(file_path)}: pages {pages}")
+
+    def collect_files(self, directory: str, recursive: bool = True) -> List[str]:
+        """
+        List all supported files in a directory
+
+        Args:
+            directory: Path to directory
+            recursive: Whether to include subdirectories
+
+        Returns:
+            List of file paths
+        """
         path = Path(directory)
 
         if not path.exists():
@@ -362,21 +1719,26 @@ class DocumentProcessor:
 
         # Get all files
         if recursive:
-            files = [f for f in path.rglob('*') if f.is_file() and f.suffix.lower() in supported_extensions]
+            files = [f for f in path.rglob('*') if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS]
         else:
-            files = [f for f in path.glob('*') if f.is_file() and f.suffix.lower() in supported_extensions]
+            files = [f for f in path.glob('*') if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS]
 
         logger.info(f"Found {len(files)} supported files")
+        return [str(f) for f in files]
 
-        for file_path in files:
-            try:
-                chunks = self.process_file(str(file_path))
-                all_chunks.extend(chunks)
-                logger.info(f"Processed {file_path.name}: {len(chunks)} chunks")
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
+    def process_directory(self, directory: str, recursive: bool = True) -> List[TextChunk]:
+        """
+        Process all supported files in a directory
 
-        return all_chunks
+        Args:
+            directory: Path to directory
+            recursive: Whether to process subdirectories
+
+        Returns:
+            List of all TextChunk objects
+        """
+        logger.info(f"Processing directory: {directory} (recursive={recursive})")
+        return self.process_files(self.collect_files(directory, recursive))
 
     def _generate_doc_id(self, file_path: str) -> str:
         """Generate a unique document ID from file path"""
@@ -385,11 +1747,135 @@ class DocumentProcessor:
         return hash_obj.hexdigest()[:12]
 
 
+def sidecar_path(output_path: str) -> str:
+    """Path of the metadata file written next to a JSONL chunks file"""
+    return f"{os.path.splitext(output_path)[0]}.meta.json"
+
+
+def write_chunks_jsonl(chunks, output_path: str) -> Dict[str, Any]:
+    """
+    Stream chunks to a JSONL file, one chunk per line, flushing as they arrive
+
+    Args:
+        chunks: Iterable of TextChunk objects
+        output_path: Path to output JSONL file
+
+    Returns:
+        Dictionary with total_chunks and per-doc_type counts
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    stats = {'total_chunks': 0, 'doc_types': {}}
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk.to_dict(), ensure_ascii=False) + '\n')
+            f.flush()
+
+            stats['total_chunks'] += 1
+            doc_type = chunk.metadata.doc_type
+            stats['doc_types'][doc_type] = stats['doc_types'].get(doc_type, 0) + 1
+
+    return stats
+
+
+def write_chunks_json(chunks, output_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Write chunks as a single indented JSON document (legacy format)
+
+    Args:
+        chunks: Iterable of TextChunk objects
+        output_path: Path to output JSON file
+        metadata: Metadata header; total_chunks is filled in
+
+    Returns:
+        Dictionary with total_chunks and per-doc_type counts
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    chunks_data = [chunk.to_dict() for chunk in chunks]
+
+    doc_types = {}
+    for chunk in chunks_data:
+        doc_type = chunk['metadata']['doc_type']
+        doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
+
+    output_data = {
+        "metadata": {**metadata, "total_chunks": len(chunks_data)},
+        "chunks": chunks_data
+    }
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+    return {'total_chunks': len(chunks_data), 'doc_types': doc_types}
+
+
 def main():
     """Main execution function"""
 
+    parser = argparse.ArgumentParser(description='Extract and chunk PDF, PPTX, DOCX and XLSX documents')
+    parser.add_argument('--output', type=str,
+                       help='Output file for extracted chunks '
+                            '(default: data/extracted_chunks.jsonl or .json, depending on --format)')
+    parser.add_argument('--format', type=str, default='jsonl', choices=['jsonl', 'json'],
+                       help='jsonl streams chunks to disk with a .meta.json sidecar; '
+                            'json writes one indented document at the end')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Worker processes for extraction (1 = serial)')
+    parser.add_argument('--pdf-backend', type=str, default='auto', choices=['auto', 'pdfplumber'],
+                       help='auto: fast text layer with pdfplumber only for badly laid out pages; '
+                            'pdfplumber: full layout analysis on every page')
+    parser.add_argument('--docx-backend', type=str, default='python-docx', choices=['python-docx', 'ooxml'],
+                       help='ooxml: stream paragraphs and tables straight from the zip '
+                            '(same text, less time and memory)')
+    parser.add_argument('--pptx-backend', type=str, default='python-pptx', choices=['python-pptx', 'ooxml'],
+                       help='ooxml: stream slide text and notes straight from the zip '
+                            '(same text, less time and memory)')
+    parser.add_argument('--pdf-split-pages', type=int, default=50,
+                       help='With --workers > 1, split PDFs longer than this into page ranges '
+                            'extracted in parallel (0 disables)')
+    parser.add_argument('--file-timeout', type=float, default=0,
+                       help='Seconds one file may take before it is killed and quarantined, e.g. 300 '
+                            '(default 0: off; setting either limit runs extraction in watchdog workers)')
+    parser.add_argument('--max-file-memory', type=float, default=0,
+                       help='Memory (MB) a worker may add while extracting one file, over its idle size, '
+                            'before it is killed and quarantined, e.g. 2048 (default 0: off)')
+    parser.add_argument('--keep-boilerplate', action='store_true',
+                       help='Keep headers, footers and other lines repeated across most pages or slides')
+    parser.add_argument('--ocr', action='store_true',
+                       help='OCR image-only PDF pages locally with Tesseract (cached by file, page and DPI)')
+    parser.add_argument('--ocr-dpi', type=int, default=300,
+                       help='Render resolution for OCR')
+    parser.add_argument('--ocr-lang', type=str, default='eng',
+                       help="Tesseract language(s) for OCR, e.g. 'eng' or 'eng+spa'")
+    parser.add_argument('--ocr-cache-dir', type=str,
+                       help='OCR raster/text cache directory (default: .ocr_cache next to the output)')
+    parser.add_argument('--cache-dir', type=str,
+                       help='Extraction cache directory (default: .extraction_cache next to the output)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Re-extract every file and leave the cache untouched')
+
+    args = parser.parse_args()
+
+    output_path = args.output or f"/Users/a21/Desktop/routellm-chatbot-railway/data/extracted_chunks.{args.format}"
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or os.path.join(os.path.dirname(output_path), '.extraction_cache')
+
+    ocr_cache_dir = None
+    if args.ocr:
+        ocr_cache_dir = args.ocr_cache_dir or os.path.join(os.path.dirname(output_path), '.ocr_cache')
+
     # Initialize processor
-    processor = DocumentProcessor(chunk_size=500, chunk_overlap=50)
+    processor = DocumentProcessor(chunk_size=500, chunk_overlap=50, workers=args.workers,
+                                  cache_dir=cache_dir, pdf_backend=args.pdf_backend,
+                                  docx_backend=args.docx_backend, pptx_backend=args.pptx_backend,
+                                  pdf_split_pages=args.pdf_split_pages,
+                                  file_timeout=args.file_timeout or None,
+                                  max_file_memory_mb=args.max_file_memory or None,
+                                  ocr_cache_dir=ocr_cache_dir, ocr_dpi=args.ocr_dpi,
+                                  ocr_lang=args.ocr_lang,
+                                  strip_boilerplate=not args.keep_boilerplate)
 
     # Define document sources
     document_sources = [
@@ -406,60 +1892,56 @@ def main():
     logger.info("Starting Document Extraction Pipeline")
     logger.info("=" * 80)
 
-    all_chunks = []
-
-    for source in document_sources:
-        logger.info(f"\nProcessing source: {source}")
-
-        if os.path.isfile(source):
-            # Process single file
-            chunks = processor.process_file(source)
-            all_chunks.extend(chunks)
-        elif os.path.isdir(source):
-            # Process directory
-            chunks = processor.process_directory(source, recursive=True)
-            all_chunks.extend(chunks)
-        else:
-            logger.warning(f"Source not found: {source}")
-
-    # Convert chunks to dictionaries
-    chunks_data = [chunk.to_dict() for chunk in all_chunks]
-
-    # Prepare output
-    output_data = {
-        "metadata": {
-            "total_chunks": len(chunks_data),
-            "chunk_size": processor.chunk_size,
-            "chunk_overlap": processor.chunk_overlap,
-            "sources_processed": len(document_sources),
-            "encoding": "cl100k_base"
-        },
-        "chunks": chunks_data
+    metadata = {
+        "chunk_size": processor.chunk_size,
+        "chunk_overlap": processor.chunk_overlap,
+        "sources_processed": len(document_sources),
+        "encoding": processor.encoding_name
     }
 
-    # Save to JSON
-    output_path = "/Users/a21/Desktop/routellm-chatbot-railway/data/extracted_chunks.json"
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    start_time = time.time()
+    chunks = processor.iter_chunks(document_sources)
+
+    if args.format == 'jsonl':
+        stats = write_chunks_jsonl(chunks, output_path)
+        metadata.update({
+            "total_chunks": stats['total_chunks'],
+            "format": "jsonl",
+            "pdf_backends": processor.backend_stats,
+            "image_only_pages": processor.image_only_pages,
+            "deduplication": {**processor.dedup_stats, "aliases": processor.aliases},
+            "quarantine": processor.quarantine,
+            "tokens": processor.token_stats,
+            "ocr": processor.ocr.stats if processor.ocr else None
+        })
+
+        with open(sidecar_path(output_path), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+    else:
+        stats = write_chunks_json(chunks, output_path, metadata)
+
+    elapsed = time.time() - start_time
 
     logger.info("=" * 80)
     logger.info(f"Extraction Complete!")
-    logger.info(f"Total chunks: {len(chunks_data)}")
+    logger.info(f"Total chunks: {stats['total_chunks']}")
+    logger.info(f"Extraction time: {elapsed:.1f}s ({processor.workers} workers)")
     logger.info(f"Output saved to: {output_path}")
     logger.info("=" * 80)
 
     # Print statistics
-    doc_types = {}
-    for chunk in chunks_data:
-        doc_type = chunk['metadata']['doc_type']
-        doc_types[doc_type] = doc_types.get(doc_type, 0) + 1
-
     logger.info("\nChunks by document type:")
-    for doc_type, count in doc_types.items():
+    for doc_type, count in stats['doc_types'].items():
         logger.info(f"  {doc_type.upper()}: {count} chunks")
 
+    processor.log_worker_stats()
+    processor.log_backend_stats()
+    processor.log_dedup_stats()
+    processor.log_token_stats()
+    processor.log_quarantine()
+    if processor.ocr:
+        processor.ocr.log_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -6,17 +6,31 @@ Reads extracted chunks and generates embeddings using OpenAI API.
 
 import os
 import json
+import shutil
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from dataclasses import dataclass
 import argparse
 
-try:
-    from openai import OpenAI
-except ImportError:
-    print("Error: openai library not installed. Install with: pip install openai")
-    exit(1)
+from embedding_batches import (
+    TokenBudgetBatcher,
+    DEFAULT_BATCH_ITEMS,
+    DEFAULT_BATCH_TOKENS,
+    OVERLONG_POLICIES,
+    embed_bisecting,
+    dedupe_texts,
+    dedup_report,
+)
+from embedding_cache import EmbeddingCache, default_cache_path
+from embedding_checkpoint import EmbeddingCheckpoint, checkpoint_dir
+from embedding_engine import (
+    AsyncEmbeddingEngine,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_TOKENS_PER_MINUTE,
+    DEFAULT_REQUESTS_PER_MINUTE,
+)
+from embedding_store import DTYPES, write_store, store_files, store_stem, native_dimensions, reduce_dimensions
 
 # Configure logging
 logging.basicConfig(
@@ -33,20 +47,61 @@ logger = logging.getLogger(__name__)
 class EmbeddingGenerator:
     """Generates embeddings for text chunks using OpenAI API"""
 
-    def __init__(self, api_key: str, model: str = "text-embedding-3-small", batch_size: int = 100):
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small",
+                 batch_size: int = DEFAULT_BATCH_ITEMS, batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                 overlong: str = 'split', concurrency: int = DEFAULT_CONCURRENCY,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 cache: Optional[EmbeddingCache] = None, dimensions: Optional[int] = None):
         """
         Initialize the embedding generator
 
         Args:
             api_key: OpenAI API key
             model: Embedding model to use
-            batch_size: Number of chunks to process in each batch
+            batch_size: Maximum number of chunks per request
+            batch_tokens: Token budget per request
+            overlong: 'split' or 'truncate' chunks over the model's per-input token limit
+            concurrency: Batch requests kept in flight by process_chunks (1 sends them one at a time)
+            tokens_per_minute: Token budget per minute for concurrent requests
+            requests_per_minute: Request budget per minute for concurrent requests
+            cache: Embedding cache checked before, and filled after, each API call
+            dimensions: Shorten embeddings to this many components (by the API for
+                text-embedding-3 models, otherwise truncated and renormalised here)
         """
+        # Imported here so --help and input validation don't pay for loading openai
+        try:
+            from openai import OpenAI
+        except ImportError as e:
+            raise ImportError("openai library not installed. Install with: pip install openai") from e
+
         self.client = OpenAI(api_key=api_key)
         self.model = model
-        self.batch_size = batch_size
+        self.dimensions = dimensions
+        self._request_options = {'dimensions': dimensions} if dimensions and native_dimensions(model) else {}
+        self.batcher = TokenBudgetBatcher(max_tokens=batch_tokens, max_items=batch_size, overlong=overlong)
+        self.concurrency = concurrency
+        self.cache = cache
         self.total_tokens_used = 0
-        logger.info(f"Initialized EmbeddingGenerator (model={model}, batch_size={batch_size})")
+        self.failed_inputs: List[Dict[str, str]] = []  # Texts the API rejected, with its error
+        self.failed_chunks: List[Dict[str, str]] = []  # Chunk ids left without embeddings by process_chunks
+        self.dedup_stats: Dict[str, float] = {}  # Duplicate texts collapsed by the last process_chunks
+
+        self.engine = None
+        if concurrency > 1:
+            self.engine = AsyncEmbeddingEngine(
+                api_key=api_key,
+                model=model,
+                batcher=self.batcher,
+                concurrency=concurrency,
+                tokens_per_minute=tokens_per_minute,
+                requests_per_minute=requests_per_minute,
+                dimensions=dimensions
+            )
+
+        logger.info(f"Initialized EmbeddingGenerator (model={model}, batch_size={batch_size}, "
+                    f"batch_tokens={self.batcher.max_tokens}, concurrency={concurrency}, "
+                    f"dimensions={dimensions or 'default'})")
 
     def generate_embedding(self, text: str) -> Optional[List[float]]:
         """
@@ -61,24 +116,34 @@ class EmbeddingGenerator:
         try:
             response = self.client.embeddings.create(
                 input=text,
-                model=self.model
+                model=self.model,
+                **self._request_options
             )
 
             # Track token usage
             self.total_tokens_used += response.usage.total_tokens
 
-            return response.data[0].embedding
+            return reduce_dimensions(response.data[0].embedding, self.dimensions)
 
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return None
 
-    def generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+    def generate_embeddings_batch(self, texts: List[str],
+                                  on_failure: Optional[Callable[[int, BaseException], None]] = None
+                                  ) -> List[Optional[List[float]]]:
         """
         Generate embeddings for a batch of texts
 
+        If the API rejects the batch because of its inputs, the batch is split
+        in half recursively until the bad inputs are isolated; the other texts
+        are still embedded in bulk.
+
         Args:
             texts: List of texts to embed
+            on_failure: Called with (index, error) for each text that could not be
+                embedded, whether rejected on its own or with its whole batch
+                (default: record it in failed_inputs)
 
         Returns:
             List of embedding vectors (None for failed embeddings)
@@ -86,88 +151,188 @@ class EmbeddingGenerator:
         if not texts:
             return []
 
+        if on_failure is None:
+            on_failure = lambda index, error: self._record_failure(texts[index], error)
+
         try:
-            response = self.client.embeddings.create(
-                input=texts,
-                model=self.model
-            )
+            return embed_bisecting(texts, self._request_embeddings, on_failure)
+        except Exception as e:
+            # Rate limits and transient errors were already retried by the client
+            logger.error(f"Error generating batch embeddings: {e}")
+            for index in range(len(texts)):
+                on_failure(index, e)
+            return [None] * len(texts)
+
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Send one embeddings request; raises on any API error"""
+        response = self.client.embeddings.create(
+            input=texts,
+            model=self.model,
+            **self._request_options
+        )
 
-            # Track token usage
-            self.total_tokens_used += response.usage.total_tokens
+        # Track token usage
+        self.total_tokens_used += response.usage.total_tokens
 
-            # Extract embeddings in order
-            embeddings = [data.embedding for data in response.data]
+        # Extract embeddings in order (already shortened when the API did it)
+        embeddings = [reduce_dimensions(data.embedding, self.dimensions)
+                      for data in sorted(response.data, key=lambda data: data.index)]
 
-            logger.info(f"Generated {len(embeddings)} embeddings (tokens used: {response.usage.total_tokens})")
+        logger.info(f"Generated {len(embeddings)} embeddings (tokens used: {response.usage.total_tokens})")
 
-            return embeddings
+        return embeddings
 
-        except Exception as e:
-            logger.error(f"Error generating batch embeddings: {e}")
-            # Fall back to individual generation
-            logger.info("Falling back to individual embedding generation...")
-            return [self.generate_embedding(text) for text in texts]
+    def _record_failure(self, text: str, error: BaseException):
+        """Remember a text the API rejected on its own, with the API's error"""
+        self.failed_inputs.append({'text': text, 'error': str(error)})
+        logger.error(f"Input rejected by the API: {error} (text: {text[:80]!r})")
 
     def process_chunks(self, chunks: List[Dict[str, Any]],
                       show_progress: bool = True,
-                      rate_limit_delay: float = 0.1) -> List[Dict[str, Any]]:
+                      rate_limit_delay: float = 0.1,
+                      checkpoint: Optional[EmbeddingCheckpoint] = None,
+                      checkpoint_every: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Process all chunks and add embeddings
 
+        Chunks whose text is identical to an earlier chunk's (after
+        normalising Unicode and whitespace) are embedded once and share the
+        vector, and chunks whose text is already in the cache are not sent.
+        With concurrency > 1 the rest go through the async engine, paced by the
+        TPM/RPM budgets; otherwise they are sent one batch at a time with
+        rate_limit_delay between batches.
+
+        With a checkpoint, unique texts are embedded checkpoint_every at a time
+        and the chunks sharing them are appended to the checkpoint as soon as
+        each group is done, so an interrupted run only loses the group in flight.
+
         Args:
             chunks: List of chunk dictionaries
             show_progress: Whether to show progress information
-            rate_limit_delay: Delay between batches (seconds)
+            rate_limit_delay: Delay between batches (seconds) when sending one at a time
+            checkpoint: Checkpoint that each group of embedded chunks is appended to
+            checkpoint_every: Unique texts per group (default: batch_size x
+                concurrency, one full round of requests)
 
         Returns:
-            List of chunks with embeddings added
+            List of chunks with embeddings added, in input order
         """
         logger.info(f"Processing {len(chunks)} chunks...")
 
-        embedded_chunks = []
-        failed_chunks = []
+        def embed_texts(texts: List[str]) -> List[Optional[List[float]]]:
+            if self.engine is not None:
+                return self._embed_concurrently(texts, show_progress)
+            return self._embed_sequentially(texts, show_progress, rate_limit_delay)
+
+        dedup = dedupe_texts([chunk['text'] for chunk in chunks])
+        members = dedup.members()
+        tokens_saved = 0
+        if dedup.duplicates:
+            tokens_saved = dedup.tokens_saved(
+                lambda text: len(self.batcher.encoding.encode(text, disallowed_special=())))
+        self.dedup_stats = dedup_report(len(chunks), len(dedup.unique), tokens_saved)
+        if dedup.duplicates:
+            logger.info(f"Deduplicated {len(chunks):,} chunks to {len(dedup.unique):,} unique texts "
+                        f"(ratio {self.dedup_stats['dedup_ratio']:.2f}x, {tokens_saved:,} tokens saved)")
+
+        group_size = len(dedup.unique)
+        if checkpoint is not None:
+            group_size = checkpoint_every or self.batcher.max_items * self.concurrency
+
+        embedded: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+        failures: Dict[int, str] = {}
+        done = 0
+
+        for group_start in range(0, len(dedup.unique), max(group_size, 1)):
+            texts = dedup.unique[group_start:group_start + group_size]
+            tokens_before = self.total_tokens_used
+
+            if self.cache is not None:
+                embeddings = self.cache.embed(texts, embed_texts)
+            else:
+                embeddings = embed_texts(texts)
+
+            errors = {failure['text']: failure['error'] for failure in self.failed_inputs}
+            group_embedded = []
+
+            # Add each text's embedding to every chunk that shares it
+            for text, embedding, owners in zip(texts, embeddings, members[group_start:group_start + group_size]):
+                for index in owners:
+                    chunk = chunks[index]
+                    if embedding is not None:
+                        chunk_with_embedding = chunk.copy()
+                        chunk_with_embedding['embedding'] = embedding
+                        embedded[index] = chunk_with_embedding
+                        group_embedded.append(chunk_with_embedding)
+                    else:
+                        failures[index] = errors.get(text, 'request failed')
+                        logger.warning(f"Failed to generate embedding for chunk {chunk['id']}: {failures[index]}")
+                done += len(owners)
+
+            if checkpoint is not None:
+                checkpoint.append(group_embedded, self.total_tokens_used - tokens_before)
+                if show_progress:
+                    logger.info(f"Checkpointed {done}/{len(chunks)} chunks "
+                                f"({checkpoint.count:,} in {checkpoint.directory})")
+
+        if self.cache is not None:
+            self.cache.log_stats()
+
+        embedded_chunks = [chunk for chunk in embedded if chunk is not None]
+        failed_chunks = [{'id': chunks[index]['id'], 'error': failures[index]} for index in sorted(failures)]
+        logger.info(f"Successfully embedded {len(embedded_chunks)}/{len(chunks)} chunks")
+
+        if failed_chunks:
+            logger.warning(f"Failed chunks: {len(failed_chunks)}")
+            logger.warning(f"Failed IDs: {[failure['id'] for failure in failed_chunks[:10]]}...")  # Show first 10
+        self.failed_chunks = failed_chunks
+
+        return embedded_chunks
 
-        # Process in batches
-        for i in range(0, len(chunks), self.batch_size):
-            batch_chunks = chunks[i:i + self.batch_size]
-            batch_texts = [chunk['text'] for chunk in batch_chunks]
+    def _embed_sequentially(self, texts: List[str], show_progress: bool,
+                            rate_limit_delay: float) -> List[Optional[List[float]]]:
+        """Embed one token-budget batch at a time, sleeping rate_limit_delay between batches"""
+        plan = self.batcher.plan(texts)
+        embeddings = []
 
+        for number, (start, end) in enumerate(plan.batches):
             if show_progress:
-                progress = (i / len(chunks)) * 100
-                logger.info(f"Progress: {progress:.1f}% ({i}/{len(chunks)} chunks)")
-
-            # Generate embeddings for batch
-            embeddings = self.generate_embeddings_batch(batch_texts)
-
-            # Add embeddings to chunks
-            for chunk, embedding in zip(batch_chunks, embeddings):
-                if embedding is not None:
-                    chunk_with_embedding = chunk.copy()
-                    chunk_with_embedding['embedding'] = embedding
-                    embedded_chunks.append(chunk_with_embedding)
-                else:
-                    failed_chunks.append(chunk['id'])
-                    logger.warning(f"Failed to generate embedding for chunk: {chunk['id']}")
+                progress = (start / len(plan.inputs)) * 100
+                logger.info(f"Progress: {progress:.1f}% ({start}/{len(plan.inputs)} inputs)")
+
+            # Generate embeddings for batch; rejected inputs are reported under their chunk's text
+            embeddings.extend(self.generate_embeddings_batch(
+                plan.inputs[start:end],
+                on_failure=lambda index, error, start=start: self._record_failure(
+                    texts[plan.owners[start + index]], error)
+            ))
 
             # Rate limiting delay
-            if i + self.batch_size < len(chunks):
+            if number + 1 < len(plan.batches):
                 time.sleep(rate_limit_delay)
 
-        logger.info(f"Successfully embedded {len(embedded_chunks)}/{len(chunks)} chunks")
+        return plan.combine(embeddings)
 
-        if failed_chunks:
-            logger.warning(f"Failed chunks: {len(failed_chunks)}")
-            logger.warning(f"Failed IDs: {failed_chunks[:10]}...")  # Show first 10
+    def _embed_concurrently(self, texts: List[str], show_progress: bool) -> List[Optional[List[float]]]:
+        """Embed all batches through the async engine, results in input order"""
+        def report(done: int, total: int):
+            logger.info(f"Progress: {done / total * 100:.1f}% ({done}/{total} inputs)")
 
-        return embedded_chunks
+        tokens_before = self.engine.total_tokens_used
+        failures_before = len(self.engine.failed_inputs)
+        embeddings = self.engine.embed(texts, on_batch=report if show_progress else None)
+        self.total_tokens_used += self.engine.total_tokens_used - tokens_before
+        self.failed_inputs.extend(self.engine.failed_inputs[failures_before:])
+        self.engine.log_stats()
+        return embeddings
 
 
 def load_chunks(input_path: str) -> Dict[str, Any]:
     """
-    Load chunks from JSON file
+    Load chunks from a JSON file or a JSONL file with a .meta.json sidecar
 
     Args:
-        input_path: Path to input JSON file
+        input_path: Path to input JSON or JSONL file
 
     Returns:
         Dictionary containing chunks and metadata
@@ -178,22 +343,48 @@ def load_chunks(input_path: str) -> Dict[str, Any]:
         logger.error(f"Input file not found: {input_path}")
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    with open(input_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if input_path.endswith('.jsonl'):
+        chunks = []
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    chunks.append(json.loads(line))
+
+        metadata = {}
+        meta_path = f"{os.path.splitext(input_path)[0]}.meta.json"
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+
+        data = {'metadata': metadata, 'chunks': chunks}
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
 
     logger.info(f"Loaded {len(data.get('chunks', []))} chunks")
     return data
 
 
-def save_embeddings(output_path: str, chunks: List[Dict[str, Any]], metadata: Dict[str, Any]):
+def save_embeddings(output_path: str, chunks: List[Dict[str, Any]], metadata: Dict[str, Any],
+                    output_format: str = 'json', dtype: str = 'float32'):
     """
-    Save chunks with embeddings to JSON file
+    Save chunks with embeddings as a binary store or a JSON file
 
     Args:
-        output_path: Path to output JSON file
+        output_path: Output JSON file; for 'binary' the store is written next to
+            it as <name>.header.json, <name>.f32 (or .f16/.i8) and <name>.rows.jsonl
         chunks: List of chunks with embeddings
         metadata: Metadata dictionary
+        output_format: 'json' or 'binary' (see embedding_store.py)
+        dtype: Matrix dtype of a binary store: 'float32', 'float16' or 'int8'
     """
+    if output_format == 'binary':
+        header_path = write_store(output_path, chunks, metadata, dtype=dtype)
+        stem = store_stem(header_path)
+        file_size_mb = sum(os.path.getsize(path) for path in store_files(header_path)) / (1024 * 1024)
+        logger.info(f"Saved {len(chunks)} chunks with embeddings to {stem}.* ({file_size_mb:.2f} MB)")
+        return
+
     logger.info(f"Saving embeddings to: {output_path}")
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -224,12 +415,12 @@ def calculate_cost(total_tokens: int, model: str = "text-embedding-3-small") ->
     """
     # Pricing as of 2025 (tokens per dollar)
     pricing = {
-        "text-embedding-3-small": 0.00002,  # $0.02 per 1M tokens
-        "text-embedding-3-large": 0.00013,  # $0.13 per 1M tokens
-        "text-embedding-ada-002": 0.0001,   # $0.10 per 1M tokens
+        "text-embedding-3-small": 0.00002 / 1000,  # $0.02 per 1M tokens
+        "text-embedding-3-large": 0.00013 / 1000,  # $0.13 per 1M tokens
+        "text-embedding-ada-002": 0.0001 / 1000,   # $0.10 per 1M tokens
     }
 
-    cost_per_token = pricing.get(model, 0.0001)
+    cost_per_token = pricing.get(model, 0.0001 / 1000)
     return total_tokens * cost_per_token
 
 
@@ -238,21 +429,56 @@ def main():
 
     parser = argparse.ArgumentParser(description='Generate embeddings for document chunks')
     parser.add_argument('--input', type=str,
-                       default='/Users/a21/Desktop/routellm-chatbot-railway/data/extracted_chunks.json',
-                       help='Input JSON file with extracted chunks')
+                       default='/Users/a21/Desktop/routellm-chatbot-railway/data/extracted_chunks.jsonl',
+                       help='Input JSON or JSONL file with extracted chunks')
     parser.add_argument('--output', type=str,
                        default='/Users/a21/Desktop/routellm-chatbot-railway/data/embeddings.json',
-                       help='Output JSON file for embeddings')
+                       help='Output file for embeddings (binary stores drop the .json suffix)')
+    parser.add_argument('--output-format', choices=['json', 'binary'], default='json',
+                       help='json: single JSON file (default; read by the build and KB scripts); '
+                            'binary: matrix + JSONL rows + header, read by lib/rag-service.ts')
+    parser.add_argument('--output-dtype', choices=list(DTYPES), default='float32',
+                       help='Matrix dtype of the binary output: float32 (default), float16, or int8 with per-row scales')
+    parser.add_argument('--dimensions', type=int,
+                       help='Shorten embeddings to this many dimensions (e.g. 512); '
+                            'check the trade-off with embedding_store.py recall')
     parser.add_argument('--api-key', type=str,
                        help='OpenAI API key (can also use OPENAI_API_KEY env var)')
     parser.add_argument('--model', type=str, default='text-embedding-3-small',
                        help='OpenAI embedding model to use')
-    parser.add_argument('--batch-size', type=int, default=100,
-                       help='Batch size for API requests')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_ITEMS,
+                       help=f'Maximum chunks per API request (default: {DEFAULT_BATCH_ITEMS})')
+    parser.add_argument('--batch-tokens', type=int, default=DEFAULT_BATCH_TOKENS,
+                       help=f'Token budget per API request (default: {DEFAULT_BATCH_TOKENS:,})')
+    parser.add_argument('--overlong', choices=OVERLONG_POLICIES, default='split',
+                       help='Chunks over the per-input token limit: split and average, or truncate (default: split)')
     parser.add_argument('--rate-limit-delay', type=float, default=0.1,
-                       help='Delay between batches (seconds)')
+                       help='Delay between batches (seconds) with --concurrency 1')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'Batch requests in flight at once (default: {DEFAULT_CONCURRENCY}; 1 sends them one at a time)')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                       help=f'Tokens-per-minute limit of the account (default: {DEFAULT_TOKENS_PER_MINUTE:,})')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                       help=f'Requests-per-minute limit of the account (default: {DEFAULT_REQUESTS_PER_MINUTE:,})')
+    parser.add_argument('--embedding-cache', type=str, default=default_cache_path(),
+                       help='SQLite embedding cache shared with batch_embeddings_processor.py '
+                            '(default: data/embedding_cache.sqlite or KB_EMBEDDING_CACHE)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Embed every chunk through the API without reading or filling the cache')
+    parser.add_argument('--cache-max-age-days', type=float,
+                       help='Evict cache entries not used for this many days')
+    parser.add_argument('--cache-max-size-mb', type=float,
+                       help='Evict least recently used cache entries beyond this many MB of vectors')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted run: skip chunks already in the output\'s checkpoint')
+    parser.add_argument('--checkpoint-every', type=int,
+                       help='Chunks embedded between checkpoint writes (default: batch size x concurrency)')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                       help='Keep results in memory only until the output is written')
 
     args = parser.parse_args()
+    if args.output_dtype != 'float32' and args.output_format != 'binary':
+        parser.error("--output-dtype applies to --output-format binary")
 
     # Get API key
     api_key = args.api_key or os.environ.get('OPENAI_API_KEY')
@@ -265,6 +491,12 @@ def main():
     logger.info("Starting Embedding Generation Pipeline")
     logger.info("=" * 80)
 
+    if args.resume and args.no_checkpoint:
+        logger.error("--resume continues from the checkpoint; it cannot be combined with --no-checkpoint")
+        return
+
+    cache = None
+    checkpoint = None
     try:
         # Load chunks
         data = load_chunks(args.input)
@@ -274,38 +506,86 @@ def main():
             logger.error("No chunks found in input file")
             return
 
+        pending = chunks
+        if not args.no_checkpoint:
+            directory = checkpoint_dir(args.output)
+            if os.path.exists(directory) and not args.resume:
+                logger.warning(f"Discarding previous checkpoint {directory} (use --resume to continue it)")
+                shutil.rmtree(directory)
+
+            checkpoint = EmbeddingCheckpoint(directory, args.model, args.dimensions)
+            if args.resume:
+                # Chunks whose text changed since they were checkpointed are embedded again
+                completed = checkpoint.completed()
+                pending = [chunk for chunk in chunks if completed.get(chunk['id']) != chunk['text']]
+                logger.info(f"Resuming from {directory}: {len(chunks) - len(pending):,} chunks already "
+                            f"embedded ({checkpoint.tokens_used:,} tokens), {len(pending):,} to go")
+
+        if not args.no_cache:
+            cache = EmbeddingCache(
+                args.embedding_cache,
+                model=args.model,
+                dimensions=args.dimensions,
+                max_age_days=args.cache_max_age_days,
+                max_size_mb=args.cache_max_size_mb
+            )
+
         # Initialize generator
         generator = EmbeddingGenerator(
             api_key=api_key,
             model=args.model,
-            batch_size=args.batch_size
+            batch_size=args.batch_size,
+            batch_tokens=args.batch_tokens,
+            overlong=args.overlong,
+            concurrency=args.concurrency,
+            tokens_per_minute=args.tpm,
+            requests_per_minute=args.rpm,
+            cache=cache,
+            dimensions=args.dimensions
         )
 
         # Generate embeddings
         start_time = time.time()
         embedded_chunks = generator.process_chunks(
-            chunks,
+            pending,
             show_progress=True,
-            rate_limit_delay=args.rate_limit_delay
+            rate_limit_delay=args.rate_limit_delay,
+            checkpoint=checkpoint,
+            checkpoint_every=args.checkpoint_every
         )
         end_time = time.time()
 
+        # Compact: merge this run's and earlier runs' segments into input order
+        total_tokens_used = generator.total_tokens_used
+        if checkpoint is not None:
+            embedded_chunks = checkpoint.compact(chunks)
+            total_tokens_used = checkpoint.tokens_used
+
         # Update metadata
         metadata = data.get('metadata', {})
         metadata.update({
             'total_chunks_with_embeddings': len(embedded_chunks),
             'embedding_model': args.model,
-            'total_tokens_used': generator.total_tokens_used,
+            'total_tokens_used': total_tokens_used,
             'processing_time_seconds': round(end_time - start_time, 2),
-            'embedding_dimension': len(embedded_chunks[0]['embedding']) if embedded_chunks else 0
+            'embedding_dimension': len(embedded_chunks[0]['embedding']) if embedded_chunks else 0,
+            'embedding_dtype': args.output_dtype if args.output_format == 'binary' else 'float32'
         })
 
         # Calculate cost
-        estimated_cost = calculate_cost(generator.total_tokens_used, args.model)
+        estimated_cost = calculate_cost(total_tokens_used, args.model)
         metadata['estimated_cost_usd'] = round(estimated_cost, 4)
+        if cache is not None:
+            metadata['embedding_cache'] = cache.report()
+        if generator.dedup_stats:
+            metadata['deduplication'] = generator.dedup_stats
+        if generator.failed_chunks:
+            metadata['failed_chunks'] = generator.failed_chunks
 
         # Save embeddings
-        save_embeddings(args.output, embedded_chunks, metadata)
+        save_embeddings(args.output, embedded_chunks, metadata, args.output_format, args.output_dtype)
+        if checkpoint is not None:
+            checkpoint.remove()
 
         # Print summary
         logger.info("=" * 80)
@@ -314,7 +594,11 @@ def main():
         logger.info(f"Total chunks processed: {len(embedded_chunks)}/{len(chunks)}")
         logger.info(f"Embedding model: {args.model}")
         logger.info(f"Embedding dimension: {metadata['embedding_dimension']}")
-        logger.info(f"Total tokens used: {generator.total_tokens_used:,}")
+        logger.info(f"Total tokens used: {total_tokens_used:,}")
+        if generator.dedup_stats:
+            dedup = generator.dedup_stats
+            logger.info(f"Duplicate chunks: {dedup['duplicates']:,} of {dedup['texts']:,} "
+                        f"(dedup ratio {dedup['dedup_ratio']:.2f}x, {dedup['tokens_saved']:,} tokens saved)")
         logger.info(f"Estimated cost: ${estimated_cost:.4f}")
         logger.info(f"Processing time: {metadata['processing_time_seconds']:.2f} seconds")
         logger.info(f"Output saved to: {args.output}")
@@ -330,9 +614,19 @@ def main():
             logger.info(f"  Document type: {sample['metadata']['doc_type']}")
             logger.info(f"  Source: {sample['metadata']['filename']}")
 
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            logger.warning(f"Interrupted with {checkpoint.count:,} chunks checkpointed; "
+                           f"re-run with --resume to continue")
+        raise
     except Exception as e:
         logger.error(f"Error in embedding generation pipeline: {e}", exc_info=True)
+        if checkpoint is not None and checkpoint.count:
+            logger.info(f"{checkpoint.count:,} chunks are checkpointed; re-run with --resume to continue")
         raise
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
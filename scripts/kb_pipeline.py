@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Knowledge Base Pipeline CLI
+Single entry point for the RAG ingest scripts, for cron jobs and deploy hooks.
+
+Each subcommand's module is imported only when that subcommand runs, so
+`kb_pipeline.py --help` loads nothing heavy and `kb_pipeline.py extract` never
+imports openai or psycopg2.
+
+Usage:
+    python3 kb_pipeline.py extract --workers 4
+    python3 kb_pipeline.py embed --input data/extracted_chunks.jsonl
+    python3 kb_pipeline.py batch --help
+"""
+
+import os
+import sys
+import importlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# subcommand -> (module in scripts/, description)
+COMMANDS = {
+    'extract': ('extract_documents', 'Extract and chunk PDF, PPTX, DOCX and XLSX documents'),
+    'embed': ('generate_embeddings', 'Generate embeddings for extracted chunks'),
+    'batch': ('batch_embeddings_processor', 'Chunk, embed and load processed documents into Postgres'),
+    'estimate': ('estimate_cost', 'Estimate embedding costs before a batch run'),
+    'tokenizer': ('tokenizer', 'Vendor or fetch the tiktoken encoding for offline token counting'),
+}
+
+
+def print_usage():
+    """Print the list of subcommands"""
+    prog = os.path.basename(sys.argv[0])
+    print(f"usage: {prog} <command> [options]")
+    print()
+    print("commands:")
+    for command, (_, description) in COMMANDS.items():
+        print(f"  {command:10} {description}")
+    print()
+    print(f"Run '{prog} <command> --help' for a command's options.")
+
+
+def main(argv=None) -> int:
+    """Dispatch to a subcommand's main() with the remaining arguments"""
+    argv = sys.argv[1:] if argv is None else argv
+
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage()
+        return 0
+
+    command, args = argv[0], argv[1:]
+
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n", file=sys.stderr)
+        print_usage()
+        return 2
+
+    module_name, _ = COMMANDS[command]
+
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+
+    # argparse in the subcommand reads sys.argv and reports itself as "<prog> <command>"
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {command}", *args]
+
+    module = importlib.import_module(module_name)
+    result = module.main()
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Local OCR Stage
+Rasterizes image-only PDF pages with pypdfium2 and reads them with Tesseract
+(pytesseract) across a pool of worker processes, so scanned documents get
+text without a hosted vision API.
+
+Rendered rasters and OCR text are cached on disk by (file hash, page, DPI).
+Re-running over the same files reads the text straight from the cache, and
+changing the OCR language re-uses the rasters instead of rendering again.
+
+extract_documents.py runs this stage with --ocr for the image-only pages its
+PDF probe flags. Run standalone, it fills records in data/processed-kb/documents
+whose text is empty or still the OCR placeholder.
+
+Requires: pip install pypdfium2 pytesseract pillow (and the tesseract binary)
+
+Usage:
+    python3 ocr_pages.py --documents-dir data/processed-kb/documents \\
+        --source-root "/Users/a21/Desktop/Sales Rep Resources 2 copy"
+    python3 ocr_pages.py --documents-dir data/processed-kb/documents --dry-run
+"""
+
+import os
+import io
+import json
+import time
+import hashlib
+import logging
+import argparse
+import importlib
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Text the TypeScript processor left in records it queued for OCR
+OCR_PLACEHOLDER = "[Text will be extracted by DeepSeek OCR]"
+
+# Image files are OCR'd as a single page without rendering
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif', '.webp'}
+
+DEFAULT_DPI = 300
+DEFAULT_LANG = 'eng'
+
+_INSTALL_HINTS = {
+    'pypdfium2': 'pip install pypdfium2',
+    'pytesseract': 'pip install pytesseract (and install the tesseract binary)',
+    'PIL': 'pip install pillow',
+}
+
+
+def _require(module_name: str):
+    """Import an optional OCR dependency, with an install hint if it is missing"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        package = module_name.split('.')[0]
+        raise ImportError(f"{package} is required for OCR: {_INSTALL_HINTS[package]}") from e
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's contents, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class OcrCache:
+    """
+    On-disk cache of rendered pages and OCR text
+
+    Layout:
+        rasters/<sha256>_p<page>_<dpi>dpi.png
+        text/<sha256>_p<page>_<dpi>dpi_<lang>.txt
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.raster_dir = self.cache_dir / 'rasters'
+        self.text_dir = self.cache_dir / 'text'
+        self.raster_dir.mkdir(parents=True, exist_ok=True)
+        self.text_dir.mkdir(parents=True, exist_ok=True)
+
+    def raster_path(self, file_hash: str, page: int, dpi: int) -> Path:
+        return self.raster_dir / f"{file_hash}_p{page}_{dpi}dpi.png"
+
+    def text_path(self, file_hash: str, page: int, dpi: int, lang: str) -> Path:
+        return self.text_dir / f"{file_hash}_p{page}_{dpi}dpi_{lang}.txt"
+
+    def get_text(self, file_hash: str, page: int, dpi: int, lang: str) -> Optional[str]:
+        path = self.text_path(file_hash, page, dpi, lang)
+        return path.read_text(encoding='utf-8') if path.exists() else None
+
+    def put_text(self, file_hash: str, page: int, dpi: int, lang: str, text: str):
+        _write_atomic(self.text_path(file_hash, page, dpi, lang), text.encode('utf-8'))
+
+    def get_raster(self, file_hash: str, page: int, dpi: int) -> Optional[bytes]:
+        path = self.raster_path(file_hash, page, dpi)
+        return path.read_bytes() if path.exists() else None
+
+    def put_raster(self, file_hash: str, page: int, dpi: int, png: bytes):
+        _write_atomic(self.raster_path(file_hash, page, dpi), png)
+
+
+def render_page(file_path: str, page: int, dpi: int) -> bytes:
+    """
+    Render one PDF page to PNG
+
+    Args:
+        file_path: Path to PDF file
+        page: 1-based page number
+        dpi: Render resolution
+
+    Returns:
+        PNG bytes
+    """
+    pdf = _require('pypdfium2').PdfDocument(file_path)
+    try:
+        image = pdf[page - 1].render(scale=dpi / 72).to_pil()
+    finally:
+        pdf.close()
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def recognize(image_bytes: bytes, lang: str) -> str:
+    """Run Tesseract on an encoded image and return the text"""
+    image = _require('PIL.Image').open(io.BytesIO(image_bytes))
+    return _require('pytesseract').image_to_string(image, lang=lang)
+
+
+def _ocr_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pool entry point: OCR one page, reusing cached text or raster where possible
+
+    Returns:
+        {page, text, text_cached, raster_cached, seconds}
+    """
+    start_time = time.perf_counter()
+    cache = OcrCache(task['cache_dir'])
+    file_hash, page, dpi, lang = task['file_hash'], task['page'], task['dpi'], task['lang']
+    result = {'page': page, 'text_cached': False, 'raster_cached': False}
+
+    text = cache.get_text(file_hash, page, dpi, lang)
+    if text is not None:
+        result.update(text=text, text_cached=True, seconds=time.perf_counter() - start_time)
+        return result
+
+    if Path(task['file_path']).suffix.lower() in IMAGE_EXTENSIONS:
+        image = Path(task['file_path']).read_bytes()
+    else:
+        image = cache.get_raster(file_hash, page, dpi)
+        result['raster_cached'] = image is not None
+        if image is None:
+            image = render_page(task['file_path'], page, dpi)
+            cache.put_raster(file_hash, page, dpi, image)
+
+    text = recognize(image, lang).strip()
+    cache.put_text(file_hash, page, dpi, lang, text)
+
+    result.update(text=text, seconds=time.perf_counter() - start_time)
+    return result
+
+
+class PageOCR:
+    """Cached, pooled OCR of selected pages"""
+
+    def __init__(self, cache_dir: str, dpi: int = DEFAULT_DPI, lang: str = DEFAULT_LANG, workers: int = 1):
+        """
+        Args:
+            cache_dir: Directory for cached rasters and OCR text
+            dpi: Render resolution for PDF pages
+            lang: Tesseract language(s), e.g. 'eng' or 'eng+spa'
+            workers: Worker processes for rendering and OCR (1 = serial)
+        """
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self.lang = lang
+        self.workers = max(1, workers)
+        self.stats = {'pages': 0, 'text_cached': 0, 'raster_cached': 0, 'rendered': 0,
+                      'recognized': 0, 'empty': 0, 'seconds': 0.0}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        OcrCache(cache_dir)
+
+    def ocr_pages(self, file_path: str, pages: Iterable[int], file_hash: Optional[str] = None) -> Dict[int, str]:
+        """
+        OCR pages of a PDF (or an image file, as page 1)
+
+        Args:
+            file_path: Path to PDF or image file
+            pages: 1-based page numbers
+            file_hash: SHA-256 of the file, if the caller already has it
+
+        Returns:
+            page -> OCR text, in page order
+        """
+        file_hash = file_hash or file_sha256(file_path)
+        tasks = [{'file_path': file_path, 'file_hash': file_hash, 'page': page, 'dpi': self.dpi,
+                  'lang': self.lang, 'cache_dir': self.cache_dir} for page in sorted(set(pages))]
+
+        if self.workers == 1 or len(tasks) <= 1:
+            results = map(_ocr_task, tasks)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = self._executor.map(_ocr_task, tasks)
+
+        texts = {}
+        for result in results:
+            texts[result['page']] = result['text']
+            self._record(result, file_path)
+        return texts
+
+    def _record(self, result: Dict[str, Any], file_path: str):
+        self.stats['pages'] += 1
+        self.stats['seconds'] += result['seconds']
+        if result['text_cached']:
+            self.stats['text_cached'] += 1
+        else:
+            self.stats['recognized'] += 1
+            if result['raster_cached']:
+                self.stats['raster_cached'] += 1
+            elif Path(file_path).suffix.lower() not in IMAGE_EXTENSIONS:
+                self.stats['rendered'] += 1
+        if not result['text']:
+            self.stats['empty'] += 1
+
+    def close(self):
+        """Shut down the worker pool (it is recreated if more pages are OCR'd)"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def log_stats(self):
+        s = self.stats
+        if not s['pages']:
+            return
+        logger.info(f"\nOCR ({self.dpi} dpi, lang={self.lang}): {s['pages']} pages in {s['seconds']:.1f}s worker time")
+        logger.info(f"  Text from cache: {s['text_cached']}, recognized: {s['recognized']} "
+                    f"({s['rendered']} rendered, {s['raster_cached']} rasters from cache)")
+        if s['empty']:
+            logger.info(f"  Pages with no text found: {s['empty']}")
+
+
+def pdf_page_count(file_path: str) -> int:
+    pdf = _require('pypdfium2').PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def needs_ocr(record: Dict[str, Any]) -> bool:
+    """True if a processed-kb record has no text or only the OCR placeholder"""
+    text = (record.get('extractedText') or '').strip()
+    return not text or text == OCR_PLACEHOLDER
+
+
+def _record_source(record: Dict[str, Any], source_root: Optional[str]) -> Optional[str]:
+    """Path of a record's source file: its recorded path, else relativePath/sourceFile under source_root"""
+    if record.get('path') and os.path.exists(record['path']):
+        return record['path']
+
+    if source_root:
+        for key in ('relativePath', 'sourceFile', 'name'):
+            if record.get(key):
+                candidate = os.path.join(source_root, record[key])
+                if os.path.exists(candidate):
+                    return candidate
+    return None
+
+
+def fill_processed_documents(documents_dir: str, ocr: PageOCR, source_root: Optional[str] = None,
+                             dry_run: bool = False) -> Dict[str, int]:
+    """
+    OCR the source of every processed-kb record with empty or placeholder text
+
+    Args:
+        documents_dir: Directory of processed-kb document JSON files
+        ocr: PageOCR stage to use
+        source_root: Directory to resolve relativePath against when the recorded path is missing
+        dry_run: Only report which records would be filled
+
+    Returns:
+        Counts of filled, empty (OCR found no text), unsupported and missing-source records
+    """
+    counts = {'needs_ocr': 0, 'filled': 0, 'empty': 0, 'unsupported': 0, 'missing_source': 0}
+
+    for record_path in sorted(Path(documents_dir).glob('*.json')):
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+
+        if not needs_ocr(record):
+            continue
+        counts['needs_ocr'] += 1
+
+        source = _record_source(record, source_root)
+        if source is None:
+            counts['missing_source'] += 1
+            logger.warning(f"Source not found for {record_path.name}")
+            continue
+
+        extension = Path(source).suffix.lower()
+        if extension != '.pdf' and extension not in IMAGE_EXTENSIONS:
+            counts['unsupported'] += 1
+            logger.info(f"Skipping {record_path.name}: no OCR for {extension} files")
+            continue
+
+        if dry_run:
+            logger.info(f"Would OCR {source}")
+            continue
+
+        pages = range(1, pdf_page_count(source) + 1) if extension == '.pdf' else [1]
+        texts = ocr.ocr_pages(source, pages)
+        text = "\n\n".join(t for t in texts.values() if t)
+
+        if not text:
+            counts['empty'] += 1
+            logger.warning(f"No text found in {source}")
+            continue
+
+        record['extractedText'] = text
+        record['textLength'] = len(text)
+        record['processingMethod'] = 'tesseract-local'
+        record['processedAt'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        if isinstance(record.get('metadata'), dict) and 'ocrQuality' in record['metadata']:
+            record['metadata']['ocrQuality'] = 'completed'
+
+        _write_atomic(record_path, json.dumps(record, indent=2, ensure_ascii=False).encode('utf-8'))
+        counts['filled'] += 1
+        logger.info(f"Filled {record_path.name} ({len(texts)} pages, {len(text):,} chars)")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR scanned documents locally with a raster/text cache')
+    parser.add_argument('--documents-dir', type=str,
+                       default='/Users/a21/routellm-chatbot/data/processed-kb/documents',
+                       help='processed-kb document JSON files to fill')
+    parser.add_argument('--source-root', type=str,
+                       help='Directory holding the original files, used when a record\'s path does not exist')
+    parser.add_argument('--cache-dir', type=str,
+                       help='OCR cache directory (default: .ocr_cache next to the documents directory)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                       help='Render resolution for PDF pages')
+    parser.add_argument('--lang', type=str, default=DEFAULT_LANG,
+                       help="Tesseract language(s), e.g. 'eng' or 'eng+spa'")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes for rendering and OCR')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='List the records that would be OCR\'d without running OCR')
+
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.documents_dir)), '.ocr_cache')
+    ocr = PageOCR(cache_dir, dpi=args.dpi, lang=args.lang, workers=args.workers)
+
+    try:
+        counts = fill_processed_documents(args.documents_dir, ocr, args.source_root, args.dry_run)
+    finally:
+        ocr.close()
+
+    logger.info("=" * 60)
+    logger.info(f"Records needing OCR: {counts['needs_ocr']}")
+    logger.info(f"Filled: {counts['filled']}")
+    logger.info(f"No text found: {counts['empty']}")
+    logger.info(f"Unsupported type: {counts['unsupported']}")
+    logger.info(f"Source not found: {counts['missing_source']}")
+    ocr.log_stats()
+
+
+if __name__ == "__main__":
+    main()
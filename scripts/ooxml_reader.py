@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Streaming OOXML Reader
+Reads the text of DOCX and PPTX files straight from the zip package with an
+incremental XML parser instead of building python-docx / python-pptx object
+models. Each top-level body block or slide shape is parsed, read and freed
+before the next one, so memory stays flat on large documents and decks.
+
+Text follows the same rules as the python-docx / python-pptx properties that
+extract_documents.py reads, so both backends produce identical chunks:
+
+- DOCX: top-level body paragraphs (runs and hyperlinks; tabs as "\\t", line
+  breaks as "\\n"), and the cells of top-level tables with horizontally and
+  vertically merged cells repeated the way `row.cells` repeats them.
+- PPTX: the text of top-level text shapes on each slide (paragraphs joined
+  with "\\n", line breaks as "\\v") and the notes placeholder text, with
+  slides in presentation order.
+
+Uses only the standard library.
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Optional, Tuple, Iterator, IO
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+P = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Text equivalents of run inner-content elements (w:t and w:br are handled separately)
+_RUN_CHARACTERS = {f'{W}tab': '\t', f'{W}ptab': '\t', f'{W}cr': '\n', f'{W}noBreakHyphen': '-'}
+
+
+# =============================================================================
+# PACKAGE HELPERS
+# =============================================================================
+
+def _read_rels(package: zipfile.ZipFile, part_name: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Read the relationships of a package part
+
+    Args:
+        package: Open OOXML zip package
+        part_name: Part path inside the zip ('' for the package itself)
+
+    Returns:
+        rId -> (relationship type, target part path); external targets are skipped
+    """
+    directory, filename = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, '_rels', f"{filename}.rels")
+
+    try:
+        root = ET.fromstring(package.read(rels_name))
+    except KeyError:
+        return {}
+
+    rels = {}
+    for rel in root.iter(f'{PACKAGE_RELS}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        rels[rel.get('Id')] = (rel.get('Type', ''), target)
+    return rels
+
+
+def _related_part(rels: Dict[str, Tuple[str, str]], rel_type: str) -> Optional[str]:
+    """First target whose relationship type ends with /<rel_type>"""
+    for kind, target in rels.values():
+        if kind.endswith(f"/{rel_type}"):
+            return target
+    return None
+
+
+def _main_part(package: zipfile.ZipFile) -> str:
+    """Path of the package's main document part (word/document.xml, ppt/presentation.xml, ...)"""
+    part = _related_part(_read_rels(package, ''), 'officeDocument')
+    if part is None:
+        raise ValueError("Package has no officeDocument relationship")
+    return part
+
+
+def _iter_children(stream: IO[bytes], parent_path: Tuple[str, ...]) -> Iterator[ET.Element]:
+    """
+    Incrementally parse XML and yield each complete child of one element
+
+    Each child is removed from the tree once the caller has consumed it, so
+    only one child subtree is held in memory at a time.
+
+    Args:
+        stream: XML byte stream
+        parent_path: Tags from the root down to the parent element
+
+    Yields:
+        Child elements of the parent, in document order
+    """
+    tags = []
+    parent = None
+    parent_depth = len(parent_path)
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            tags.append(elem.tag)
+            if len(tags) == parent_depth and tuple(tags) == parent_path:
+                parent = elem
+            continue
+
+        tags.pop()
+        if parent is None:
+            continue
+        if elem is parent:
+            parent = None
+        elif len(tags) == parent_depth:
+            yield elem
+            parent.remove(elem)
+
+
+# =============================================================================
+# DOCX
+# =============================================================================
+
+def _run_text(run: ET.Element) -> str:
+    """Text of a w:r element, matching python-docx Run.text"""
+    parts = []
+    for child in run:
+        if child.tag == f'{W}t':
+            parts.append(child.text or '')
+        elif child.tag == f'{W}br':
+            # Line breaks become newlines; page and column breaks add nothing
+            if child.get(f'{W}type', 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif child.tag in _RUN_CHARACTERS:
+            parts.append(_RUN_CHARACTERS[child.tag])
+    return ''.join(parts)
+
+
+def _docx_paragraph_text(paragraph: ET.Element) -> str:
+    """Text of a w:p element (direct runs and hyperlink runs), matching python-docx Paragraph.text"""
+    parts = []
+    for child in paragraph:
+        if child.tag == f'{W}r':
+            parts.append(_run_text(child))
+        elif child.tag == f'{W}hyperlink':
+            parts.extend(_run_text(run) for run in child.findall(f'{W}r'))
+    return ''.join(parts)
+
+
+def _int_val(element: Optional[ET.Element], default: int) -> int:
+    if element is None:
+        return default
+    try:
+        return int(element.get(f'{W}val', default))
+    except ValueError:
+        return default
+
+
+def _docx_table_rows(table: ET.Element) -> List[List[str]]:
+    """
+    Cell texts of each row of a w:tbl element, matching python-docx row.cells
+
+    A cell spanning several grid columns is repeated once per column, and a
+    vertically merged continuation cell repeats the text of the cell above it.
+    """
+    rows = []
+    above: Dict[int, str] = {}  # grid column -> cell text in the previous row
+
+    for row in table.findall(f'{W}tr'):
+        grid_column = _int_val(row.find(f'{W}trPr/{W}gridBefore'), 0)
+        cells = []
+        current = {}
+
+        for cell in row.findall(f'{W}tc'):
+            span = max(_int_val(cell.find(f'{W}tcPr/{W}gridSpan'), 1), 1)
+            v_merge = cell.find(f'{W}tcPr/{W}vMerge')
+
+            if v_merge is not None and v_merge.get(f'{W}val', 'continue') == 'continue':
+                text = above.get(grid_column, '')
+            else:
+                text = "\n".join(_docx_paragraph_text(p) for p in cell.findall(f'{W}p'))
+
+            for column in range(grid_column, grid_column + span):
+                current[column] = text
+            cells.extend([text] * span)
+            grid_column += span
+
+        rows.append(cells)
+        above = current
+
+    return rows
+
+
+def read_docx(file_path: str) -> Tuple[List[str], List[List[List[str]]]]:
+    """
+    Read the top-level paragraphs and tables of a Word document
+
+    Args:
+        file_path: Path to DOCX file
+
+    Returns:
+        (paragraph texts, tables) where each table is a list of rows of cell texts;
+        the same values as python-docx doc.paragraphs / doc.tables
+    """
+    paragraphs = []
+    tables = []
+
+    with zipfile.ZipFile(file_path) as package:
+        with package.open(_main_part(package)) as stream:
+            for block in _iter_children(stream, (f'{W}document', f'{W}body')):
+                if block.tag == f'{W}p':
+                    paragraphs.append(_docx_paragraph_text(block))
+                elif block.tag == f'{W}tbl':
+                    tables.append(_docx_table_rows(block))
+
+    return paragraphs, tables
+
+
+# =============================================================================
+# PPTX
+# =============================================================================
+
+def _pptx_paragraph_text(paragraph: ET.Element) -> str:
+    """Text of an a:p element (runs, fields and line breaks), matching python-pptx _Paragraph.text"""
+    parts = []
+    for child in paragraph:
+        if child.tag in (f'{A}r', f'{A}fld'):
+            text_element = child.find(f'{A}t')
+            parts.append((text_element.text or '') if text_element is not None else '')
+        elif child.tag == f'{A}br':
+            parts.append('\v')
+    return ''.join(parts)
+
+
+def _shape_text(shape: ET.Element) -> str:
+    """Text frame text of a p:sp element, matching python-pptx Shape.text"""
+    text_body = shape.find(f'{P}txBody')
+    if text_body is None:
+        return ''
+    return "\n".join(_pptx_paragraph_text(p) for p in text_body.findall(f'{A}p'))
+
+
+def _read_notes_text(package: zipfile.ZipFile, notes_part: str) -> str:
+    """Text of the body placeholder on a notes slide, matching notes_slide.notes_text_frame.text"""
+    with package.open(notes_part) as stream:
+        for shape in _iter_children(stream, (f'{P}notes', f'{P}cSld', f'{P}spTree')):
+            if len(shape) == 0:
+                continue
+            placeholder = shape[0].find(f'{P}nvPr/{P}ph')
+            if placeholder is not None and placeholder.get('type', 'obj') == 'body':
+                return _shape_text(shape) if shape.tag == f'{P}sp' else ''
+    return ''
+
+
+def read_pptx(file_path: str) -> List[Tuple[List[str], Optional[str]]]:
+    """
+    Read the shape text and speaker notes of every slide in a deck
+
+    Args:
+        file_path: Path to PPTX file
+
+    Returns:
+        One (shape texts, notes text or None if the slide has no notes slide)
+        tuple per slide, in presentation order; shape texts include empty
+        strings for text shapes without text, like python-pptx shape.text
+    """
+    slides = []
+
+    with zipfile.ZipFile(file_path) as package:
+        presentation_part = _main_part(package)
+        presentation_rels = _read_rels(package, presentation_part)
+
+        slide_parts = []
+        with package.open(presentation_part) as stream:
+            for slide_id in _iter_children(stream, (f'{P}presentation', f'{P}sldIdLst')):
+                rel = presentation_rels.get(slide_id.get(f'{R}id'))
+                if rel:
+                    slide_parts.append(rel[1])
+
+        for slide_part in slide_parts:
+            shape_texts = []
+            with package.open(slide_part) as stream:
+                for shape in _iter_children(stream, (f'{P}sld', f'{P}cSld', f'{P}spTree')):
+                    if shape.tag == f'{P}sp':
+                        shape_texts.append(_shape_text(shape))
+
+            notes_part = _related_part(_read_rels(package, slide_part), 'notesSlide')
+            notes = _read_notes_text(package, notes_part) if notes_part else None
+            slides.append((shape_texts, notes))
+
+    return slides
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Embedding Bisection Tests
+Checks how a rejected embeddings batch is split: bad inputs are isolated even
+when the API gives every one of them the same generic message, and only a
+rejection of the request's own parameters (model, dimensions) fails the
+batch without splitting.
+
+The async engine cases run against embedding_stub_server.py in-process and
+are skipped when openai or the cl100k_base tokenizer is not available.
+
+Usage:
+    python3 test_embedding_bisection.py
+"""
+
+import os
+import sys
+import logging
+import threading
+import unittest
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from embedding_batches import TokenBudgetBatcher, embed_bisecting, is_request_error
+
+GENERIC_MESSAGE = "'$.input' is invalid. Please check the API reference"
+
+
+class FakeAPIError(Exception):
+    """Stand-in for openai.BadRequestError: status_code, param and code"""
+
+    def __init__(self, message: str, status_code: int = 400, param: Optional[str] = None,
+                 code: Optional[str] = 'invalid_request_error'):
+        super().__init__(message)
+        self.status_code = status_code
+        self.param = param
+        self.code = code
+
+
+class FakeSend:
+    """Embeds texts as [1.0], rejecting any request that contains a bad text"""
+
+    def __init__(self, bad: List[str], error: Optional[FakeAPIError] = None):
+        self.bad = set(bad)
+        self.error = error
+        self.requests = 0
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        if self.error:
+            raise self.error
+        if self.bad.intersection(texts):
+            raise FakeAPIError(GENERIC_MESSAGE)
+        return [[1.0] for _ in texts]
+
+
+def batch(bad_positions: List[int], size: int = 16) -> List[str]:
+    return [f"bad {i}" if i in bad_positions else f"text {i}" for i in range(size)]
+
+
+class EmbedBisectingTest(unittest.TestCase):
+
+    def test_bad_inputs_in_both_halves_with_same_message_are_isolated(self):
+        texts = batch([2, 12])
+        send = FakeSend(['bad 2', 'bad 12'])
+        failed = []
+
+        embeddings = embed_bisecting(texts, send, lambda index, error: failed.append(index))
+
+        self.assertEqual(failed, [2, 12])
+        self.assertEqual([i for i, e in enumerate(embeddings) if e is None], [2, 12])
+        self.assertEqual(sum(e is not None for e in embeddings), 14)
+
+    def test_single_bad_input(self):
+        send = FakeSend(['bad 5'])
+        failed = []
+
+        embeddings = embed_bisecting(batch([5]), send, lambda index, error: failed.append(index))
+
+        self.assertEqual(failed, [5])
+        self.assertEqual(sum(e is None for e in embeddings), 1)
+        self.assertEqual(send.requests, 9)
+
+    def test_request_parameter_error_fails_without_splitting(self):
+        error = FakeAPIError("'dimensions' must be between 1 and 1536", param='dimensions')
+        send = FakeSend([], error)
+
+        with self.assertRaises(FakeAPIError):
+            embed_bisecting(batch([]), send)
+        self.assertEqual(send.requests, 1)
+
+    def test_request_error_classification(self):
+        self.assertTrue(is_request_error(FakeAPIError("bad", param='model')))
+        self.assertTrue(is_request_error(FakeAPIError("bad", status_code=404, code='model_not_found')))
+        self.assertFalse(is_request_error(FakeAPIError(GENERIC_MESSAGE)))
+        self.assertFalse(is_request_error(FakeAPIError(GENERIC_MESSAGE, param='input')))
+
+
+class AsyncEngineBisectionTest(unittest.TestCase):
+    """AsyncEmbeddingEngine against the stub server, which rejects marked inputs with one generic message"""
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import openai  # noqa: F401
+            from tokenizer import get_encoding
+            get_encoding()
+        except (ImportError, RuntimeError) as e:
+            raise unittest.SkipTest(f"needs openai and the cl100k_base tokenizer: {e}")
+
+        from embedding_stub_server import EmbeddingStub, make_server
+
+        cls.stub = EmbeddingStub(latency_ms=0, jitter=0, reject_text='POISON')
+        cls.server = make_server(cls.stub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.base_url = f"http://{host}:{port}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def embed(self, texts: List[str], dimensions: Optional[int] = None):
+        from embedding_engine import AsyncEmbeddingEngine
+
+        self.stub.reset_stats()
+        engine = AsyncEmbeddingEngine(api_key='stub', base_url=self.base_url, dimensions=dimensions,
+                                      concurrency=4, max_retries=0,
+                                      batcher=TokenBudgetBatcher(max_items=len(texts)))
+        return engine, engine.embed(texts)
+
+    def test_bad_inputs_in_both_halves_are_isolated(self):
+        texts = [f"POISON {text}" if text.startswith('bad') else text for text in batch([2, 12])]
+
+        engine, embeddings = self.embed(texts)
+
+        self.assertEqual([i for i, e in enumerate(embeddings) if e is None], [2, 12])
+        # Halves run concurrently, so failures are recorded in completion order
+        self.assertEqual(sorted(failure['text'] for failure in engine.failed_inputs), sorted([texts[2], texts[12]]))
+
+    def test_dimensions_out_of_range_fails_after_one_request(self):
+        engine, embeddings = self.embed(batch([]), dimensions=99999)
+
+        self.assertEqual(self.stub.snapshot()['requests'], 1)
+        self.assertTrue(all(e is None for e in embeddings))
+        self.assertEqual(len(engine.failed_inputs), 16)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Shared Tokenizer Loader
+One place for the scripts that count tokens (extract_documents.py,
+estimate_cost.py, batch_embeddings_processor.py) to get a tiktoken encoding
+without going to the network.
+
+tiktoken downloads an encoding's BPE file the first time it is used and caches
+it under TIKTOKEN_CACHE_DIR, named by the SHA-1 of its download URL. This
+module points that cache at a local tokenizer directory (KB_TOKENIZER_DIR,
+default data/tokenizers in the repo) and seeds it from a vendored
+<encoding>.tiktoken file when one is present, so fresh containers and offline
+builds load the encoding from disk. Each process parses an encoding once;
+pool workers forked after the parent has loaded it reuse the parent's copy.
+
+Usage:
+    python3 tokenizer.py --fetch                         # Download into the tokenizer dir (online build step)
+    python3 tokenizer.py --install cl100k_base.tiktoken  # Vendor a file copied from another machine
+    python3 tokenizer.py --check                         # Time a cold load in this process
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+TOKENIZER_DIR_ENV = "KB_TOKENIZER_DIR"
+DEFAULT_TOKENIZER_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'tokenizers'
+)
+
+# encoding -> (download URL, SHA-256 of the BPE file), as pinned by tiktoken_ext.openai_public
+ENCODING_FILES = {
+    'cl100k_base': (
+        "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+        "223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7",
+    ),
+    'o200k_base': (
+        "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+        "446a9538cb6c348e3516120d7c08b09f57c36495e2acfffe59a5bf8b0cfb1a2d",
+    ),
+}
+
+
+def tokenizer_dir() -> str:
+    """Directory holding vendored and cached BPE files"""
+    return os.path.abspath(os.environ.get(TOKENIZER_DIR_ENV) or DEFAULT_TOKENIZER_DIR)
+
+
+def _cache_filename(name: str) -> str:
+    """Name tiktoken gives the cached copy of an encoding's BPE file"""
+    url, _ = ENCODING_FILES[name]
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _seed_cache(name: str, source_dir: str, cache_dir: str):
+    """Copy a vendored <name>.tiktoken into tiktoken's cache if it is not there yet"""
+    if name not in ENCODING_FILES:
+        return
+
+    vendored = os.path.join(source_dir, f"{name}.tiktoken")
+    cached = os.path.join(cache_dir, _cache_filename(name))
+    if os.path.exists(cached) or not os.path.exists(vendored):
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cached}.{os.getpid()}.tmp"
+    shutil.copyfile(vendored, tmp_path)
+    os.replace(tmp_path, cached)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = DEFAULT_ENCODING):
+    """
+    Load a tiktoken encoding from the local tokenizer directory
+
+    The first call in a process reads and parses the BPE file; later calls
+    return the same Encoding object. If the file is not on disk yet, tiktoken
+    downloads it once and caches it in the tokenizer directory.
+
+    Args:
+        name: tiktoken encoding name
+
+    Returns:
+        tiktoken Encoding
+    """
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError("tiktoken is required to count tokens. Install with: pip install tiktoken") from e
+
+    directory = tokenizer_dir()
+    # An explicit TIKTOKEN_CACHE_DIR wins; spawned workers inherit whichever is set
+    cache_dir = os.environ.setdefault('TIKTOKEN_CACHE_DIR', directory)
+    _seed_cache(name, directory, cache_dir)
+
+    try:
+        return tiktoken.get_encoding(name)
+    except (ImportError, ValueError):
+        raise
+    except Exception as e:
+        raise RuntimeError(
+            f"Could not load the {name} tokenizer: no local copy in {cache_dir} and the download failed ({e}). "
+            f"Run 'python3 tokenizer.py --fetch' on a machine with network access, or "
+            f"'python3 tokenizer.py --install {name}.tiktoken' with a copied file"
+        ) from e
+
+
+def count_tokens(text: str, name: str = DEFAULT_ENCODING) -> int:
+    """Number of tokens in text; special-token strings are counted as plain text"""
+    return len(get_encoding(name).encode(text, disallowed_special=()))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def install(path: str, name: str = DEFAULT_ENCODING) -> str:
+    """
+    Vendor a BPE file into the tokenizer directory after checking its hash
+
+    Args:
+        path: Downloaded <name>.tiktoken file
+        name: Encoding the file belongs to
+
+    Returns:
+        Path of the vendored copy
+    """
+    if name not in ENCODING_FILES:
+        raise ValueError(f"Unknown encoding: {name} (known: {', '.join(ENCODING_FILES)})")
+
+    _, expected_hash = ENCODING_FILES[name]
+    actual_hash = _file_sha256(path)
+    if actual_hash != expected_hash:
+        raise ValueError(f"{path} is not the {name} BPE file (sha256 {actual_hash}, expected {expected_hash})")
+
+    directory = tokenizer_dir()
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{name}.tiktoken")
+    if os.path.abspath(path) != target:
+        shutil.copyfile(path, target)
+    return target
+
+
+def fetch(name: str = DEFAULT_ENCODING) -> str:
+    """
+    Download an encoding (if needed) and vendor it as <name>.tiktoken
+
+    Returns:
+        Path of the vendored copy
+    """
+    get_encoding(name)
+    cached = os.path.join(os.environ['TIKTOKEN_CACHE_DIR'], _cache_filename(name))
+    return install(cached, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Vendor, fetch or time the tiktoken encodings used for token counting'
+    )
+    parser.add_argument('--encoding', default=DEFAULT_ENCODING, choices=sorted(ENCODING_FILES),
+                        help=f'Encoding name (default: {DEFAULT_ENCODING})')
+    parser.add_argument('--fetch', action='store_true',
+                        help='Download the encoding into the tokenizer directory')
+    parser.add_argument('--install', metavar='FILE',
+                        help='Vendor an already downloaded <encoding>.tiktoken file')
+    parser.add_argument('--check', action='store_true',
+                        help='Load the encoding and report how long it took')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    print(f"Tokenizer directory: {tokenizer_dir()}")
+
+    try:
+        if args.install:
+            print(f"Installed {install(args.install, args.encoding)}")
+        if args.fetch:
+            print(f"Vendored {fetch(args.encoding)}")
+        if args.check or not (args.install or args.fetch):
+            start = time.perf_counter()
+            encoding = get_encoding(args.encoding)
+            elapsed = time.perf_counter() - start
+            print(f"Loaded {args.encoding} ({encoding.n_vocab:,} tokens) in {elapsed * 1000:.1f} ms")
+    except (ImportError, ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())